@@ -0,0 +1,113 @@
+import time
+
+HISTORY_ENTRY_ACTION = 0
+HISTORY_ENTRY_COMMAND = 1
+HISTORY_ENTRY_NOISE = 2
+DEFAULT_HISTORY_CAPACITY = 20
+
+class ActionHistoryEntry:
+    '''An entry of the history that stores the function that describes it and its arguments so that it only gets described when shown'''
+    __slots__ = ('kind', 'describe', 'arguments', 'repeat_count', 'timestamp')
+
+    def __init__(self, kind: int, describe, arguments: tuple, timestamp: float):
+        self.kind = kind
+        self.describe = describe
+        self.arguments = arguments
+        self.repeat_count = 1
+        self.timestamp = timestamp
+
+    def is_repeated_by(self, kind: int, describe, arguments: tuple) -> bool:
+        return self.kind == kind and self.describe is describe and self.arguments == arguments
+
+    def get_kind(self) -> int:
+        return self.kind
+
+    def get_repeat_count(self) -> int:
+        return self.repeat_count
+
+    def get_timestamp(self) -> float:
+        '''The time of the most recent repetition of the entry'''
+        return self.timestamp
+
+    def compute_description(self) -> str:
+        return self.describe(*self.arguments)
+
+    def compute_line(self) -> str:
+        description = self.compute_description()
+        if self.repeat_count > 1:
+            return f'{self.repeat_count}X {description}'
+        return description
+
+class ActionHistory:
+    '''Remembers the most recent entries in a fixed capacity ring buffer and combines consecutive repetitions of an entry'''
+    def __init__(self, capacity: int = DEFAULT_HISTORY_CAPACITY):
+        self.should_record_history = False
+        self.entries = []
+        self.capacity = 0
+        self.size = 0
+        self.next_index = 0
+        self.set_capacity(capacity)
+
+    def record_action(self, describe, *arguments):
+        self.record_entry(HISTORY_ENTRY_ACTION, describe, arguments)
+
+    def record_command(self, describe, *arguments):
+        self.record_entry(HISTORY_ENTRY_COMMAND, describe, arguments)
+
+    def record_noise(self, describe, *arguments):
+        self.record_entry(HISTORY_ENTRY_NOISE, describe, arguments)
+
+    def record_entry(self, kind: int, describe, arguments: tuple):
+        if not self.should_record_history or self.capacity == 0:
+            return
+        timestamp = time.time()
+        if self.size > 0:
+            last_entry = self.entries[self.next_index - 1]
+            if last_entry.is_repeated_by(kind, describe, arguments):
+                last_entry.repeat_count += 1
+                last_entry.timestamp = timestamp
+                return
+        self.entries[self.next_index] = ActionHistoryEntry(kind, describe, arguments, timestamp)
+        self.next_index = (self.next_index + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def set_capacity(self, capacity: int):
+        '''Changes how many entries the history remembers, keeping the most recent ones'''
+        capacity = max(capacity, 0)
+        entries = self.get_entries()[-capacity:] if capacity > 0 else []
+        self.capacity = capacity
+        self.entries = entries + [None]*(capacity - len(entries))
+        self.size = len(entries)
+        self.next_index = self.size % capacity if capacity > 0 else 0
+
+    def get_capacity(self) -> int:
+        return self.capacity
+
+    def clear(self):
+        self.entries = [None]*self.capacity
+        self.size = 0
+        self.next_index = 0
+
+    def get_entries(self):
+        '''Returns the entries from oldest to newest'''
+        if self.size == 0:
+            return []
+        start_index = (self.next_index - self.size) % self.capacity
+        if start_index + self.size <= self.capacity:
+            return self.entries[start_index:start_index + self.size]
+        return self.entries[start_index:] + self.entries[:self.next_index]
+
+    def is_recording_history(self):
+        return self.should_record_history
+
+    def start_recording_history(self):
+        self.should_record_history = True
+
+    def stop_recording_history(self):
+        self.should_record_history = False
+
+    def get_action_history(self):
+        '''Yields the lines describing the entries from oldest to newest'''
+        for entry in self.get_entries():
+            yield entry.compute_line()
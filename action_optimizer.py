@@ -0,0 +1,120 @@
+from .action_records import BasicAction, TalonTimeSpecification
+
+def is_string_action(action: BasicAction, name: str) -> bool:
+    '''Determines if the action has the name and a single string argument'''
+    arguments = action.get_arguments()
+    return action.get_name() == name and len(arguments) == 1 and type(arguments[0]) == str
+
+def merge_adjacent_inserts(actions):
+    '''Types the text of consecutive inserts with a single insert'''
+    return merge_adjacent_string_actions(actions, 'insert', '')
+
+def combine_consecutive_keys(actions):
+    '''Presses the keystrokes of consecutive key actions with a single key action'''
+    return merge_adjacent_string_actions(actions, 'key', ' ')
+
+def merge_adjacent_string_actions(actions, name: str, separator: str):
+    result = []
+    merged_arguments = []
+    for action in actions:
+        if is_string_action(action, name) and action.get_arguments()[0] != '':
+            merged_arguments.append(action.get_arguments()[0])
+        else:
+            append_merged_string_action(result, name, separator, merged_arguments)
+            merged_arguments = []
+            result.append(action)
+    append_merged_string_action(result, name, separator, merged_arguments)
+    return result
+
+def append_merged_string_action(result, name: str, separator: str, merged_arguments):
+    if merged_arguments:
+        result.append(BasicAction(name, [separator.join(merged_arguments)]))
+
+def fold_repeated_keys(actions):
+    '''Replaces consecutive presses of the same key with talon's repeat syntax, such as key('down:5') for five key('down') actions'''
+    result = []
+    index = 0
+    while index < len(actions):
+        action = actions[index]
+        repeat_count = 1
+        if is_repeatable_key_action(action):
+            while index + repeat_count < len(actions) and actions[index + repeat_count] == action:
+                repeat_count += 1
+        if repeat_count > 1:
+            result.append(BasicAction('key', [f'{action.get_arguments()[0]}:{repeat_count}']))
+        else:
+            result.append(action)
+        index += repeat_count
+    return result
+
+def is_repeatable_key_action(action: BasicAction) -> bool:
+    '''Only a single keystroke without a press, release, or repeat suffix can be repeated with the repeat syntax'''
+    if not is_string_action(action, 'key'):
+        return False
+    keystroke = action.get_arguments()[0]
+    return keystroke != '' and ' ' not in keystroke and ':' not in keystroke
+
+def drop_overwritten_mouse_movements(actions):
+    '''Drops mouse movements that are immediately followed by another mouse movement because only the last position of the mouse matters'''
+    result = []
+    for index, action in enumerate(actions):
+        if action.get_name() == 'mouse_move' and index + 1 < len(actions) and actions[index + 1].get_name() == 'mouse_move':
+            continue
+        result.append(action)
+    return result
+
+def merge_adjacent_sleeps(actions):
+    '''Replaces consecutive sleeps with the same unit with a single sleep for their total duration'''
+    result = []
+    for action in actions:
+        if result and is_mergeable_sleep(action) and is_mergeable_sleep(result[-1]):
+            merged_duration = compute_merged_sleep_duration(result[-1].get_arguments()[0], action.get_arguments()[0])
+            if merged_duration is not None:
+                result[-1] = BasicAction('sleep', [merged_duration])
+                continue
+        result.append(action)
+    return result
+
+def is_mergeable_sleep(action: BasicAction) -> bool:
+    return action.get_name() == 'sleep' and len(action.get_arguments()) == 1
+
+def compute_merged_sleep_duration(first_duration, second_duration):
+    if isinstance(first_duration, TalonTimeSpecification) and isinstance(second_duration, TalonTimeSpecification):
+        if first_duration.unit == second_duration.unit:
+            return TalonTimeSpecification(first_duration.amount + second_duration.amount, first_duration.unit)
+        return None
+    if type(first_duration) in (int, float) and type(second_duration) in (int, float):
+        return first_duration + second_duration
+    return None
+
+PLAYBACK_COALESCING_PASSES = (merge_adjacent_inserts, combine_consecutive_keys)
+MOUSE_MOVEMENT_OPTIMIZATION_NAME = 'mouse_moves'
+SLEEP_OPTIMIZATION_NAME = 'sleeps'
+INSERT_OPTIMIZATION_NAME = 'inserts'
+KEY_REPEAT_OPTIMIZATION_NAME = 'key_repeats'
+KEY_OPTIMIZATION_NAME = 'keys'
+# Ordered so that every pass sees the result of the passes it benefits from, such as repeated keys being folded before keys get combined
+TALON_SCRIPT_OPTIMIZATION_PASSES = {
+    MOUSE_MOVEMENT_OPTIMIZATION_NAME: drop_overwritten_mouse_movements,
+    SLEEP_OPTIMIZATION_NAME: merge_adjacent_sleeps,
+    INSERT_OPTIMIZATION_NAME: merge_adjacent_inserts,
+    KEY_REPEAT_OPTIMIZATION_NAME: fold_repeated_keys,
+    KEY_OPTIMIZATION_NAME: combine_consecutive_keys,
+}
+ALL_OPTIMIZATIONS_NAME = 'all'
+
+def compute_talon_script_optimization_passes(optimization_names):
+    '''Returns the passes for the names in the order they should run along with any names that are not optimizations'''
+    names = set(optimization_names)
+    if ALL_OPTIMIZATIONS_NAME in names:
+        names.update(TALON_SCRIPT_OPTIMIZATION_PASSES)
+        names.discard(ALL_OPTIMIZATIONS_NAME)
+    passes = [optimization_pass for name, optimization_pass in TALON_SCRIPT_OPTIMIZATION_PASSES.items() if name in names]
+    unknown_names = sorted(names.difference(TALON_SCRIPT_OPTIMIZATION_PASSES))
+    return passes, unknown_names
+
+def optimize_actions(actions, passes):
+    '''Runs the passes over the actions in order. Every pass returns a new list of actions with the same effect.'''
+    for optimization_pass in passes:
+        actions = optimization_pass(actions)
+    return actions
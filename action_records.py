@@ -1,11 +1,28 @@
 import json
+import locale
+import math
+import sys
+
+def compute_interned_string(text):
+    if type(text) == str:
+        return sys.intern(text)
+    return text
 
 class BasicAction:
+    __slots__ = ('name', 'arguments', 'talon_script')
+
     def __init__(self, name, arguments):
-        self.name = name
-        self.arguments = arguments
+        self.name = compute_interned_string(name)
+        self.arguments = tuple(arguments)
+        self.talon_script = None
     
     def compute_talon_script(self):
+        '''The talon script gets remembered, so an action recorded in primary memory only gets it generated once for logging it and typing it out with bar type recording'''
+        if self.talon_script is None:
+            self.talon_script = self.compute_uncached_talon_script()
+        return self.talon_script
+    
+    def compute_uncached_talon_script(self):
         code = self.name + '(' + ', '.join(self.compute_arguments_converted_to_talon_script_string()) + ')'
         return code
     
@@ -32,15 +49,20 @@ class BasicAction:
         return self.arguments
     
     def to_json(self) -> str:
-        return json.dumps({'name': self.name, 'arguments': self.arguments}, cls = BasicActionEncoder)
+        return compute_action_json(self)
     
     @staticmethod
     def from_json(text: str):
-        representation = json.loads(text)
-        return BasicAction(representation['name'], representation['arguments'])
+        return compute_action_from_json(text)
     
     def __eq__(self, other) -> bool:
-        return other is not None and self.name == other.name and self.arguments == other.arguments
+        return isinstance(other, BasicAction) and self.name == other.name and self.arguments == other.arguments
+
+    def __hash__(self):
+        try:
+            return hash((self.name, self.arguments))
+        except TypeError:
+            return hash(self.name)
     
     def __repr__(self):
         return self.__str__()
@@ -50,8 +72,8 @@ class BasicAction:
 
 class BasicActionEncoder(json.JSONEncoder):
     def default(self, object):
-        if isinstance(object, TalonCapture):
-            return object.to_json()
+        if isinstance(object, (TalonCapture, TalonTimeSpecification)):
+            return object.compute_json_representation()
         return json.JSONEncoder.default(self, object)
 
 def compute_talon_script_boolean_value(value: bool):
@@ -60,6 +82,8 @@ def compute_talon_script_boolean_value(value: bool):
     return 0
 
 class TalonCapture:
+    __slots__ = ('name', 'instance', 'postfix')
+
     def __init__(self, name: str, instance: int, postfix: str = ''):
         self.name = name
         self.instance = instance
@@ -74,20 +98,196 @@ class TalonCapture:
     def compute_command_component(self):
         return f'<{self.name}>'
     
+    def compute_json_representation(self):
+        return {JSON_TYPE_KEY: CAPTURE_JSON_TYPE, 'name': self.name, 'instance': self.instance, 'postfix': self.postfix}
+
     def to_json(self):
-        return json.dumps({'name': self.name, 'instance': self.instance})
+        return json.dumps(self.compute_json_representation())
     
     @staticmethod
-    def from_json(json):
-        attributes = json.loads(json)
-        return TalonCapture(attributes['name'], attributes['instance'])
+    def from_json(text: str):
+        attributes = json.loads(text)
+        return TalonCapture(attributes['name'], attributes['instance'], attributes.get('postfix', ''))
 
     def __eq__(self, other) -> bool:
-        return self.name == other.name and self.instance == other.instance and self.postfix == other.postfix
+        return isinstance(other, TalonCapture) and self.name == other.name and self.instance == other.instance and self.postfix == other.postfix
+
+    def __hash__(self):
+        return hash((self.name, self.instance, self.postfix))
+
+class TalonTimeSpecification:
+    __slots__ = ('amount', 'unit')
+
+    def __init__(self, amount: int, unit: str):
+        self.amount = amount
+        self.unit = unit
+    
+    def __str__(self) -> str:
+        return str(self.amount) + self.unit
+    
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TalonTimeSpecification) and self.amount == other.amount and self.unit == other.unit
+
+    def __hash__(self):
+        return hash((self.amount, self.unit))
+
+    def compute_json_representation(self):
+        return {JSON_TYPE_KEY: TIME_SPECIFICATION_JSON_TYPE, 'amount': self.amount, 'unit': self.unit}
+
+    def to_json(self):
+        return json.dumps(self.compute_json_representation())
+
+    @staticmethod
+    def from_json(text: str):
+        attributes = json.loads(text)
+        return TalonTimeSpecification(attributes['amount'], attributes['unit'])
+
+# Arguments that JSON has no type for get stored as objects tagged with their type under JSON_TYPE_KEY.
+# Keys of other dictionaries made of underscores followed by JSON_TYPE_KEY get another underscore when encoded, so every dictionary round-trips.
+JSON_TYPE_KEY = 'bar_type'
+CAPTURE_JSON_TYPE = 'capture'
+TIME_SPECIFICATION_JSON_TYPE = 'time_specification'
+
+def compute_json_value(value):
+    '''Returns the value with its captures, time specifications, and dictionaries converted to what gets stored for them in JSON'''
+    value_type = type(value)
+    if value_type in (str, int, float, bool) or value is None:
+        return value
+    if value_type == TalonCapture or value_type == TalonTimeSpecification:
+        return value.compute_json_representation()
+    if isinstance(value, (list, tuple)):
+        return [compute_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {compute_escaped_json_key(key): compute_json_value(item) for key, item in value.items()}
+    return value
+
+def compute_escaped_json_key(key):
+    if type(key) == str and key.endswith(JSON_TYPE_KEY) and key[:-len(JSON_TYPE_KEY)].strip('_') == '':
+        return '_' + key
+    return key
+
+def compute_value_from_json_object(attributes: dict):
+    '''Converts a decoded JSON object back into what compute_json_value converted into it'''
+    json_type = attributes.get(JSON_TYPE_KEY)
+    if json_type == TIME_SPECIFICATION_JSON_TYPE:
+        return TalonTimeSpecification(attributes['amount'], attributes['unit'])
+    elif json_type == CAPTURE_JSON_TYPE:
+        return TalonCapture(attributes['name'], attributes['instance'], attributes.get('postfix', ''))
+    elif json_type is None and any(type(key) == str and key.endswith(JSON_TYPE_KEY) for key in attributes):
+        return {compute_unescaped_json_key(key): value for key, value in attributes.items()}
+    return attributes
+
+def compute_unescaped_json_key(key: str):
+    if key.endswith(JSON_TYPE_KEY) and len(key) > len(JSON_TYPE_KEY) and key[:-len(JSON_TYPE_KEY)].strip('_') == '':
+        return key[1:]
+    return key
+
+def compute_json_text_for_value(value) -> str:
+    '''Encodes a value that can contain captures and time specifications as JSON that compute_value_from_json_text decodes back into it'''
+    return json.dumps(compute_json_value(value))
+
+def compute_value_from_json_text(text: str):
+    if JSON_TYPE_KEY in text:
+        return json.loads(text, object_hook = compute_value_from_json_object)
+    return json.loads(text)
+
+def compute_generic_action_json(action) -> str:
+    return json.dumps({'name': action.name, 'arguments': compute_json_value(action.arguments)})
+
+def compute_action_from_json(text: str):
+    # Converting every decoded object is slow, so it only happens when the text can contain tagged objects
+    if JSON_TYPE_KEY in text:
+        representation = json.loads(text, object_hook = compute_value_from_json_object)
+    else:
+        representation = json.loads(text)
+    return BasicAction(representation['name'], representation['arguments'])
+
+ARGUMENT_JSON_SEPARATOR = ', '
+ACTION_JSON_SUFFIX = ']}'
+encode_json_string = json.encoder.encode_basestring_ascii
+
+def encode_json_integer(value):
+    if type(value) != int:
+        return None
+    return int.__repr__(value)
+
+def encode_json_float(value):
+    if type(value) != float or value != value or value in (math.inf, -math.inf):
+        return None
+    return float.__repr__(value)
+
+def encode_json_boolean(value):
+    if type(value) != bool:
+        return None
+    return 'true' if value else 'false'
+
+def encode_json_string_argument(value):
+    if type(value) != str:
+        return None
+    return encode_json_string(value)
+
+def encode_json_time_specification(value):
+    if type(value) != TalonTimeSpecification or type(value.unit) != str:
+        return None
+    amount = encode_json_integer(value.amount) or encode_json_float(value.amount)
+    if amount is None:
+        return None
+    return '{"' + JSON_TYPE_KEY + '": "' + TIME_SPECIFICATION_JSON_TYPE + '", "amount": ' + amount + ', "unit": ' + encode_json_string(value.unit) + '}'
+
+class ActionCodec:
+    '''Encodes actions with the name whose arguments get encoded by the argument encoders directly as the JSON the generic encoder would produce for them.
+        An argument encoder returns None for an argument it cannot encode, in which case the generic JSON encoding gets used instead.
+        Decoding is left to the json module, which is as fast as decoding the arguments in python.'''
+    def __init__(self, name: str, argument_encoders):
+        self.name = name
+        self.argument_encoders = tuple(argument_encoders)
+        self.prefix = '{"name": ' + encode_json_string(name) + ', "arguments": ['
+
+    def get_name(self) -> str:
+        return self.name
+
+    def encode(self, arguments):
+        if len(arguments) != len(self.argument_encoders):
+            return None
+        parts = [encode(argument) for encode, argument in zip(self.argument_encoders, arguments)]
+        if None in parts:
+            return None
+        return self.prefix + ARGUMENT_JSON_SEPARATOR.join(parts) + ACTION_JSON_SUFFIX
+
+DEFAULT_ACTION_CODECS = (
+    ActionCodec('insert', [encode_json_string_argument]),
+    ActionCodec('key', [encode_json_string_argument]),
+    ActionCodec('mouse_click', [encode_json_integer]),
+    ActionCodec('mouse_move', [encode_json_float, encode_json_float]),
+    ActionCodec('mouse_scroll', [encode_json_float, encode_json_float, encode_json_boolean]),
+    ActionCodec('sleep', [encode_json_time_specification]),
+    ActionCodec('user.insert_snippet_by_name', [encode_json_string_argument]),
+    ActionCodec('user.insert_snippet_by_name_with_phrase', [encode_json_string_argument, encode_json_string_argument]),
+    ActionCodec('user.move_cursor_to_next_snippet_stop', []),
+)
+action_codecs = {codec.get_name(): codec for codec in DEFAULT_ACTION_CODECS}
+
+def register_action_codec(codec: ActionCodec):
+    '''Makes actions with the name of the codec get encoded with it when their arguments have its shapes'''
+    action_codecs[codec.get_name()] = codec
+
+def compute_action_json(action) -> str:
+    '''Encodes the action as a JSON object with its name and arguments, using the codec for its name when there is one'''
+    codec = action_codecs.get(action.name)
+    if codec is not None:
+        text = codec.encode(action.arguments)
+        if text is not None:
+            return text
+    return compute_generic_action_json(action)
 
 class Command:
+    __slots__ = ('name', 'actions', 'seconds_since_action')
+
     def __init__(self, name: str, actions, seconds_since_action: int = None):
-        self.name = name
+        self.name = compute_interned_string(name)
         self.actions = actions
         self.seconds_since_action = seconds_since_action
     
@@ -125,6 +325,8 @@ class Command:
         return representation
 
 class CommandChain(Command):
+    __slots__ = ('chain_number', 'chain_size')
+
     def __init__(self, name: str, actions, chain_number: int = 0, chain_size: int = 0):
         super().__init__(name, actions)
         self.chain_number: int = chain_number
@@ -151,6 +353,8 @@ class CommandChain(Command):
         return self.chain_size
 
 class RecordingStart:
+    __slots__ = ()
+
     def is_command_record(self):
         return False
 
@@ -159,19 +363,24 @@ RECORDING_START_MESSAGE = 'START'
 TIME_DIFFERENCE_PREFIX = 'T'
 
 class RecordParser:
-    def __init__(self, path: str):
+    def __init__(self, path: str = None):
         self.commands = []
         self.current_command_name = ''
         self.current_command_actions = []
         self.seconds_since_last_action = None
         self.seconds_since_last_action_for_next_command = None
         self.time_information_found_after_command = False
-        self.parse_path(path)
+        if path is not None:
+            self.parse_path(path)
 
     def parse_path(self, path: str):
         self.process_file_lines(path)
+        self.finish()
+
+    def finish(self):
         if self.is_command_found():
-            self.add_current_command() 
+            self.add_current_command()
+            self.current_command_actions = []
     
     def process_file_lines(self, path: str):
         with open(path, 'r') as file:
@@ -185,20 +394,33 @@ class RecordParser:
         if is_action(line):
             self.add_action_based_on_line(line)
         elif is_line_command_start(line):
-            self.process_command_start(line)
+            self.process_command_start(compute_command_name_without_prefix(line))
         elif is_line_time_deference(line):
-            self.process_time_difference(line)
+            self.process_time_difference(compute_seconds_since_last_action(line))
         elif is_line_recording_start(line):
             self.process_recording_start()
-        if is_line_command_ending(line):
-            self.reset_command_information_except_name()
+
+    def process_entry(self, entry):
+        kind, value = entry
+        if kind == RECORD_ENTRY_ACTION:
+            self.process_action(value)
+        elif kind == RECORD_ENTRY_COMMAND_START:
+            self.process_command_start(value)
+        elif kind == RECORD_ENTRY_TIME_DIFFERENCE:
+            self.process_time_difference(value)
+        elif kind == RECORD_ENTRY_RECORDING_START:
+            self.process_recording_start()
      
     def add_action_based_on_line(self, line_without_trailing_newline: str):
-        self.current_command_actions.append(BasicAction.from_json(line_without_trailing_newline))
+        self.process_action(BasicAction.from_json(line_without_trailing_newline))
+
+    def process_action(self, action: BasicAction):
+        self.current_command_actions.append(action)
 
-    def process_command_start(self, line_without_trailing_newline: str):
+    def process_command_start(self, name: str):
         self.add_current_command_if_available()
-        self.current_command_name = compute_command_name_without_prefix(line_without_trailing_newline)
+        self.current_command_name = name
+        self.reset_command_information_except_name()
 
     def add_current_command_if_available(self):
         if self.is_command_found():
@@ -208,20 +430,23 @@ class RecordParser:
         return len(self.current_command_actions) > 0
 
     def add_current_command(self):
-        seconds_since_last_action = self.seconds_since_last_action
+        self.commands.append(Command(self.current_command_name, self.current_command_actions[:], self.compute_current_command_seconds_since_last_action()))
+
+    def compute_current_command_seconds_since_last_action(self):
         if not self.time_information_found_after_command:
-            seconds_since_last_action = self.seconds_since_last_action_for_next_command
-        self.commands.append(Command(self.current_command_name, self.current_command_actions[:], seconds_since_last_action))
+            return self.seconds_since_last_action_for_next_command
+        return self.seconds_since_last_action
 
-    def process_time_difference(self, line_without_trailing_newline):
+    def process_time_difference(self, seconds_since_last_action: int):
         self.seconds_since_last_action = self.seconds_since_last_action_for_next_command
-        self.seconds_since_last_action_for_next_command = compute_seconds_since_last_action(line_without_trailing_newline)
+        self.seconds_since_last_action_for_next_command = seconds_since_last_action
         self.time_information_found_after_command = True
 
     def process_recording_start(self):
         self.add_current_command_if_available()
         self.commands.append(RecordingStart())
         self.current_command_name = ''
+        self.reset_command_information_except_name()
 
     def reset_command_information_except_name(self):
         self.current_command_actions = []
@@ -233,10 +458,16 @@ class RecordParser:
     def get_record(self):
         return self.commands
 
+    def take_records(self):
+        records = self.commands
+        self.commands = []
+        return records
+
 def read_file_record(path: str):
-    '''Obtains a list of the basic actions performed by the commands in the specified record file'''
-    parser = RecordParser(path)
-    return parser.get_record()
+    '''Obtains a list of the basic actions performed by the commands in the specified record. Kept here for the code that imported it from this module.'''
+    # record_files imports this module, so it only gets imported when called
+    from .record_files import read_file_record as read_record_from_files
+    return read_record_from_files(path)
 
 def compute_command_name_without_prefix(command_name: str):
     return command_name[len(COMMAND_NAME_PREFIX):]
@@ -260,4 +491,79 @@ def is_line_time_deference(line: str):
     return line.startswith(TIME_DIFFERENCE_PREFIX)
 
 def is_line_recording_start(line_without_trailing_newline: str):
-    return line_without_trailing_newline == RECORDING_START_MESSAGE
\ No newline at end of file
+    return line_without_trailing_newline == RECORDING_START_MESSAGE
+
+RECORD_ENTRY_ACTION = 0
+RECORD_ENTRY_COMMAND_START = 1
+RECORD_ENTRY_TIME_DIFFERENCE = 2
+RECORD_ENTRY_RECORDING_START = 3
+
+def create_action_record_entry(action: BasicAction):
+    return (RECORD_ENTRY_ACTION, action)
+
+def create_command_start_record_entry(name: str):
+    return (RECORD_ENTRY_COMMAND_START, name)
+
+def create_time_difference_record_entry(seconds_since_last_action: int):
+    return (RECORD_ENTRY_TIME_DIFFERENCE, seconds_since_last_action)
+
+def create_recording_start_record_entry():
+    return (RECORD_ENTRY_RECORDING_START, None)
+
+def compute_record_entry_line(entry) -> str:
+    kind, value = entry
+    if kind == RECORD_ENTRY_ACTION:
+        return value.to_json()
+    elif kind == RECORD_ENTRY_COMMAND_START:
+        return COMMAND_NAME_PREFIX + value
+    elif kind == RECORD_ENTRY_TIME_DIFFERENCE:
+        return compute_time_difference_text(value)
+    return RECORDING_START_MESSAGE
+
+def compute_record_entry_from_line(line_without_trailing_newline: str):
+    '''Returns the record entry represented by the line or None if the line does not represent one'''
+    if is_action(line_without_trailing_newline):
+        return create_action_record_entry(BasicAction.from_json(line_without_trailing_newline))
+    elif is_line_command_start(line_without_trailing_newline):
+        return create_command_start_record_entry(compute_command_name_without_prefix(line_without_trailing_newline))
+    elif is_line_time_deference(line_without_trailing_newline):
+        return create_time_difference_record_entry(compute_seconds_since_last_action(line_without_trailing_newline))
+    elif is_line_recording_start(line_without_trailing_newline):
+        return create_recording_start_record_entry()
+    return None
+
+def iter_text_record_entries(path: str):
+    with open(path, 'r') as file:
+        for line in file:
+            entry = compute_record_entry_from_line(line.strip())
+            if entry is not None:
+                yield entry
+
+def iter_text_record_entries_from_file(file):
+    '''Yields the record entries from a text record file opened in binary mode'''
+    encoding = locale.getpreferredencoding(False)
+    for line in file:
+        entry = compute_record_entry_from_line(line.decode(encoding).strip())
+        if entry is not None:
+            yield entry
+
+TEXT_RECORD_FILE_EXTENSION = '.txt'
+
+class TextRecordFormat:
+    file_extension = TEXT_RECORD_FILE_EXTENSION
+
+    def open_file(self, path: str):
+        return open(path, 'a')
+
+    def write_entries(self, file, entries) -> int:
+        '''Writes the entries that can be encoded to the file and returns how many could not be encoded'''
+        lines = []
+        invalid_entry_count = 0
+        for entry in entries:
+            try:
+                lines.append(compute_record_entry_line(entry))
+            except (TypeError, ValueError):
+                invalid_entry_count += 1
+        if lines:
+            file.write('\n'.join(lines) + '\n')
+        return invalid_entry_count
@@ -1,8 +1,31 @@
-from talon import Module, actions, Context, imgui, speech_system, app, settings
-from .action_records import BasicAction, RECORDING_START_MESSAGE, compute_time_difference_text
+from talon import Module, actions, Context, imgui, speech_system, app, settings, clip, cron
+from .action_records import BasicAction, TalonTimeSpecification, TextRecordFormat, create_action_record_entry, create_command_start_record_entry, \
+    create_time_difference_record_entry, create_recording_start_record_entry
+from .record_files import is_record_file_name
+from .binary_records import BinaryRecordFormat
 from .time_difference import TimeDifference
-from .delayed_hissing_response import DelayedHissingJobHandler
+from .action_history import ActionHistory
+from .playback_compiler import compile_playback_plan
+from .action_optimizer import optimize_actions, compute_talon_script_optimization_passes
+from .talon_script_output import LINES_OUTPUT_MODE, BLOCK_OUTPUT_MODE, CLIPBOARD_OUTPUT_MODE, FILE_OUTPUT_MODE, TALON_SCRIPT_OUTPUT_MODES, \
+    RECORDED_COMMANDS_DIRECTORY_NAME, compute_talon_script_block, compute_unused_recorded_command_name, compute_talon_command_rule, write_talon_command_file
+from .recording_sinks import RecordingSinkPipeline
+from .recording_buffer import SpillingActionBuffer, DEFAULT_MAXIMUM_ACTIONS_IN_MEMORY
+from .command_chains import CommandChainDetector, LiveCommandAssembler, DEFAULT_MAXIMUM_CHAIN_GAP_SECONDS
+from .recorder_instrumentation import RecorderInstrumentation, ACTION_STAGE, RECORD_STAGE, SINK_STAGE_PREFIX
+from .callback_dispatch import CallbackSubscriber, AsynchronousCallbackSubscriber, CallbackDispatcher, DROP_OLDEST_OVERFLOW_POLICY
+from .noise_scheduler import NoiseScheduler, NoiseTiming
+from .usage_statistics import UsageStatistics, write_usage_statistics_snapshot
+from .record_file_writer import RecordFileWriter
+from .record_database import RecordDatabase, RecordDatabaseWriter, compute_record_database_path, import_record
+from .record_rotation import RecordRotationPolicy, compute_supported_compression, compress_uncompressed_segments
+from .record_state import read_active_record_state, write_active_record_state, compute_active_record_state, compute_most_recently_updated_record_file_name, \
+    repair_record_tail
 import os
+import math
+import atexit
+import time
+import threading
 from typing import Callable
 
 module = Module()
@@ -34,93 +57,364 @@ module.setting(
     0 means false and any other integer means true.'''
 )
 
+record_file_format_setting_name = 'basic_action_recorder_record_file_format'
+record_file_format = 'user.' + record_file_format_setting_name
+module.setting(
+    record_file_format_setting_name,
+    type = str,
+    default = 'text',
+    desc = 'The format of the record file. text stores a line per action and binary stores a compact binary record.'
+)
+
+record_rotation_size_setting_name = 'basic_action_recorder_record_rotation_size'
+record_rotation_size = 'user.' + record_rotation_size_setting_name
+module.setting(
+    record_rotation_size_setting_name,
+    type = int,
+    default = 0,
+    desc = 'The size in megabytes at which the active record file gets sealed as a compressed segment and a new file gets started. 0 disables rotation by size.'
+)
+
+record_rotation_age_setting_name = 'basic_action_recorder_record_rotation_age'
+record_rotation_age = 'user.' + record_rotation_age_setting_name
+module.setting(
+    record_rotation_age_setting_name,
+    type = int,
+    default = 0,
+    desc = 'The age in hours at which the active record file gets sealed as a compressed segment and a new file gets started. 0 disables rotation by age.'
+)
+
+record_segment_compression_setting_name = 'basic_action_recorder_record_segment_compression'
+record_segment_compression = 'user.' + record_segment_compression_setting_name
+module.setting(
+    record_segment_compression_setting_name,
+    type = str,
+    default = 'gzip',
+    desc = 'How sealed record segments get compressed: gzip, zstd (requires the zstandard package), or none.'
+)
+
+playback_coalescing_setting_name = 'basic_action_recorder_playback_coalescing'
+playback_coalescing = 'user.' + playback_coalescing_setting_name
+module.setting(
+    playback_coalescing_setting_name,
+    type = int,
+    default = 0,
+    desc = '''Determines if bar play recording should perform adjacent inserts and consecutive key actions as single actions.
+    0 means false and any other integer means true.'''
+)
+
+talon_script_optimizations_setting_name = 'basic_action_recorder_talon_script_optimizations'
+talon_script_optimizations = 'user.' + talon_script_optimizations_setting_name
+module.setting(
+    talon_script_optimizations_setting_name,
+    type = str,
+    default = '',
+    desc = '''The space separated optimizations that bar type recording applies to the recorded actions before typing their talon script.
+    mouse_moves drops mouse movements immediately followed by another movement, sleeps merges adjacent sleeps, inserts merges adjacent inserts,
+    key_repeats turns repeated presses of a key into a single key action like key('down:5'), and keys combines consecutive key actions. all applies every optimization.'''
+)
+
+talon_script_output_mode_setting_name = 'basic_action_recorder_talon_script_output_mode'
+talon_script_output_mode = 'user.' + talon_script_output_mode_setting_name
+module.setting(
+    talon_script_output_mode_setting_name,
+    type = str,
+    default = LINES_OUTPUT_MODE,
+    desc = '''How bar type recording outputs the talon script of the recorded actions. lines types each line and presses enter after it,
+    block types the whole script with a single insert, clipboard pastes it and then restores the clipboard, and file saves it as a command in a talon file.'''
+)
+
+maximum_recorded_actions_in_memory_setting_name = 'basic_action_recorder_maximum_recorded_actions_in_memory'
+maximum_recorded_actions_in_memory = 'user.' + maximum_recorded_actions_in_memory_setting_name
+module.setting(
+    maximum_recorded_actions_in_memory_setting_name,
+    type = int,
+    default = DEFAULT_MAXIMUM_ACTIONS_IN_MEMORY,
+    desc = '''How many actions recorded by bar start recording to keep in memory. Older actions get moved to a temporary file in BAR Data.
+    0 keeps every recorded action in memory.'''
+)
+
+command_chain_detection_setting_name = 'basic_action_recorder_command_chain_detection'
+command_chain_detection = 'user.' + command_chain_detection_setting_name
+module.setting(
+    command_chain_detection_setting_name,
+    type = int,
+    default = 0,
+    desc = '''Determines if the basic action recorder should keep track of how often chains of commands get spoken together.
+    0 means false and any other integer means true.'''
+)
+
+command_chain_gap_setting_name = 'basic_action_recorder_command_chain_maximum_gap_milliseconds'
+command_chain_gap = 'user.' + command_chain_gap_setting_name
+module.setting(
+    command_chain_gap_setting_name,
+    type = int,
+    default = DEFAULT_MAXIMUM_CHAIN_GAP_SECONDS*1000,
+    desc = 'The longest a command can start after the previous one in milliseconds and still be part of the same command chain.'
+)
+
+hissing_start_time_setting_name = 'basic_action_recorder_hissing_recognition_start_delay'
+hissing_start_time = 'user.' + hissing_start_time_setting_name
+module.setting(
+    hissing_start_time_setting_name,
+    type = int,
+    default = 350,
+    desc = 'How long the basic action recorder will wait before recognizing the start of a hiss in milliseconds'
+)
+
+pop_coalescing_window_setting_name = 'basic_action_recorder_pop_coalescing_window'
+pop_coalescing_window = 'user.' + pop_coalescing_window_setting_name
+module.setting(
+    pop_coalescing_window_setting_name,
+    type = int,
+    default = 0,
+    desc = '''How long the basic action recorder waits for another pop in milliseconds before recording a burst of pops as a single noise with a count.
+    0 records every pop on its own.'''
+)
+
+record_database_setting_name = 'basic_action_recorder_record_database'
+should_record_in_database = 'user.' + record_database_setting_name
+module.setting(
+    record_database_setting_name,
+    type = int,
+    default = 0,
+    desc = '''Determines if the basic action recorder should also store what it records in file in an indexed database in BAR Data for fast queries.
+    0 means false and any other integer means true.'''
+)
+
+instrumentation_setting_name = 'basic_action_recorder_instrumentation'
+instrumentation_enabled = 'user.' + instrumentation_setting_name
+module.setting(
+    instrumentation_setting_name,
+    type = int,
+    default = 0,
+    desc = '''Determines if the basic action recorder should time how long each stage of recording takes for every action, command, and noise.
+    0 means false and any other integer means true.'''
+)
+
+usage_statistics_setting_name = 'basic_action_recorder_usage_statistics'
+usage_statistics_enabled = 'user.' + usage_statistics_setting_name
+module.setting(
+    usage_statistics_setting_name,
+    type = int,
+    default = 0,
+    desc = '''Determines if the basic action recorder should keep live statistics about the commands, actions, and noises it receives in memory.
+    0 means false and any other integer means true.'''
+)
+
+TEXT_RECORD_FILE_FORMAT_NAME = 'text'
+BYTES_PER_MEGABYTE = 1024*1024
+SECONDS_PER_HOUR = 60*60
+RECORD_FILE_FORMATS = {TEXT_RECORD_FILE_FORMAT_NAME: TextRecordFormat(), 'binary': BinaryRecordFormat()}
+active_record_format = RECORD_FILE_FORMATS[TEXT_RECORD_FILE_FORMAT_NAME]
+
 OUTPUT_DIRECTORY = None
 PRIMARY_OUTPUT_FILE_NAME = 'record'
-PRIMARY_OUTPUT_FILE_EXTENSION = '.txt'
 record_file_name_postfix = ''
 primary_output_path = None
+RECORD_FILE_FLUSH_TIMEOUT_SECONDS = 2
+CALLBACK_CLOSE_TIMEOUT_SECONDS = 2
+INSTRUMENTATION_PANEL_MAXIMUM_LINES = 40
+USAGE_STATISTICS_PANEL_ITEM_COUNT = 5
+record_file_writer = RecordFileWriter()
+record_database_writer = RecordDatabaseWriter()
+recording_in_database = False
+SECONDS_PER_DAY = 24*60*60
+startup_timings = []
+active_record_source = None
+DEFERRED_STARTUP_WORK_DELAY = '3s'
 def set_up():
-    global OUTPUT_DIRECTORY, primary_output_path
+    startup_timings.clear()
+    time_startup_stage('data directory', set_up_output_directory)
+    time_startup_stage('record file settings', apply_record_file_settings)
+    time_startup_stage('active record', update_record_file_name_to_most_recent)
+    record_file_writer.set_flush_listener(save_active_record_state_after_flush)
+    if active_record_source != RECORD_STATE_SOURCE:
+        # This only queues the repair for the record file writer thread, which performs it before writing anything else
+        time_startup_stage('queue active record repair', repair_active_record_tail_in_background)
+    time_startup_stage('recorder settings', apply_recorder_settings)
+    time_startup_stage('recording in file', start_recording_when_should_record_in_file, settings.get(should_record_in_file))
+    cron.after(DEFERRED_STARTUP_WORK_DELAY, perform_deferred_startup_work)
+
+def time_startup_stage(name: str, function, *arguments):
+    start_time = time.perf_counter()
+    function(*arguments)
+    startup_timings.append((name, time.perf_counter() - start_time))
+
+def set_up_output_directory():
+    global OUTPUT_DIRECTORY
     OUTPUT_DIRECTORY = os.path.join(actions.path.talon_user(), 'BAR Data')
     if not os.path.exists(OUTPUT_DIRECTORY):
         os.makedirs(OUTPUT_DIRECTORY)
-    update_record_file_name_to_most_recent()
-    start_recording_when_should_record_in_file(settings.get(should_record_in_file))
+    record_database_writer.set_path(compute_record_database_path(OUTPUT_DIRECTORY))
+
+def apply_record_file_settings():
+    update_active_record_format(settings.get(record_file_format))
+    update_record_rotation_policy()
+    update_recording_in_database(settings.get(should_record_in_database))
+
+def apply_recorder_settings():
+    history.set_capacity(settings.get(history_size))
+    update_recording_time_information(settings.get(should_record_time_information))
+    update_instrumentation(settings.get(instrumentation_enabled))
+    update_command_chain_gap(settings.get(command_chain_gap))
+    recorder.set_maximum_actions_in_memory(settings.get(maximum_recorded_actions_in_memory))
+    update_command_chain_detection(settings.get(command_chain_detection))
+    update_hissing_start_time(settings.get(hissing_start_time))
+    update_pop_coalescing_window(settings.get(pop_coalescing_window))
+    update_usage_statistics_collection(settings.get(usage_statistics_enabled))
+
+def perform_deferred_startup_work():
+    compress_uncompressed_segments_in_background()
 
+RECORD_STATE_SOURCE = 'record state'
+DIRECTORY_SCAN_SOURCE = 'directory scan'
 def update_record_file_name_to_most_recent():
-    name = compute_most_recently_updated_record_file_name(OUTPUT_DIRECTORY)
+    global active_record_source
+    state = read_active_record_state(OUTPUT_DIRECTORY)
+    if state is not None and state.matches_file(OUTPUT_DIRECTORY):
+        name = state.get_name()
+        active_record_source = RECORD_STATE_SOURCE
+    else:
+        name = compute_most_recently_updated_record_file_name(OUTPUT_DIRECTORY)
+        active_record_source = DIRECTORY_SCAN_SOURCE
     postfix = ''
     if name != PRIMARY_OUTPUT_FILE_NAME and name != '': postfix = compute_record_name_postfix(name)
-    update_record_file_name(postfix)
+    set_record_file_name(postfix)
+    if state is not None and state.get_name() == os.path.basename(primary_output_path) and state.get_start_time() is not None:
+        record_file_writer.set_record_start_time(primary_output_path, state.get_start_time())
+
+def repair_active_record_tail_in_background():
+    '''The record state did not match the active record, so talon may have stopped while writing to it.
+        The record file writer removes any incomplete entry at its end before writing to it again and then saves the record state.'''
+    path = primary_output_path
+    state = read_active_record_state(OUTPUT_DIRECTORY)
+    valid_offset = 0
+    if state is not None and state.get_name() == os.path.basename(path):
+        valid_offset = state.get_offset()
+    def repair():
+        removed_byte_count = repair_record_tail(path, valid_offset)
+        if removed_byte_count > 0:
+            print('Basic Action Recorder: removed an incomplete entry of', removed_byte_count, 'bytes from the end of', path)
+        save_active_record_state()
+    record_file_writer.run_file_task(repair)
+
+def save_active_record_state():
+    if OUTPUT_DIRECTORY is not None and primary_output_path is not None:
+        save_record_state(primary_output_path)
+
+def save_active_record_state_after_flush(path: str):
+    '''Runs on the record file writer thread right after it flushed the record file, so the saved offset is at the end of a complete entry'''
+    if OUTPUT_DIRECTORY is not None:
+        save_record_state(path)
+
+def save_record_state(path: str):
+    state = compute_active_record_state(OUTPUT_DIRECTORY, os.path.basename(path), record_file_writer.get_record_start_time(path))
+    write_active_record_state(OUTPUT_DIRECTORY, state)
 
 def compute_record_name_postfix(name: str) -> str:
-    postfix = ''
-    if name == PRIMARY_OUTPUT_FILE_NAME + PRIMARY_OUTPUT_FILE_EXTENSION:
-        postfix = ''
-    else:
-        postfix = name[len(PRIMARY_OUTPUT_FILE_NAME):-len(PRIMARY_OUTPUT_FILE_EXTENSION)]
-    return postfix
+    name_without_extension, _ = os.path.splitext(name)
+    return name_without_extension[len(PRIMARY_OUTPUT_FILE_NAME):]
 
 def update_record_file_name(postfix: str):
-    global primary_output_path
-    record_filename = PRIMARY_OUTPUT_FILE_NAME + postfix + PRIMARY_OUTPUT_FILE_EXTENSION
+    set_record_file_name(postfix)
+    save_active_record_state()
+
+def set_record_file_name(postfix: str):
+    global primary_output_path, record_file_name_postfix
+    record_filename = PRIMARY_OUTPUT_FILE_NAME + postfix + active_record_format.file_extension
+    record_file_name_postfix = postfix
     primary_output_path = os.path.join(OUTPUT_DIRECTORY, record_filename)
+    record_file_writer.set_path(primary_output_path, active_record_format)
+
+def update_active_record_format(format_name: str):
+    global active_record_format
+    if format_name not in RECORD_FILE_FORMATS:
+        log('unknown record file format', format_name, 'using', TEXT_RECORD_FILE_FORMAT_NAME)
+        format_name = TEXT_RECORD_FILE_FORMAT_NAME
+    active_record_format = RECORD_FILE_FORMATS[format_name]
+
+def update_record_rotation_policy(*_):
+    rotation_policy = RecordRotationPolicy(
+        settings.get(record_rotation_size)*BYTES_PER_MEGABYTE,
+        settings.get(record_rotation_age)*SECONDS_PER_HOUR,
+        compute_supported_compression(settings.get(record_segment_compression))
+    )
+    record_file_writer.set_rotation_policy(rotation_policy)
+
+def compress_uncompressed_segments_in_background():
+    compression = compute_supported_compression(settings.get(record_segment_compression))
+    threading.Thread(target=compress_uncompressed_segments, args=(primary_output_path, compression), daemon=True).start()
 
-def compute_most_recently_updated_record_file_name(directory):
-    files_in_directory = os.listdir(directory)
-    record_file_names_in_directory = filter_for_record_file_names(files_in_directory)
-    name = compute_most_recently_updated_file_name_given_names_and_directory(record_file_names_in_directory, directory)
-    return name
-
-def filter_for_record_file_names(file_names):
-    filtered_names = [name for name in file_names if is_record_file_name(str(name))]
-    return filtered_names
-
-def is_record_file_name(name: str) -> bool:
-    return name.startswith('record') and name.endswith('.txt')
-
-def compute_most_recently_updated_file_name_given_names_and_directory(names, directory) -> str:
-    most_recently_updated_filename = ''
-    most_recent_update_time = 0
-    for name in names:
-        path = os.path.join(directory, name)
-        update_time = os.path.getmtime(path)
-        if update_time > most_recent_update_time:
-            most_recently_updated_filename = name
-            most_recent_update_time = update_time
-    return most_recently_updated_filename
+def update_record_file_format(format_name: str):
+    update_active_record_format(format_name)
+    if OUTPUT_DIRECTORY is not None:
+        update_record_file_name(record_file_name_postfix)
 
 class ActionRecorder:
-    def __init__(self):
-        self.actions = []
+    def __init__(self, sinks: RecordingSinkPipeline, compute_spill_directory = lambda: None):
+        self.actions = SpillingActionBuffer(compute_spill_directory)
+        self.playback_plan = None
+        self.playback_plan_coalesced = False
+        self.sinks = sinks
+        self.sinks.register_sink(PRIMARY_MEMORY_SINK_NAME, self.record_action)
         self.stop_recording_actions_in_primary_memory()
         self.temporarily_rejecting_actions = False
+        self.instrumentation = None
     
     def clear(self):
         self.actions.clear()
+        self.playback_plan = None
     
     def empty(self):
         return len(self.actions) == 0
 
+    def set_maximum_actions_in_memory(self, maximum_actions_in_memory: int):
+        self.actions.set_maximum_actions_in_memory(maximum_actions_in_memory)
+
+    def get_buffer_statistics(self):
+        return self.actions.get_statistics()
+
+    def close(self):
+        self.actions.close()
+
     def record_action(self, action):
         self.actions.append(action)
+        self.playback_plan = None
         log('action recorded:', action.get_name(), action.get_arguments(), 'code', action.compute_talon_script())
     
     def record_basic_action(self, name, arguments):
-        if not self.temporarily_rejecting_actions and self.should_record_when_not_temporarily_rejecting_actions():
-            action = BasicAction(name, arguments)
-            if self.recording_actions_in_primary_memory: self.record_action(action)
-            if settings.get(should_record_in_file): record_action_to_file_record(action.to_json())
-            if callback_manager.is_listening(): callback_manager.handle_action(action)
-    
-    def should_record_when_not_temporarily_rejecting_actions(self):
-        return self.recording_actions_in_primary_memory or settings.get(should_record_in_file) or callback_manager.is_listening()
+        if not self.temporarily_rejecting_actions:
+            if self.instrumentation is not None:
+                self.record_timed_basic_action(name, arguments)
+                return
+            sinks = self.sinks.get_active_sinks()
+            if sinks:
+                action = BasicAction(name, arguments)
+                for sink in sinks: sink(action)
+
+    def record_timed_basic_action(self, name, arguments):
+        '''Records the action like record_basic_action while timing it as the record stage, which includes the sink stages'''
+        start_time = time.perf_counter_ns()
+        try:
+            sinks = self.sinks.get_active_sinks()
+            if sinks:
+                action = BasicAction(name, arguments)
+                for sink in sinks: sink(action)
+        finally:
+            self.instrumentation.record(RECORD_STAGE, name, time.perf_counter_ns() - start_time)
+
+    def set_instrumentation(self, instrumentation: RecorderInstrumentation):
+        '''Times recording every action with the instrumentation or stops timing it when given None'''
+        self.instrumentation = instrumentation
 
     def stop_recording_actions_in_primary_memory(self):
         self.recording_actions_in_primary_memory = False
+        self.sinks.set_sink_active(PRIMARY_MEMORY_SINK_NAME, False)
     
     def start_recording_actions_in_primary_memory(self):
         self.recording_actions_in_primary_memory = True
+        self.sinks.set_sink_active(PRIMARY_MEMORY_SINK_NAME, True)
     
     def temporarily_reject_actions(self):
         self.temporarily_rejecting_actions = True
@@ -134,108 +428,105 @@ class ActionRecorder:
     def is_temporarily_rejecting_actions(self):
         return self.temporarily_rejecting_actions
     
-    def compute_talon_script(self):
-        code = []
-        for action in self.actions:
-            code.append(action.compute_talon_script())
-        return code
-    
-    def perform_actions(self):
-        for action in self.actions:
-            perform_basic_action(action)
-
-def perform_basic_action(action: BasicAction):
-    function = getattr(actions, action.get_name())
-    if action.get_name() == 'sleep': #Special case for sleep because it cannot be recorded directly
-        duration = action.get_arguments()[0]
-        function(str(duration))
-    elif len(action.get_arguments()) > 0:
-        function(*action.get_arguments())
-    else:
-        function()
+    def compute_talon_script(self, optimization_passes = ()):
+        return list(self.iter_talon_script(optimization_passes))
 
-class ActionHistory:
-    def __init__(self):
-        self.actions = []
-        self.should_record_history = False
-    
-    def record_action(self, description: str):
-        if self.should_record_history:
-            previous_number_of_times = None
-            previous_action = ''
-            if len(self.actions) > 0:
-                previous_number_of_times, previous_action = compute_action_recording_parts(self.actions[-1])
-            if previous_action == description and previous_number_of_times is not None:
-                self.actions[-1] = f'{previous_number_of_times + 1}X {description}'
-            else:
-                self.actions.append(description)
-                if len(self.actions) > settings.get(history_size):
-                    self.actions.pop(0)
-    
-    def is_recording_history(self):
-        return self.should_record_history
-    
-    def start_recording_history(self):
-        self.should_record_history = True
+    def iter_talon_script(self, optimization_passes = ()):
+        '''Yields the talon script of the recorded actions one chunk at a time, so spilled actions never all get loaded at once.
+            Optimizations do not cross the boundaries between chunks.'''
+        for chunk in self.actions.iter_chunks():
+            for action in optimize_actions(chunk, optimization_passes):
+                yield action.compute_talon_script()
     
-    def stop_recording_history(self):
-        self.should_record_history = False
-    
-    def get_action_history(self):
-        return self.actions
-
-def compute_action_recording_parts(recording: str):
-    prefix, _, description = recording.partition('X ')
-    if prefix != '' and prefix.isdigit():
-        return int(prefix), description
-    return 1, recording
-
-class TalonTimeSpecification:
-    def __init__(self, amount: int, unit: str):
-        self.amount = amount
-        self.unit = unit
-    
-    def __str__(self) -> str:
-        return str(self.amount) + self.unit
-    
-    def __repr__(self) -> str:
-        return self.__str__()
+    def perform_actions(self, coalesce: bool = False):
+        '''Performs the recorded actions with a playback plan that gets reused until the recording changes.
+            Recordings too large to be kept in memory get compiled and performed one chunk at a time instead.'''
+        if self.actions.has_spilled_actions():
+            self.playback_plan = None
+            for chunk in self.actions.iter_chunks():
+                compile_playback_plan(chunk, actions, coalesce).perform()
+            return
+        if self.playback_plan is None or self.playback_plan_coalesced != coalesce:
+            self.playback_plan = compile_playback_plan(list(self.actions), actions, coalesce)
+            self.playback_plan_coalesced = coalesce
+        self.playback_plan.perform()
 
-class CallbackManager:
-    def __init__(self):
-        self.functions = {}
-    
-    def insert_callback_function_with_name(self, callback_function, name: str):
-        self.functions[name] = callback_function
-    
-    def remove_callback_function_with_name(self, name: str):
-        self.functions.pop(name, 'Function not found')
-    
-    def is_listening(self):
-        return len(self.functions) > 0
-    
-    def handle_action(self, action):
-        for function_name in self.functions: self.functions[function_name](action)
+PRIMARY_MEMORY_SINK_NAME = 'primary memory'
+FILE_SINK_NAME = 'file'
+HISTORY_SINK_NAME = 'history'
+CALLBACK_SINK_NAME = 'callbacks'
+COMMAND_CHAIN_SINK_NAME = 'command chains'
+USAGE_STATISTICS_SINK_NAME = 'usage statistics'
+recording_in_file = False
+detecting_command_chains = False
+collecting_statistics = False
+recording_time_information = True
 
 time_difference_manager = TimeDifference()
-recorder = ActionRecorder()
+action_sinks = RecordingSinkPipeline()
+command_sinks = RecordingSinkPipeline()
+noise_sinks = RecordingSinkPipeline()
+recorder = ActionRecorder(action_sinks, lambda: OUTPUT_DIRECTORY)
 history = ActionHistory()
-callback_manager = CallbackManager()
+callback_dispatcher = CallbackDispatcher()
+history_descriptions = {}
+instrumentation = RecorderInstrumentation()
+command_chain_detector = CommandChainDetector()
+live_command_assembler = LiveCommandAssembler(command_chain_detector)
+usage_statistics = UsageStatistics()
 RECORDING_TAG_NAME = 'basic_action_recorder_recording'
 module.tag(RECORDING_TAG_NAME)
 recording_context = Context()
 recording_context.matches = 'tag: user.' + RECORDING_TAG_NAME
+INSTRUMENTATION_TAG_NAME = 'basic_action_recorder_instrumented'
+module.tag(INSTRUMENTATION_TAG_NAME)
+instrumentation_tag_context = Context()
+instrumented_recording_context = Context()
+instrumented_recording_context.matches = 'tag: user.' + RECORDING_TAG_NAME + '\ntag: user.' + INSTRUMENTATION_TAG_NAME
 
 def temporarily_stop_recording():
     recorder.temporarily_reject_actions()
-    history_was_recording = history.is_recording_history()
-    history.stop_recording_history()
-    return history_was_recording
 
-def resume_recording(history_was_recording: bool):
+def resume_recording():
     recorder.stop_temporarily_rejecting_actions()
-    if history_was_recording:
-        history.start_recording_history()
+
+def register_history_description(action_name: str, describe):
+    '''Makes the history show actions with the name using the description computed by describe from the arguments of the action'''
+    history_descriptions[action_name] = describe
+
+def record_action_to_history(action: BasicAction):
+    describe = history_descriptions.get(action.get_name())
+    if describe is not None:
+        history.record_action(describe, *action.get_arguments())
+
+def record_command_to_history(command_chain: str):
+    history.record_command(compute_command_description, command_chain)
+
+def record_noise_to_history(name: str, finished: bool, count: int = 1):
+    history.record_noise(compute_noise_description, name, finished, count)
+
+def record_noise_to_file_record(name: str, finished: bool, count: int = 1):
+    record_command_start_to_file_record(compute_noise_record_name(name, finished, count))
+
+def compute_noise_record_name(name: str, finished: bool, count: int):
+    if count > 1:
+        return 'noise_' + name + '_x' + str(count)
+    return 'noise_' + name + '_' + compute_noise_postfix(finished)
+
+def update_recording_sinks():
+    '''Turns the sinks on or off to match the recording state and only listens to actions while something needs them'''
+    for sinks in (action_sinks, command_sinks, noise_sinks):
+        sinks.set_sink_active(HISTORY_SINK_NAME, history.is_recording_history())
+        sinks.set_sink_active(FILE_SINK_NAME, recording_in_file)
+    action_sinks.set_sink_active(CALLBACK_SINK_NAME, callback_dispatcher.is_listening())
+    action_sinks.set_sink_active(COMMAND_CHAIN_SINK_NAME, detecting_command_chains)
+    command_sinks.set_sink_active(COMMAND_CHAIN_SINK_NAME, detecting_command_chains)
+    for sinks in (action_sinks, command_sinks, noise_sinks):
+        sinks.set_sink_active(USAGE_STATISTICS_SINK_NAME, collecting_statistics)
+    if action_sinks.is_active():
+        context.tags = ['user.' + RECORDING_TAG_NAME]
+    else:
+        context.tags = []
 
 @recording_context.action_class("main")
 class MainActions:
@@ -243,36 +534,76 @@ class MainActions:
         if recorder.is_temporarily_rejecting_actions():
             actions.next(text)
         else:
-            recorder.temporarily_reject_actions()
-            history_was_recording = history.is_recording_history()
-            history.stop_recording_history()
+            temporarily_stop_recording()
             actions.next(text)
-            recorder.stop_temporarily_rejecting_actions()
-            if history_was_recording:
-                history.start_recording_history()
+            resume_recording()
             recorder.record_basic_action('insert', [str(text)])
-            history.record_action(compute_insert_description(text))
 
     def key(key: str):
         actions.next(key)
         recorder.record_basic_action('key', [str(key)])
-        history.record_action(compute_key_description(key))
 
     def mouse_click(button: int = 0):
         actions.next(button)
         recorder.record_basic_action('mouse_click', [int(button)])
-        history.record_action(compute_mouse_click_description(button))
 
     def mouse_move(x: float, y: float):
         actions.next(x, y)
         recorder.record_basic_action('mouse_move', [float(x), float(y)])
-        history.record_action(compute_mouse_movement_description(x, y))
 
     def mouse_scroll(y: float = 0, x: float = 0, by_lines: bool = False):
         actions.next(y, x, by_lines)
         recorder.record_basic_action('mouse_scroll', [float(y), float(x), bool(by_lines)])
-        history.record_action(compute_mouse_scroll_description(y, x, by_lines))
 
+def time_action(name: str, *arguments):
+    '''Times the action without the time spent recording it, which the record stage measures separately'''
+    record_start_nanoseconds = instrumentation.compute_total_nanoseconds(RECORD_STAGE, name)
+    start_time = time.perf_counter_ns()
+    actions.next(*arguments)
+    nanoseconds = time.perf_counter_ns() - start_time
+    record_nanoseconds = instrumentation.compute_total_nanoseconds(RECORD_STAGE, name) - record_start_nanoseconds
+    instrumentation.record(ACTION_STAGE, name, max(nanoseconds - record_nanoseconds, 0))
+
+@instrumented_recording_context.action_class("main")
+class InstrumentedMainActions:
+    def insert(text: str):
+        time_action('insert', text)
+
+    def key(key: str):
+        time_action('key', key)
+
+    def mouse_click(button: int = 0):
+        time_action('mouse_click', button)
+
+    def mouse_move(x: float, y: float):
+        time_action('mouse_move', x, y)
+
+    def mouse_scroll(y: float = 0, x: float = 0, by_lines: bool = False):
+        time_action('mouse_scroll', y, x, by_lines)
+
+def update_instrumentation(enabled):
+    '''Installs timed versions of the recorder functions while instrumentation is enabled so that it costs nothing while disabled'''
+    if enabled:
+        instrumentation.enable()
+        recorder.set_instrumentation(instrumentation)
+        action_sinks.set_sink_wrapper(compute_sink_timer(lambda action: action.get_name()))
+        command_sinks.set_sink_wrapper(compute_sink_timer(lambda command_chain: 'phrase'))
+        noise_sinks.set_sink_wrapper(compute_sink_timer(lambda name, finished, count = 1: 'noise_' + name))
+        instrumentation_tag_context.tags = ['user.' + INSTRUMENTATION_TAG_NAME]
+    else:
+        instrumentation.disable()
+        recorder.set_instrumentation(None)
+        for sinks in (action_sinks, command_sinks, noise_sinks):
+            sinks.set_sink_wrapper(None)
+        instrumentation_tag_context.tags = []
+
+def compute_sink_timer(compute_name):
+    def wrap_sink(name, sink):
+        return instrumentation.compute_timed_function(SINK_STAGE_PREFIX + name, sink, compute_name)
+    return wrap_sink
+
+def compute_command_description(command_chain: str):
+    return 'Command: ' + command_chain
 
 def compute_insert_description(text: str):
     return f"Type: {text}"
@@ -318,6 +649,12 @@ def compute_mouse_scroll_partial_description(amount: float, is_vertical: bool, b
         text += ' Lines'
     return text
 
+register_history_description('insert', compute_insert_description)
+register_history_description('key', compute_key_description)
+register_history_description('mouse_click', compute_mouse_click_description)
+register_history_description('mouse_move', compute_mouse_movement_description)
+register_history_description('mouse_scroll', compute_mouse_scroll_description)
+
 
 context = Context()
 
@@ -325,27 +662,31 @@ context = Context()
 class Actions:
     def basic_action_recorder_start_recording():
         '''Causes the basic action recorder to start recording actions'''
-        start_recording()
         recorder.clear()
         recorder.start_recording_actions_in_primary_memory()
+        update_recording_sinks()
     
     def basic_action_recorder_stop_recording():
         '''Causes the basic action recorder to stop recording actions'''
         recorder.stop_recording_actions_in_primary_memory()
-        stop_recording_if_nothing_listening()
+        update_recording_sinks()
+        flush_record_file()
     
     def basic_action_recorder_type_talon_script():
         '''Types out the talon script of the recorded actions'''
-        recorder.stop_recording_actions_in_primary_memory()
-        stop_recording_if_nothing_listening()
-        code = recorder.compute_talon_script()
-        for line_of_code in code:
-            actions.insert(line_of_code)
-            actions.key('enter')
+        output_talon_script(settings.get(talon_script_output_mode))
+
+    def basic_action_recorder_output_talon_script(output_mode: str):
+        '''Outputs the talon script of the recorded actions with the specified output mode (lines, block, clipboard, or file)'''
+        output_talon_script(output_mode)
+
+    def basic_action_recorder_save_talon_script_as_command(command_name: str):
+        '''Saves the talon script of the recorded actions in a talon file as a command with the specified name'''
+        save_talon_script_as_command(command_name, compute_talon_script_for_output())
     
     def basic_action_recorder_play_recording():
         '''Plays the actions recorded by the basic action recorder'''
-        recorder.perform_actions()
+        recorder.perform_actions(settings.get(playback_coalescing) != 0)
 
     def basic_action_recorder_record_millisecond_sleep(milliseconds: int):
         '''Records a sleep action for the specified number of milliseconds in the basic action recorder'''
@@ -355,12 +696,12 @@ class Actions:
     def basic_action_recorder_record_history():
         '''Causes the basic action recorder to record the history of actions performed'''
         history.start_recording_history()
-        start_recording()
+        update_recording_sinks()
     
     def basic_action_recorder_stop_recording_history():
         '''Causes the basic action recorder to stop recording the history of actions performed'''
         history.stop_recording_history()
-        stop_recording_if_nothing_listening()
+        update_recording_sinks()
     
     def basic_action_recorder_show_history():
         '''Shows the basic action recorder history of actions performed'''
@@ -372,13 +713,25 @@ class Actions:
     
     def basic_action_recorder_register_callback_function_with_name(callback_function: Callable, name: str):
         '''Registers a callback function with specified name to receive basic actions performed'''
-        callback_manager.insert_callback_function_with_name(callback_function, name)
-        start_recording()
+        callback_dispatcher.insert_callback_function_with_name(callback_function, name)
+        update_recording_sinks()
     
+    def basic_action_recorder_register_filtered_callback_function_with_name(callback_function: Callable, name: str, action_names: list = None,
+            asynchronous: bool = False, batch: bool = False, overflow_policy: str = DROP_OLDEST_OVERFLOW_POLICY):
+        '''Registers a callback function with specified name to receive the basic actions performed with the specified names (or all of them if no names are given).
+            An asynchronous callback function gets called from a background thread, with a list of actions if batch is true.
+            When its queue is full, overflow_policy determines if the oldest queued action gets dropped (drop oldest) or the action waits for room (block).'''
+        if asynchronous:
+            subscriber = AsynchronousCallbackSubscriber(name, callback_function, action_names, batch, overflow_policy)
+        else:
+            subscriber = CallbackSubscriber(name, callback_function, action_names)
+        callback_dispatcher.insert_subscriber(subscriber)
+        update_recording_sinks()
+
     def basic_action_recorder_unregister_callback_function_with_name(name: str):
         '''Unregisters the specified callback function using the name it was registered with'''
-        callback_manager.remove_callback_function_with_name(name)
-        stop_recording_if_nothing_listening()
+        callback_dispatcher.remove_callback_function_with_name(name)
+        update_recording_sinks()
     
     def basic_action_recorder_update_active_record_name(postfix: str):
         '''Updates the name of the active record that the basic action recorder will record to when
@@ -391,21 +744,206 @@ class Actions:
         '''Types out the path to the basic action recorder data directory'''
         actions.insert(OUTPUT_DIRECTORY)
 
-def start_recording():
-    context.tags = ['user.' + RECORDING_TAG_NAME]
+    def basic_action_recorder_log_startup_timing():
+        '''Logs how long each stage of setting up the basic action recorder took when talon started'''
+        log('found the active record with a', active_record_source)
+        for name, seconds in startup_timings:
+            log(f'{name}: {seconds*1000:.2f} ms')
+        log(f'total: {sum(seconds for _, seconds in startup_timings)*1000:.2f} ms')
 
-def stop_recording_if_nothing_listening():
-    if not (recorder.should_record_when_not_temporarily_rejecting_actions() or history.is_recording_history()):
-        context.tags = []
+    def basic_action_recorder_import_records_into_database():
+        '''Imports every record in BAR Data into the record database in the background, replacing what was imported from them before'''
+        record_database_writer.run_database_task(import_records_into_database)
+
+    def basic_action_recorder_log_command_count(command_name: str, days: int = 7):
+        '''Logs how many times the command was recorded in the record database in total and during the last number of days'''
+        database = RecordDatabase(compute_record_database_path(OUTPUT_DIRECTORY))
+        try:
+            total_count = database.count_commands(command_name)
+            recent_count = database.count_commands(command_name, start_time = time.time() - days*SECONDS_PER_DAY)
+        finally:
+            database.close()
+        log(command_name, 'recorded', total_count, 'times in total and', recent_count, 'times in the last', days, 'days')
+
+    def basic_action_recorder_log_recording_buffer_statistics():
+        '''Logs how many recorded actions are in memory and how many were spilled to a file along with the spilled bytes'''
+        log('recording buffer', recorder.get_buffer_statistics())
+
+    def basic_action_recorder_log_record_file_writer_statistics():
+        '''Logs the queue depth and dropped line counts of the basic action recorder record file writer'''
+        log('record file writer', record_file_writer.get_statistics())
+
+    def basic_action_recorder_log_callback_statistics():
+        '''Logs the delivered, dropped, and failed action counts and the delivery latency of every registered callback function'''
+        for statistics in callback_dispatcher.get_statistics():
+            log('callback', statistics)
+
+    def basic_action_recorder_log_instrumentation_statistics():
+        '''Logs the percentiles of how long every stage of recording took for every action, command, and noise while instrumentation was enabled'''
+        for summary in instrumentation.compute_summaries():
+            log(summary)
+
+    def basic_action_recorder_reset_instrumentation_statistics():
+        '''Forgets the timing collected by the basic action recorder instrumentation'''
+        instrumentation.reset()
+
+    def basic_action_recorder_show_instrumentation_statistics():
+        '''Shows the basic action recorder instrumentation panel'''
+        instrumentation_gui.show()
+
+    def basic_action_recorder_hide_instrumentation_statistics():
+        '''Hides the basic action recorder instrumentation panel'''
+        instrumentation_gui.hide()
+
+    def basic_action_recorder_log_frequent_command_chains(count: int = 10):
+        '''Logs the command chains that were spoken together most often while command chain detection was enabled'''
+        log('completed command chains', command_chain_detector.get_completed_chain_count())
+        for frequency in command_chain_detector.compute_most_frequent_chains(count):
+            log(frequency)
+
+    def basic_action_recorder_set_noise_timing(name: str, start_delay_milliseconds: int = 0, minimum_duration_milliseconds: int = 0,
+            coalescing_window_milliseconds: int = 0):
+        '''Sets how the basic action recorder recognizes the noise. The start of a noise gets recorded once it lasts the start delay,
+            and a noise that stops before lasting the minimum duration does not get recorded at all.
+            Noises within the coalescing window of each other get recorded as a single noise with a count.'''
+        noise_scheduler.set_noise_timing(name, NoiseTiming(start_delay_milliseconds/1000, minimum_duration_milliseconds/1000,
+            coalescing_window_milliseconds/1000))
+
+    def basic_action_recorder_show_usage_statistics():
+        '''Shows the basic action recorder usage statistics panel'''
+        usage_statistics_gui.show()
+
+    def basic_action_recorder_hide_usage_statistics():
+        '''Hides the basic action recorder usage statistics panel'''
+        usage_statistics_gui.hide()
+
+    def basic_action_recorder_save_usage_statistics():
+        '''Saves a snapshot of the usage statistics as a JSON file in the usage statistics directory of BAR Data'''
+        save_usage_statistics_snapshot(usage_statistics.compute_snapshot())
+
+    def basic_action_recorder_reset_usage_statistics():
+        '''Forgets the usage statistics collected so far'''
+        usage_statistics.reset()
 
 def start_recording_when_should_record_in_file(should_record_in_file):
-    if should_record_in_file:
-        start_recording()
+    global recording_in_file
+    if not should_record_in_file:
+        noise_scheduler.flush()
+    recording_in_file = bool(should_record_in_file)
+    update_recording_sinks()
+    if recording_in_file:
         record_recording_start_to_file_if_needed()
     else:
-        stop_recording_if_nothing_listening()
+        flush_record_file()
+
+def update_recording_in_database(should_record):
+    global recording_in_database
+    recording_in_database = bool(should_record)
+
+def import_records_into_database(database: RecordDatabase):
+    for name in sorted(os.listdir(OUTPUT_DIRECTORY)):
+        if is_record_file_name(name):
+            command_count = import_record(database, os.path.join(OUTPUT_DIRECTORY, name))
+            log('imported', command_count, 'commands from', name, 'into the record database')
+
+def update_command_chain_detection(should_detect_command_chains):
+    global detecting_command_chains
+    detecting_command_chains = bool(should_detect_command_chains)
+    if not detecting_command_chains:
+        live_command_assembler.finish()
+    update_recording_sinks()
+
+def update_usage_statistics_collection(should_collect_statistics):
+    global collecting_statistics
+    collecting_statistics = bool(should_collect_statistics)
+    update_recording_sinks()
+
+def save_usage_statistics_snapshot(snapshot: dict):
+    # The snapshot is taken right away, but writing it is left to the record file writer thread
+    def save():
+        path = write_usage_statistics_snapshot(OUTPUT_DIRECTORY, snapshot)
+        log('saved usage statistics to', path)
+    record_file_writer.run_file_task(save)
+
+def update_hissing_start_time(milliseconds: int):
+    noise_scheduler.set_noise_start_delay('hiss', milliseconds/1000)
+
+def update_pop_coalescing_window(milliseconds: int):
+    noise_scheduler.set_noise_coalescing_window('pop', milliseconds/1000)
+
+def update_command_chain_gap(milliseconds: int):
+    command_chain_detector.set_maximum_gap_seconds(milliseconds/1000)
+
+def update_recording_time_information(should_record_time_information):
+    global recording_time_information
+    recording_time_information = bool(should_record_time_information)
     
+def output_talon_script(output_mode: str):
+    if output_mode not in TALON_SCRIPT_OUTPUT_MODES:
+        print('Basic Action Recorder: unknown talon script output mode', output_mode, 'using', LINES_OUTPUT_MODE)
+        output_mode = LINES_OUTPUT_MODE
+    code = compute_talon_script_for_output()
+    if output_mode == LINES_OUTPUT_MODE:
+        for line_of_code in code:
+            actions.insert(line_of_code)
+            actions.key('enter')
+    elif output_mode == BLOCK_OUTPUT_MODE:
+        actions.insert(compute_talon_script_block(code))
+    elif output_mode == CLIPBOARD_OUTPUT_MODE:
+        paste_text_preserving_clipboard(compute_talon_script_block(code))
+    else:
+        save_talon_script_as_command(compute_unused_recorded_command_name(compute_recorded_commands_directory()), code)
+
+def compute_talon_script_for_output():
+    recorder.stop_recording_actions_in_primary_memory()
+    update_recording_sinks()
+    return recorder.iter_talon_script(compute_talon_script_optimization_passes_from_settings())
+
+CLIPBOARD_PASTE_DELAY = '150ms'
+def paste_text_preserving_clipboard(text: str):
+    with clip.revert():
+        clip.set_text(text)
+        actions.edit.paste()
+        # The application reads the clipboard after the paste keystroke arrives, so restoring it immediately could paste the old contents
+        actions.sleep(CLIPBOARD_PASTE_DELAY)
+
+def compute_recorded_commands_directory():
+    return os.path.join(OUTPUT_DIRECTORY, RECORDED_COMMANDS_DIRECTORY_NAME)
+
+def save_talon_script_as_command(command_name: str, code):
+    if recorder.empty():
+        print('Basic Action Recorder: not saving', command_name, 'because no actions were recorded')
+        return
+    directory = compute_recorded_commands_directory()
+    if not compute_talon_command_rule(command_name):
+        fallback_command_name = compute_unused_recorded_command_name(directory)
+        print('Basic Action Recorder: the command name', repr(command_name), 'does not contain any words, so using', fallback_command_name, 'instead')
+        command_name = fallback_command_name
+    path = write_talon_command_file(directory, command_name, code)
+    print('Basic Action Recorder: saved the recording as the command', compute_talon_command_rule(command_name), 'in', path)
+
+def compute_talon_script_optimization_passes_from_settings():
+    optimization_names = settings.get(talon_script_optimizations).replace(',', ' ').split()
+    passes, unknown_names = compute_talon_script_optimization_passes(optimization_names)
+    if unknown_names:
+        print('Basic Action Recorder: ignoring unknown talon script optimizations', unknown_names)
+    return passes
+
 settings.register('user.basic_action_recorder_record_in_file', start_recording_when_should_record_in_file)
+settings.register(should_record_time_information, update_recording_time_information)
+settings.register(record_file_format, update_record_file_format)
+settings.register(record_rotation_size, update_record_rotation_policy)
+settings.register(record_rotation_age, update_record_rotation_policy)
+settings.register(record_segment_compression, update_record_rotation_policy)
+settings.register(history_size, history.set_capacity)
+settings.register(instrumentation_enabled, update_instrumentation)
+settings.register(command_chain_detection, update_command_chain_detection)
+settings.register(maximum_recorded_actions_in_memory, recorder.set_maximum_actions_in_memory)
+settings.register(command_chain_gap, update_command_chain_gap)
+settings.register(should_record_in_database, update_recording_in_database)
+settings.register(hissing_start_time, update_hissing_start_time)
+settings.register(pop_coalescing_window, update_pop_coalescing_window)
+settings.register(usage_statistics_enabled, update_usage_statistics_collection)
 
 def log(*args):
     string_arguments = []
@@ -415,62 +953,86 @@ def log(*args):
     print('Basic Action Recorder:', text)
 
 def record_recording_start_to_file_if_needed():
-    if settings.get(should_record_time_information):
-        record_output_to_file(RECORDING_START_MESSAGE)
+    if recording_time_information:
+        record_entry_to_file(create_recording_start_record_entry())
 
-def record_command_start_to_file_record(text: str):
-    output = []
+def record_command_start_to_file_record(name: str):
+    entries = []
     time_difference_manager.receive_current_time()
-    if settings.get(should_record_time_information):
+    if recording_time_information:
         time_difference = time_difference_manager.get_difference()
-        time_difference_text = compute_time_difference_text(time_difference)
-        output.append(time_difference_text)
-    output.append(text)
-    record_outputs_to_file(output)
+        entries.append(create_time_difference_record_entry(time_difference))
+    entries.append(create_command_start_record_entry(name))
+    record_entries_to_file(entries)
 
-def record_action_to_file_record(text: str):
+def record_action_to_file_record(action: BasicAction):
     time_difference_manager.receive_current_time()
-    record_output_to_file(text)
+    record_entry_to_file(create_action_record_entry(action))
 
-def record_outputs_to_file(outputs):
-    with open(primary_output_path, 'a') as file:
-        for output in outputs:
-            write_output_line_to_file(output, file)
+def record_entries_to_file(entries):
+    record_file_writer.write_entries(entries)
+    if recording_in_database:
+        record_database_writer.write_entries(entries)
 
-def record_output_to_file(text: str):
-    with open(primary_output_path, 'a') as file:
-        write_output_line_to_file(text, file)
+def record_entry_to_file(entry):
+    record_file_writer.write_entry(entry)
+    if recording_in_database:
+        record_database_writer.write_entries((entry,))
 
-def write_output_line_to_file(output, file):
-    file.write(output + '\n')
+def flush_record_file():
+    if not record_file_writer.flush(RECORD_FILE_FLUSH_TIMEOUT_SECONDS):
+        log('timed out while flushing the record file')
+
+def close_record_file():
+    noise_scheduler.flush()
+    record_file_writer.close(RECORD_FILE_FLUSH_TIMEOUT_SECONDS)
+    save_active_record_state()
+    record_database_writer.close(RECORD_FILE_FLUSH_TIMEOUT_SECONDS)
+
+def close_callbacks():
+    callback_dispatcher.close(CALLBACK_CLOSE_TIMEOUT_SECONDS)
+
+atexit.register(close_record_file)
+atexit.register(close_callbacks)
+atexit.register(recorder.close)
+
+action_sinks.register_sink(FILE_SINK_NAME, record_action_to_file_record)
+action_sinks.register_sink(HISTORY_SINK_NAME, record_action_to_history)
+action_sinks.register_sink(CALLBACK_SINK_NAME, callback_dispatcher.handle_action)
+action_sinks.register_sink(COMMAND_CHAIN_SINK_NAME, live_command_assembler.receive_action)
+command_sinks.register_sink(HISTORY_SINK_NAME, record_command_to_history)
+command_sinks.register_sink(FILE_SINK_NAME, record_command_start_to_file_record)
+command_sinks.register_sink(COMMAND_CHAIN_SINK_NAME, live_command_assembler.receive_command_start)
+noise_sinks.register_sink(HISTORY_SINK_NAME, record_noise_to_history)
+noise_sinks.register_sink(FILE_SINK_NAME, record_noise_to_file_record)
+for sinks, sink in ((action_sinks, usage_statistics.record_action), (command_sinks, usage_statistics.record_command), (noise_sinks, usage_statistics.record_noise)):
+    sinks.register_sink(USAGE_STATISTICS_SINK_NAME, sink)
 
 def on_phrase(j):
-    global history
-    if actions.speech.enabled() and (history.is_recording_history() or settings.get(should_record_in_file) != 0):
+    sinks = command_sinks.get_active_sinks()
+    if sinks and actions.speech.enabled():
         words = j.get('text')
         if words:
             command_chain = ' '.join(words)
-            if history.is_recording_history():
-                history.record_action('Command: ' + command_chain)
-            if settings.get(should_record_in_file) != 0:
-                record_command_start_to_file_record('Command: ' + command_chain)
+            for sink in sinks: sink(command_chain)
 
 speech_system.register('phrase', on_phrase)
 
-def record_hiss(finished: bool):
-    record_noise('hiss', finished)
+def record_noise(name: str, finished: bool, count: int = 1):
+    noise_sinks.process(name, finished, count)
 
-def record_noise(name: str, finished: bool):
-    if history.is_recording_history():
-        history.record_action(f'Noise: {name} {compute_noise_postfix(finished)}')
-    
-    if settings.get(should_record_in_file):
-        record_command_start_to_file_record('Command: ' + 'noise_' + name + '_' + compute_noise_postfix(finished))
+def schedule_noise_timer(seconds: float, callback):
+    # Rounding up keeps the timer from firing just before the deadline it was scheduled for
+    return cron.after(f'{math.ceil(seconds*1000)}ms', callback)
 
-delayed_hiss_handler = DelayedHissingJobHandler(record_hiss)
+noise_scheduler = NoiseScheduler(record_noise, schedule_noise_timer, cron.cancel)
 def on_noise(name: str, finished: bool):
-    if name == 'hiss': delayed_hiss_handler.handled_delayed_hiss(finished)
-    else: record_noise(name, finished)
+    noise_scheduler.handle_noise(name, finished)
+
+def compute_noise_description(name: str, finished: bool, count: int = 1):
+    if count > 1:
+        return f'Noise: {name} x{count}'
+    return f'Noise: {name} {compute_noise_postfix(finished)}'
 
 def compute_noise_postfix(finished: bool):
     return "start" if finished else "end"
@@ -487,4 +1049,35 @@ def gui(gui: imgui.GUI):
     for description in history.get_action_history():
         gui.text(description)
 
+@imgui.open(y=0, x=500)
+def instrumentation_gui(gui: imgui.GUI):
+    gui.text("Basic Action Recorder Instrumentation (microseconds)")
+    gui.line()
+    if not instrumentation.is_enabled():
+        gui.text("Instrumentation is disabled")
+    for summary in instrumentation.compute_summaries()[:INSTRUMENTATION_PANEL_MAXIMUM_LINES]:
+        gui.text(f'{summary.stage} {summary.name}: {summary.count}, p50 {summary.percentile_microseconds[50]:.1f}, ' +
+            f'p99 {summary.percentile_microseconds[99]:.1f}, max {summary.maximum_microseconds:.1f}')
+
+@imgui.open(y=0, x=1000)
+def usage_statistics_gui(gui: imgui.GUI):
+    gui.text("Basic Action Recorder Usage Statistics")
+    gui.line()
+    if not collecting_statistics:
+        gui.text("Usage statistics are disabled")
+    gui.text(f'Commands: {usage_statistics.get_command_count()}, actions: {usage_statistics.get_action_count()}, ' +
+        f'actions per command: {usage_statistics.compute_average_actions_per_command():.2f}')
+    rates = usage_statistics.compute_commands_per_minute()
+    gui.text('Commands per minute: ' + ', '.join(f'{rate:.1f} over {window_seconds//60} min' for window_seconds, rate in rates.items()))
+    noise_counts = usage_statistics.compute_noise_counts()
+    if noise_counts:
+        gui.text('Noises: ' + ', '.join(f'{name} {count}' for name, count in noise_counts.items()))
+    for title, frequencies in (('Commands', usage_statistics.compute_most_common_commands(USAGE_STATISTICS_PANEL_ITEM_COUNT)),
+            ('Keys', usage_statistics.compute_most_common_keys(USAGE_STATISTICS_PANEL_ITEM_COUNT)),
+            ('Inserts', usage_statistics.compute_most_common_inserts(USAGE_STATISTICS_PANEL_ITEM_COUNT))):
+        gui.line()
+        gui.text(title)
+        for frequency in frequencies:
+            gui.text(str(frequency))
+
 app.register('ready', set_up)   
@@ -0,0 +1,57 @@
+import argparse
+import json
+import random
+import time
+
+def time_function(function):
+    start_time = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start_time, result
+
+def compute_synthetic_actions(action_records, command_count: int, include_sleeps: bool):
+    import synthetic_records
+    random_generator = random.Random(0)
+    actions = []
+    for _ in range(command_count):
+        _, representations = synthetic_records.compute_synthetic_action_representations(random_generator, include_sleeps)
+        for name, arguments in representations:
+            if name == 'sleep':
+                arguments = [action_records.TalonTimeSpecification(arguments[0], 'ms')]
+            actions.append(action_records.BasicAction(name, arguments))
+    return actions
+
+def run_benchmark(command_count: int):
+    import benchmark_support
+    action_records = benchmark_support.import_recorder_module('action_records')
+    # The encoder used before the codecs, which could not encode sleeps
+    def encode_with_json_encoder(action):
+        return json.dumps({'name': action.get_name(), 'arguments': action.get_arguments()}, cls = action_records.BasicActionEncoder)
+    actions = compute_synthetic_actions(action_records, command_count, False)
+    actions_with_sleeps = compute_synthetic_actions(action_records, command_count, True)
+    json_encoder_seconds, json_encoder_texts = time_function(lambda: [encode_with_json_encoder(action) for action in actions])
+    codec_encode_seconds, codec_texts = time_function(lambda: [action.to_json() for action in actions])
+    decoded_actions = [action_records.BasicAction.from_json(text) for text in codec_texts]
+    decoded_actions_with_sleeps = [action_records.BasicAction.from_json(action.to_json()) for action in actions_with_sleeps]
+    return {
+        'commit': benchmark_support.compute_git_commit(),
+        'action_count': len(actions),
+        'json_encoder_actions_per_second': len(actions)/json_encoder_seconds,
+        'codec_encode_actions_per_second': len(actions)/codec_encode_seconds,
+        'encode_speedup': json_encoder_seconds/codec_encode_seconds,
+        'encoded_text_matches_json_encoder': codec_texts == json_encoder_texts,
+        'round_trip_matches': decoded_actions == actions,
+        'sleep_count': sum(1 for action in actions_with_sleeps if action.get_name() == 'sleep'),
+        'round_trip_with_sleeps_matches': decoded_actions_with_sleeps == actions_with_sleeps,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Compares encoding the actions of synthetic commands as JSON with the action codecs and with the json module and checks that they decode back')
+    parser.add_argument('--commands', type = int, default = 100000)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_benchmark(arguments.commands)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
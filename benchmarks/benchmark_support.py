@@ -0,0 +1,39 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+# Talon loads every python file in the user directory, so the benchmarks only import the recorder modules when run as scripts.
+
+def compute_repository_directory() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_recorder_module(name: str):
+    '''Imports a module of the basic action recorder as part of a package named after the repository directory so that its relative imports work'''
+    repository_directory = compute_repository_directory()
+    parent_directory = os.path.dirname(repository_directory)
+    if parent_directory not in sys.path:
+        sys.path.insert(0, parent_directory)
+    return importlib.import_module(os.path.basename(repository_directory) + '.' + name)
+
+def use_talon_stub():
+    '''Makes importing talon import the stand-in in talon_stub, so that modules that use talon can be imported outside of it'''
+    stub_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'talon_stub')
+    if stub_directory not in sys.path:
+        sys.path.insert(0, stub_directory)
+    import talon
+    return talon
+
+def compute_git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = compute_repository_directory(), capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def output_results(results, output_path: str = None):
+    text = json.dumps(results, indent = 4)
+    print(text)
+    if output_path:
+        with open(output_path, 'w') as file:
+            file.write(text + '\n')
@@ -0,0 +1,73 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+def time_function(function):
+    start_time = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start_time, result
+
+def measure_peak_memory(function) -> int:
+    tracemalloc.start()
+    function()
+    peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak_memory_bytes
+
+def run_benchmark(command_count: int):
+    import benchmark_support
+    import synthetic_records
+    record_files = benchmark_support.import_recorder_module('record_files')
+    lazy_records = benchmark_support.import_recorder_module('lazy_records')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'record.txt')
+        action_count = synthetic_records.write_synthetic_text_record(path, command_count)
+        def compute_command_names_from_parser():
+            return [record.get_name() for record in record_files.read_file_record(path) if record.is_command_record()]
+        def compute_command_names_from_lazy_records():
+            with lazy_records.LazyRecordReader(path) as reader:
+                return [record.get_name() for record in reader.iter_records() if record.is_command_record()]
+        def compute_command_names_from_scan():
+            with lazy_records.LazyRecordReader(path) as reader:
+                return list(reader.iter_command_names())
+        def compute_action_count_from_parser():
+            return sum(len(record.get_actions()) for record in record_files.read_file_record(path) if record.is_command_record())
+        def compute_action_count_from_line_counts():
+            with lazy_records.LazyRecordReader(path) as reader:
+                return reader.compute_line_counts().action_count
+        parser_names_seconds, parser_names = time_function(compute_command_names_from_parser)
+        lazy_names_seconds, lazy_names = time_function(compute_command_names_from_lazy_records)
+        scan_names_seconds, scan_names = time_function(compute_command_names_from_scan)
+        parser_count_seconds, parser_action_count = time_function(compute_action_count_from_parser)
+        line_count_seconds, line_action_count = time_function(compute_action_count_from_line_counts)
+        # Tracing allocations slows everything down, so memory gets measured in separate runs
+        parser_peak_memory_bytes = measure_peak_memory(compute_command_names_from_parser)
+        lazy_peak_memory_bytes = measure_peak_memory(lambda: lazy_records.read_lazy_file_record(path))
+    return {
+        'commit': benchmark_support.compute_git_commit(),
+        'command_count': command_count,
+        'action_count': action_count,
+        'parser_command_names_seconds': parser_names_seconds,
+        'lazy_command_names_seconds': lazy_names_seconds,
+        'scanned_command_names_seconds': scan_names_seconds,
+        'command_names_match': parser_names == lazy_names == scan_names,
+        'parser_action_count_seconds': parser_count_seconds,
+        'line_counts_action_count_seconds': line_count_seconds,
+        'action_counts_match': parser_action_count == line_action_count,
+        'parser_peak_memory_bytes': parser_peak_memory_bytes,
+        'lazy_records_peak_memory_bytes': lazy_peak_memory_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Compares reading command names and counting actions of a synthetic record with the memory mapped lazy reader and the record parser')
+    parser.add_argument('--commands', type = int, default = 100000)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_benchmark(arguments.commands)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import tempfile
+import time
+
+def compute_records_key(records):
+    return [(str(record), record.get_seconds_since_action()) if record.is_command_record() else 'START' for record in records]
+
+def run_benchmark(command_count: int, file_count: int, chunk_size_bytes: int, maximum_workers: int):
+    import benchmark_support
+    import synthetic_records
+    parallel_records = benchmark_support.import_recorder_module('parallel_records')
+    results = {'command_count': command_count, 'file_count': file_count, 'chunk_size_bytes': chunk_size_bytes, 'cpu_count': os.cpu_count(), 'runs': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(file_count):
+            name = 'record.txt' if index == 0 else f'record {index}.txt'
+            synthetic_records.write_synthetic_text_record(os.path.join(directory, name), command_count//file_count, seed = index)
+        results['total_bytes'] = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        start_time = time.perf_counter()
+        sequential_collection = parallel_records.read_all_records(directory, workers = 1)
+        sequential_seconds = time.perf_counter() - start_time
+        expected_records = compute_records_key(sequential_collection.get_records())
+        results['runs'].append({'workers': 1, 'seconds': sequential_seconds, 'speedup': 1.0, 'matches_sequential': True})
+        for workers in range(2, maximum_workers + 1):
+            start_time = time.perf_counter()
+            collection = parallel_records.read_all_records(directory, workers = workers, chunk_size_bytes = chunk_size_bytes)
+            seconds = time.perf_counter() - start_time
+            results['runs'].append({
+                'workers': workers,
+                'seconds': seconds,
+                'speedup': sequential_seconds/seconds,
+                'matches_sequential': compute_records_key(collection.get_records()) == expected_records
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measures how parsing every record in a directory scales with the number of worker processes')
+    parser.add_argument('--commands', type = int, default = 200000)
+    parser.add_argument('--files', type = int, default = 4)
+    parser.add_argument('--chunk-size', type = int, default = 4*1024*1024)
+    parser.add_argument('--maximum-workers', type = int, default = max(2, os.cpu_count() or 1))
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_benchmark(arguments.commands, arguments.files, arguments.chunk_size, arguments.maximum_workers)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import collections
+import math
+import os
+import tempfile
+import time
+
+def time_function(function):
+    start_time = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start_time, result
+
+def compute_aggregates_with_loops(records):
+    '''Computes the aggregates the way analyses did before the record columns, looping over the actions of every command'''
+    gaps = []
+    actions_per_command = []
+    action_name_counts = collections.Counter()
+    key_frequencies = collections.Counter()
+    mouse_travel_distance = 0
+    last_position = None
+    for record in records:
+        if not record.is_command_record():
+            last_position = None
+            continue
+        if record.get_seconds_since_action() is not None:
+            gaps.append(record.get_seconds_since_action())
+        actions = record.get_actions()
+        actions_per_command.append(len(actions))
+        for action in actions:
+            name = action.get_name()
+            action_name_counts[name] += 1
+            arguments = action.get_arguments()
+            if name == 'key' and arguments:
+                key_frequencies[arguments[0]] += 1
+            elif name == 'mouse_move' and len(arguments) >= 2:
+                if last_position is not None:
+                    mouse_travel_distance += math.hypot(arguments[0] - last_position[0], arguments[1] - last_position[1])
+                last_position = arguments
+    return gaps, actions_per_command, dict(action_name_counts), dict(key_frequencies), mouse_travel_distance
+
+def compute_aggregates_with_columns(record_columns, columns):
+    return (
+        record_columns.compute_command_gaps(columns).tolist(),
+        record_columns.compute_actions_per_command(columns).tolist(),
+        record_columns.compute_action_name_counts(columns),
+        record_columns.compute_key_frequencies(columns),
+        record_columns.compute_mouse_travel_distance(columns),
+    )
+
+def are_aggregates_matching(loop_aggregates, column_aggregates) -> bool:
+    return loop_aggregates[:4] == column_aggregates[:4] and math.isclose(loop_aggregates[4], column_aggregates[4])
+
+def run_benchmark(command_count: int):
+    import benchmark_support
+    import synthetic_records
+    record_files = benchmark_support.import_recorder_module('record_files')
+    record_columns = benchmark_support.import_recorder_module('record_columns')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'record.txt')
+        cache_path = os.path.join(directory, 'record_columns.npz')
+        action_count = synthetic_records.write_synthetic_text_record(path, command_count)
+        parse_seconds, records = time_function(lambda: record_files.read_file_record(path))
+        loop_seconds, loop_aggregates = time_function(lambda: compute_aggregates_with_loops(records))
+        build_seconds, columns = time_function(lambda: record_columns.compute_record_columns([(path, records)]))
+        column_seconds, column_aggregates = time_function(lambda: compute_aggregates_with_columns(record_columns, columns))
+        uncached_seconds, _ = time_function(lambda: record_columns.read_record_columns(path, cache_path))
+        cached_seconds, cached_columns = time_function(lambda: record_columns.read_record_columns(path, cache_path))
+        cache_bytes = os.path.getsize(cache_path)
+        record_bytes = os.path.getsize(path)
+    return {
+        'commit': benchmark_support.compute_git_commit(),
+        'command_count': command_count,
+        'action_count': action_count,
+        'parse_seconds': parse_seconds,
+        'loop_aggregates_seconds': loop_seconds,
+        'build_columns_seconds': build_seconds,
+        'column_aggregates_seconds': column_seconds,
+        'aggregate_speedup': loop_seconds/column_seconds,
+        'aggregates_match': are_aggregates_matching(loop_aggregates, column_aggregates),
+        'read_and_save_cache_seconds': uncached_seconds,
+        'load_cache_seconds': cached_seconds,
+        'cached_aggregates_match': are_aggregates_matching(loop_aggregates, compute_aggregates_with_columns(record_columns, cached_columns)),
+        'record_bytes': record_bytes,
+        'cache_bytes': cache_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Compares computing aggregates of a synthetic record with Python loops and with numpy record columns and times the .npz cache')
+    parser.add_argument('--commands', type = int, default = 100000)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_benchmark(arguments.commands)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+import time
+
+def time_function(function):
+    start_time = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start_time, result
+
+def run_benchmark(command_count: int, command_name: str, action_name: str):
+    import benchmark_support
+    import synthetic_records
+    record_files = benchmark_support.import_recorder_module('record_files')
+    record_database = benchmark_support.import_recorder_module('record_database')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'record.txt')
+        action_count = synthetic_records.write_synthetic_text_record(path, command_count)
+        database = record_database.RecordDatabase(record_database.compute_record_database_path(directory))
+        import_seconds, imported_command_count = time_function(lambda: record_database.import_record(database, path))
+        def scan_for_command_count():
+            return sum(1 for record in record_files.iter_file_record(path) if record.is_command_record() and record.get_name() == command_name)
+        def scan_for_commands_with_action():
+            return sum(1 for record in record_files.iter_file_record(path)
+                if record.is_command_record() and any(action.get_name() == action_name for action in record.get_actions()))
+        scan_count_seconds, scanned_command_count = time_function(scan_for_command_count)
+        scan_action_seconds, scanned_action_command_count = time_function(scan_for_commands_with_action)
+        query_count_seconds, queried_command_count = time_function(lambda: database.count_commands(command_name))
+        query_action_seconds, queried_action_commands = time_function(lambda: database.compute_commands_with_action(action_name))
+        query_following_seconds, following_commands = time_function(lambda: database.compute_commands_following(command_name, 100))
+        database_bytes = os.path.getsize(database.get_path())
+        database.close()
+    return {
+        'commit': benchmark_support.compute_git_commit(),
+        'command_count': command_count,
+        'action_count': action_count,
+        'imported_command_count': imported_command_count,
+        'import_seconds': import_seconds,
+        'database_bytes': database_bytes,
+        'scan_command_count_seconds': scan_count_seconds,
+        'query_command_count_seconds': query_count_seconds,
+        'command_counts_match': scanned_command_count == queried_command_count,
+        'scan_commands_with_action_seconds': scan_action_seconds,
+        'query_commands_with_action_seconds': query_action_seconds,
+        'commands_with_action_match': scanned_action_command_count == len(queried_action_commands),
+        'query_100_following_commands_seconds': query_following_seconds,
+        'following_command_count': len(following_commands),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Compares querying a synthetic record imported into the record database with scanning the record file')
+    parser.add_argument('--commands', type = int, default = 100000)
+    parser.add_argument('--command-name', default = 'snip funky')
+    parser.add_argument('--action-name', default = 'mouse_scroll')
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_benchmark(arguments.commands, arguments.command_name, arguments.action_name)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
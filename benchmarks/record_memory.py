@@ -0,0 +1,58 @@
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+def measure_allocated_bytes(create):
+    '''Returns what create returns along with the bytes it left allocated and how long it took'''
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    value = create()
+    seconds = time.perf_counter() - start_time
+    gc.collect()
+    allocated_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, allocated_bytes, seconds
+
+def compute_action_count(records):
+    return sum(len(record.get_actions()) for record in records if record.is_command_record())
+
+def run_benchmark(action_count: int):
+    import synthetic_records
+    import benchmark_support
+    record_files = benchmark_support.import_recorder_module('record_files')
+    command_store = benchmark_support.import_recorder_module('command_store')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'record.txt')
+        # The synthetic records average close to 8 actions per command
+        command_count = action_count//8
+        written_action_count = synthetic_records.write_synthetic_text_record(path, command_count)
+        records, record_list_bytes, record_list_seconds = measure_allocated_bytes(lambda: record_files.read_file_record(path))
+        store, store_bytes, store_seconds = measure_allocated_bytes(lambda: command_store.CommandStore(records))
+        file_size = os.path.getsize(path)
+    matches = all(str(stored) == str(record) and stored.get_seconds_since_action() == record.get_seconds_since_action()
+        for stored, record in zip(store, records) if record.is_command_record())
+    return {
+        'file_bytes': file_size,
+        'command_count': len(records),
+        'action_count': written_action_count,
+        'parsed_action_count': compute_action_count(records),
+        'record_list': {'bytes': record_list_bytes, 'bytes_per_action': record_list_bytes/written_action_count, 'seconds': record_list_seconds},
+        'command_store': {'bytes': store_bytes, 'bytes_per_action': store_bytes/written_action_count, 'seconds': store_seconds},
+        'reduction': record_list_bytes/store_bytes,
+        'command_store_matches_records': matches and len(store) == len(records),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measures the memory used by a parsed record as a list of commands and as a command store')
+    parser.add_argument('--actions', type = int, default = 1000000)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    benchmark_support.output_results(run_benchmark(arguments.actions), arguments.output)
+
+if __name__ == '__main__':
+    main()
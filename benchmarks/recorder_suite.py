@@ -0,0 +1,270 @@
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+MAIN_ACTION_NAMES = ('insert', 'key', 'mouse_click', 'mouse_move', 'mouse_scroll')
+BENCHMARK_CALLBACK_NAME = 'benchmark'
+
+class Scenario:
+    '''A workload that performs operation_count operations every time run gets called.
+        set_up gets called before every run and is not measured.'''
+    def __init__(self, name: str, operation_count: int, run, set_up = None):
+        self.name = name
+        self.operation_count = operation_count
+        self.run = run
+        self.set_up = set_up
+
+    def measure(self, repetitions: int, measure_memory: bool):
+        best_seconds = None
+        for _ in range(repetitions):
+            if self.set_up: self.set_up()
+            start_time = time.perf_counter()
+            self.run()
+            seconds = time.perf_counter() - start_time
+            if best_seconds is None or seconds < best_seconds:
+                best_seconds = seconds
+        # Small scales can leave a scenario without operations, and a coarse clock can measure a run as taking no time
+        result = {
+            'operations': self.operation_count,
+            'seconds': best_seconds,
+            'operations_per_second': self.operation_count/best_seconds if best_seconds > 0 else None,
+            'nanoseconds_per_operation': best_seconds*1e9/self.operation_count if self.operation_count > 0 else None,
+        }
+        if measure_memory:
+            if self.set_up: self.set_up()
+            tracemalloc.start()
+            self.run()
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return result
+
+class RecorderBenchmark:
+    '''Drives the basic action recorder through the talon stub'''
+    def __init__(self, talon, recorder_module):
+        self.talon = talon
+        self.recorder_module = recorder_module
+        self.received_action_count = 0
+
+    def configure(self, primary_memory: bool = False, file_format: str = None, history: bool = False, callbacks: bool = False):
+        recorder_module = self.recorder_module
+        recorder_module.recorder.clear()
+        if primary_memory:
+            recorder_module.recorder.start_recording_actions_in_primary_memory()
+        else:
+            recorder_module.recorder.stop_recording_actions_in_primary_memory()
+        if history:
+            recorder_module.history.start_recording_history()
+        else:
+            recorder_module.history.stop_recording_history()
+        recorder_module.callback_dispatcher.remove_callback_function_with_name(BENCHMARK_CALLBACK_NAME)
+        if callbacks:
+            recorder_module.callback_dispatcher.insert_callback_function_with_name(self.receive_action, BENCHMARK_CALLBACK_NAME)
+        if file_format is not None:
+            self.talon.settings.set(recorder_module.record_file_format, file_format)
+        self.talon.settings.set(recorder_module.should_record_in_file, int(file_format is not None))
+        recorder_module.update_recording_sinks()
+
+    def receive_action(self, action):
+        self.received_action_count += 1
+
+    def perform_action(self, name: str, arguments):
+        if name in MAIN_ACTION_NAMES:
+            getattr(self.recorder_module.MainActions, name)(*arguments)
+        elif name == 'sleep':
+            self.recorder_module.Actions.basic_action_recorder_record_millisecond_sleep(arguments[0])
+        else:
+            self.recorder_module.recorder.record_basic_action(name, arguments)
+
+    def perform_command(self, name: str, action_representations):
+        self.recorder_module.on_phrase({'text': name.split()})
+        for action_name, arguments in action_representations:
+            self.perform_action(action_name, arguments)
+
+    def finish(self):
+        self.recorder_module.flush_record_file()
+
+def compute_synthetic_commands(command_count: int, seed: int = 0):
+    import synthetic_records
+    random_generator = random.Random(seed)
+    return [synthetic_records.compute_synthetic_action_representations(random_generator, include_sleeps = True) for _ in range(command_count)]
+
+def compute_recorder_scenarios(benchmark: RecorderBenchmark, commands, key_count: int):
+    action_count = sum(len(actions) for _, actions in commands)
+    def run_keys():
+        for _ in range(key_count):
+            benchmark.perform_action('key', ['enter'])
+        benchmark.finish()
+    def run_mouse_movement():
+        for index in range(key_count):
+            benchmark.perform_action('mouse_move', [index*0.5, index*0.25])
+        benchmark.finish()
+    def run_commands():
+        for name, actions in commands:
+            benchmark.perform_command(name, actions)
+        benchmark.finish()
+    configurations = [
+        ('idle', {}),
+        ('primary_memory', {'primary_memory': True}),
+        ('text_file', {'file_format': 'text'}),
+        ('binary_file', {'file_format': 'binary'}),
+        ('history', {'history': True}),
+        ('callbacks', {'callbacks': True}),
+        ('everything', {'primary_memory': True, 'file_format': 'text', 'history': True, 'callbacks': True}),
+    ]
+    scenarios = []
+    for configuration_name, configuration in configurations:
+        set_up = lambda configuration = configuration: benchmark.configure(**configuration)
+        scenarios.append(Scenario(f'record_key_{configuration_name}', key_count, run_keys, set_up))
+        scenarios.append(Scenario(f'record_mouse_move_{configuration_name}', key_count, run_mouse_movement, set_up))
+        scenarios.append(Scenario(f'record_mixed_commands_{configuration_name}', action_count, run_commands, set_up))
+    return scenarios
+
+def compute_history_scenarios(recorder_module, key_count: int):
+    history = recorder_module.ActionHistory(1000)
+    history.start_recording_history()
+    def run_repeated_keys():
+        for _ in range(key_count):
+            history.record_action(recorder_module.compute_key_description, 'enter')
+    def run_mouse_movement():
+        for index in range(key_count):
+            history.record_action(recorder_module.compute_mouse_movement_description, index*0.5, index*0.25)
+    def run_drawing():
+        for _ in range(key_count//1000):
+            for _ in history.get_action_history():
+                pass
+    return [
+        Scenario('history_repeated_key', key_count, run_repeated_keys, history.clear),
+        Scenario('history_mouse_move', key_count, run_mouse_movement, history.clear),
+        Scenario('history_draw_1000_entries', key_count//1000*1000, run_drawing),
+    ]
+
+def compute_action_scenarios(action_records, commands):
+    representations = [(name, arguments) for _, actions in commands for name, arguments in actions if name != 'sleep']
+    json_actions = [action_records.BasicAction(name, arguments).to_json() for name, arguments in representations]
+    state = {}
+    def create_fresh_actions():
+        state['actions'] = [action_records.BasicAction(name, arguments) for name, arguments in representations]
+    def run_creation():
+        create_fresh_actions()
+    def run_to_json():
+        for action in state['actions']: action.to_json()
+    def run_from_json():
+        for text in json_actions: action_records.BasicAction.from_json(text)
+    def run_talon_script():
+        for action in state['actions']: action.compute_talon_script()
+    return [
+        Scenario('basic_action_creation', len(representations), run_creation),
+        Scenario('basic_action_to_json', len(representations), run_to_json, create_fresh_actions),
+        Scenario('basic_action_from_json', len(representations), run_from_json),
+        Scenario('basic_action_talon_script', len(representations), run_talon_script, create_fresh_actions),
+    ]
+
+def compute_playback_scenarios(talon, recorder_module, action_records, playback_compiler, commands):
+    recorded_actions = [action_records.BasicAction(name, arguments) for _, actions in commands for name, arguments in actions
+        if name != 'sleep'] + [action_records.BasicAction('sleep', [action_records.TalonTimeSpecification(100, 'ms')])]
+    recorder = recorder_module.ActionRecorder(recorder_module.RecordingSinkPipeline())
+    def record_actions():
+        recorder.clear()
+        for action in recorded_actions: recorder.record_action(action)
+    def run_resolving_every_action():
+        for action in recorded_actions:
+            function = playback_compiler.resolve_action_function(talon.actions, action.get_name())
+            if action.get_name() == 'sleep':
+                function(str(action.get_arguments()[0]))
+            else:
+                function(*action.get_arguments())
+    def run_playback():
+        recorder.perform_actions()
+    def run_coalesced_playback():
+        recorder.perform_actions(True)
+    return [
+        Scenario('playback_resolving_every_action', len(recorded_actions), run_resolving_every_action),
+        Scenario('playback_compiling', len(recorded_actions), run_playback, record_actions),
+        Scenario('playback_compiled', len(recorded_actions), run_playback),
+        Scenario('playback_coalesced_compiled', len(recorded_actions), run_coalesced_playback),
+    ]
+
+def compute_parser_scenarios(record_files, binary_records, directory: str, command_count: int):
+    import synthetic_records
+    text_path = os.path.join(directory, 'record.txt')
+    binary_path = os.path.join(directory, 'record.bar')
+    action_count = synthetic_records.write_synthetic_text_record(text_path, command_count)
+    binary_records.convert_text_record_to_binary(text_path, binary_path)
+    def run_text_parsing():
+        record_files.read_file_record(text_path)
+    def run_text_streaming():
+        for _ in record_files.iter_file_record(text_path):
+            pass
+    def run_binary_parsing():
+        binary_records.read_binary_file_record(binary_path)
+    return [
+        Scenario('parse_text_record', action_count, run_text_parsing),
+        Scenario('stream_text_record', action_count, run_text_streaming),
+        Scenario('parse_binary_record', action_count, run_binary_parsing),
+    ]
+
+def compute_comparison(results, baseline_path: str):
+    '''Returns how much faster every scenario ran than in the baseline results, where 1 means no change'''
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    comparison = {}
+    for name, result in results['scenarios'].items():
+        baseline_result = baseline['scenarios'].get(name)
+        if baseline_result and baseline_result['nanoseconds_per_operation'] and result['nanoseconds_per_operation']:
+            comparison[name] = baseline_result['nanoseconds_per_operation']/result['nanoseconds_per_operation']
+    return {'baseline_commit': baseline.get('commit'), 'speedups': comparison}
+
+def run_suite(scale: float, repetitions: int, measure_memory: bool, selected_names):
+    import benchmark_support
+    talon = benchmark_support.use_talon_stub()
+    recorder_module = benchmark_support.import_recorder_module('basic_action_recorder')
+    action_records = benchmark_support.import_recorder_module('action_records')
+    record_files = benchmark_support.import_recorder_module('record_files')
+    binary_records = benchmark_support.import_recorder_module('binary_records')
+    playback_compiler = benchmark_support.import_recorder_module('playback_compiler')
+    talon.app.trigger('ready')
+    commands = compute_synthetic_commands(int(2000*scale))
+    key_count = int(20000*scale)
+    with tempfile.TemporaryDirectory() as directory:
+        scenarios = compute_recorder_scenarios(RecorderBenchmark(talon, recorder_module), commands, key_count) + \
+            compute_history_scenarios(recorder_module, key_count) + \
+            compute_action_scenarios(action_records, commands) + \
+            compute_playback_scenarios(talon, recorder_module, action_records, playback_compiler, commands) + \
+            compute_parser_scenarios(record_files, binary_records, directory, int(20000*scale))
+        results = {'commit': benchmark_support.compute_git_commit(), 'python': platform.python_version(), 'scale': scale, 'scenarios': {}}
+        # The recorder logs every action recorded in primary memory, which would get mixed with the results
+        with open(os.devnull, 'w') as null_output, contextlib.redirect_stdout(null_output):
+            for scenario in scenarios:
+                if not selected_names or any(name in scenario.name for name in selected_names):
+                    results['scenarios'][scenario.name] = scenario.measure(repetitions, measure_memory)
+    recorder_module.close_record_file()
+    # The state of the record got saved when closing it, and saving it again at exit would fail after the user directory gets removed
+    atexit.unregister(recorder_module.close_record_file)
+    shutil.rmtree(talon.compute_talon_user_directory(), ignore_errors = True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measures the throughput and memory of the recorder and parser hot paths outside of talon')
+    parser.add_argument('--scale', type = float, default = 1.0, help = 'Multiplies the amount of work every scenario does')
+    parser.add_argument('--repetitions', type = int, default = 3, help = 'How many times to run every scenario, reporting the fastest run')
+    parser.add_argument('--no-memory', action = 'store_true', help = 'Skips measuring the peak memory of every scenario')
+    parser.add_argument('--scenario', action = 'append', help = 'Only runs the scenarios with names containing this text')
+    parser.add_argument('--compare', help = 'The path to the results of an earlier run to compute speedups against')
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_suite(arguments.scale, arguments.repetitions, not arguments.no_memory, arguments.scenario)
+    if arguments.compare:
+        results['comparison'] = compute_comparison(results, arguments.compare)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
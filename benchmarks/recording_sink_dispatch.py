@@ -0,0 +1,56 @@
+import argparse
+import atexit
+import contextlib
+import os
+import shutil
+import time
+
+CONFIGURATIONS = [
+    ('idle', {}),
+    ('primary_memory', {'primary_memory': True}),
+    ('text_file', {'file_format': 'text'}),
+    ('history', {'history': True}),
+    ('callbacks', {'callbacks': True}),
+    ('everything', {'primary_memory': True, 'file_format': 'text', 'history': True, 'callbacks': True}),
+]
+
+def measure_nanoseconds_per_call(function, call_count: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(call_count):
+        function('mouse_move', [1.5, 2.5])
+    return (time.perf_counter() - start_time)*1e9/call_count
+
+def run_benchmark(call_count: int):
+    import benchmark_support
+    from recorder_suite import RecorderBenchmark
+    talon = benchmark_support.use_talon_stub()
+    recorder_module = benchmark_support.import_recorder_module('basic_action_recorder')
+    talon.app.trigger('ready')
+    benchmark = RecorderBenchmark(talon, recorder_module)
+    def do_nothing(name, arguments):
+        pass
+    results = {'commit': benchmark_support.compute_git_commit(), 'call_count': call_count}
+    results['empty_call_nanoseconds'] = measure_nanoseconds_per_call(do_nothing, call_count)
+    # The recorder logs every action recorded in primary memory, which would get mixed with the results
+    with open(os.devnull, 'w') as null_output, contextlib.redirect_stdout(null_output):
+        for configuration_name, configuration in CONFIGURATIONS:
+            benchmark.configure(**configuration)
+            results[configuration_name + '_nanoseconds'] = measure_nanoseconds_per_call(recorder_module.recorder.record_basic_action, call_count)
+            benchmark.finish()
+        benchmark.configure()
+    results['idle_overhead_nanoseconds'] = results['idle_nanoseconds'] - results['empty_call_nanoseconds']
+    recorder_module.close_record_file()
+    atexit.unregister(recorder_module.close_record_file)
+    shutil.rmtree(talon.compute_talon_user_directory(), ignore_errors = True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measures the cost per action of ActionRecorder.record_basic_action dispatching to the active recording sinks through the talon stub')
+    parser.add_argument('--calls', type = int, default = 1000000)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    benchmark_support.output_results(run_benchmark(arguments.calls), arguments.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+def run_benchmark(command_count: int, maximum_tracked_sequences: int, candidate_count: int):
+    import benchmark_support
+    import synthetic_records
+    sequence_mining = benchmark_support.import_recorder_module('sequence_mining')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'record.txt')
+        action_count = synthetic_records.write_synthetic_text_record(path, command_count)
+        start_time = time.perf_counter()
+        analysis = sequence_mining.analyze_record_sequences(path, maximum_tracked_sequences = maximum_tracked_sequences)
+        action_sequences = analysis.compute_repeated_action_sequences(candidate_count)
+        command_sequences = analysis.compute_repeated_command_sequences(candidate_count)
+        seconds = time.perf_counter() - start_time
+        # Tracing allocations slows the analysis down many times over, so the memory gets measured in a separate run
+        tracemalloc.start()
+        sequence_mining.analyze_record_sequences(path, maximum_tracked_sequences = maximum_tracked_sequences)
+        peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'commit': benchmark_support.compute_git_commit(),
+        'command_count': command_count,
+        'action_count': action_count,
+        'maximum_tracked_sequences': maximum_tracked_sequences,
+        'seconds': seconds,
+        'actions_per_second': action_count/seconds,
+        'peak_memory_bytes': peak_memory_bytes,
+        'action_sequence_pruned_count': analysis.action_miner.get_pruned_count(),
+        'top_action_sequences': [str(sequence) for sequence in action_sequences[:5]],
+        'top_command_sequences': [str(sequence) for sequence in command_sequences[:5]],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measures the throughput and peak memory of mining repeated sequences from a synthetic record')
+    parser.add_argument('--commands', type = int, default = 100000)
+    parser.add_argument('--maximum-tracked-sequences', type = int, default = 200000)
+    parser.add_argument('--candidates', type = int, default = 20)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    results = run_benchmark(arguments.commands, arguments.maximum_tracked_sequences, arguments.candidates)
+    benchmark_support.output_results(results, arguments.output)
+
+if __name__ == '__main__':
+    main()
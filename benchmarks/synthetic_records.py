@@ -0,0 +1,54 @@
+import json
+import random
+
+DICTATION_WORDS = ['the', 'recorder', 'action', 'talon', 'voice', 'command', 'it\'s', 'hello', 'world', 'über', 'function', 'value']
+KEYS = ['enter', 'backspace', 'ctrl-c', 'ctrl-v', 'down', 'up', 'a', 'b', 'tab', 'escape']
+COMMAND_NAMES = ['say', 'slap', 'go down', 'go up', 'copy that', 'paste that', 'touch', 'righty', 'wheel down', 'snip funky', 'bar sleep']
+
+SLEEP_PROBABILITY = 0.03
+SLEEP_MILLISECONDS = [50, 100, 200, 500, 1000]
+
+def compute_synthetic_action_representations(random_generator: random.Random, include_sleeps: bool = False):
+    '''Returns the name and arguments of the actions performed by a synthetic command.
+        Sleeps are returned as sleep actions with the number of milliseconds as the argument because text records cannot store them.'''
+    if include_sleeps and random_generator.random() < SLEEP_PROBABILITY:
+        return 'bar sleep', [('sleep', [random_generator.choice(SLEEP_MILLISECONDS)])]
+    kind = random_generator.random()
+    if kind < 0.3:
+        words = random_generator.choices(DICTATION_WORDS, k = random_generator.randint(1, 6))
+        return 'say', [('insert', [' '.join(words)])]
+    if kind < 0.5:
+        return random_generator.choice(['slap', 'go down', 'go up']), [('key', [random_generator.choice(KEYS)]) for _ in range(random_generator.randint(1, 3))]
+    if kind < 0.8:
+        x = random_generator.uniform(0, 1920)
+        y = random_generator.uniform(0, 1080)
+        actions = []
+        for _ in range(random_generator.randint(5, 40)):
+            x += random_generator.gauss(0, 4)
+            y += random_generator.gauss(0, 4)
+            actions.append(('mouse_move', [x, y]))
+        if random_generator.random() < 0.5:
+            actions.append(('mouse_click', [random_generator.choice([0, 0, 0, 1])]))
+        return 'touch', actions
+    if kind < 0.87:
+        return 'wheel down', [('mouse_scroll', [random_generator.choice([-120.0, 120.0]), 0.0, False])]
+    if kind < 0.95:
+        return 'snip funky', [('user.insert_snippet_by_name', ['functionDeclaration']), ('insert', ['name']), ('user.move_cursor_to_next_snippet_stop', [])]
+    return random_generator.choice(['copy that', 'paste that']), [('key', [random_generator.choice(['ctrl-c', 'ctrl-v'])])]
+
+def write_synthetic_text_record(path: str, command_count: int, seed: int = 0, recording_start_probability: float = 0.001):
+    '''Writes a text record with a realistic mix of dictation, keys, eye tracker mouse movement, scrolling, and snippets'''
+    random_generator = random.Random(seed)
+    action_count = 0
+    with open(path, 'w') as file:
+        file.write('START\n')
+        for _ in range(command_count):
+            if random_generator.random() < recording_start_probability:
+                file.write('START\n')
+            name, actions = compute_synthetic_action_representations(random_generator)
+            file.write(f'T{random_generator.choice([0, 0, 1, 1, 2, 3, 5, 8, 30])}\n')
+            file.write(f'Command: {name}\n')
+            for action_name, arguments in actions:
+                file.write(json.dumps({'name': action_name, 'arguments': arguments}) + '\n')
+            action_count += len(actions)
+    return action_count
@@ -0,0 +1,79 @@
+import argparse
+import atexit
+import contextlib
+import os
+import random
+import shutil
+import time
+
+def measure_best_seconds(run, set_up, repetitions: int) -> float:
+    best_seconds = None
+    for _ in range(repetitions):
+        set_up()
+        start_time = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start_time
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+    return best_seconds
+
+def run_benchmark(command_count: int, repetitions: int):
+    import benchmark_support
+    import synthetic_records
+    talon = benchmark_support.use_talon_stub()
+    recorder_module = benchmark_support.import_recorder_module('basic_action_recorder')
+    action_records = benchmark_support.import_recorder_module('action_records')
+    talon.app.trigger('ready')
+    class UncachedBasicAction(action_records.BasicAction):
+        '''Generates the talon script every time like BasicAction did before remembering it'''
+        __slots__ = ()
+        def compute_talon_script(self):
+            return self.compute_uncached_talon_script()
+    random_generator = random.Random(0)
+    commands = [synthetic_records.compute_synthetic_action_representations(random_generator) for _ in range(command_count)]
+    representations = [(name, arguments) for _, actions in commands for name, arguments in actions]
+    recorder = recorder_module.ActionRecorder(recorder_module.RecordingSinkPipeline())
+    state = {}
+    def create_actions(action_class):
+        def set_up():
+            recorder.clear()
+            state['actions'] = [action_class(name, arguments) for name, arguments in representations]
+        return set_up
+    def run_record_log_type():
+        # Recording in primary memory logs every action with its talon script, and bar type recording generates it for the whole recording
+        for action in state['actions']: recorder.record_action(action)
+        state['code'] = list(recorder.iter_talon_script())
+    def run_talon_script_once():
+        for action in state['actions']: action.compute_talon_script()
+    def run_talon_script_twice():
+        for action in state['actions']: action.compute_talon_script()
+        for action in state['actions']: action.compute_talon_script()
+    results = {'commit': benchmark_support.compute_git_commit(), 'action_count': len(representations), 'repetitions': repetitions}
+    # The recorder logs every action recorded in primary memory, which would get mixed with the results
+    with open(os.devnull, 'w') as null_output, contextlib.redirect_stdout(null_output):
+        for name, run in (('record_log_type', run_record_log_type), ('talon_script_once', run_talon_script_once), ('talon_script_twice', run_talon_script_twice)):
+            state.pop('code', None)
+            uncached_seconds = measure_best_seconds(run, create_actions(UncachedBasicAction), repetitions)
+            uncached_code = state.get('code')
+            remembered_seconds = measure_best_seconds(run, create_actions(action_records.BasicAction), repetitions)
+            results[name] = {'uncached_seconds': uncached_seconds, 'remembered_seconds': remembered_seconds, 'speedup': uncached_seconds/remembered_seconds}
+            if uncached_code is not None:
+                results[name]['code_matches'] = state['code'] == uncached_code
+    recorder.close()
+    recorder_module.close_record_file()
+    atexit.unregister(recorder_module.close_record_file)
+    shutil.rmtree(talon.compute_talon_user_directory(), ignore_errors = True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measures recording actions in primary memory, logging them, and generating their talon script with and without BasicAction remembering it')
+    # Enough actions to measure while staying below the default number of recorded actions kept in memory, so none get spilled
+    parser.add_argument('--commands', type = int, default = 10000)
+    parser.add_argument('--repetitions', type = int, default = 3)
+    parser.add_argument('--output')
+    arguments = parser.parse_args()
+    import benchmark_support
+    benchmark_support.output_results(run_benchmark(arguments.commands, arguments.repetitions), arguments.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+'''A minimal stand-in for the parts of the talon API that the basic action recorder uses so that its modules can be benchmarked outside of talon.
+    Actions do nothing, settings keep their defaults unless changed with settings.set, and registered callbacks only run when triggered.'''
+import contextlib
+import tempfile
+
+class Settings:
+    def __init__(self):
+        self.values = {}
+        self.callbacks = {}
+
+    def get(self, name: str):
+        return self.values.get(name)
+
+    def register(self, name: str, callback):
+        self.callbacks.setdefault(name, []).append(callback)
+
+    def set(self, name: str, value):
+        '''Changes a setting and calls the functions registered for it like talon does when a setting changes'''
+        self.values[name] = value
+        for callback in self.callbacks.get(name, []):
+            callback(value)
+
+settings = Settings()
+
+class Module:
+    def setting(self, name: str, type = None, default = None, desc: str = ''):
+        settings.values.setdefault('user.' + name, default)
+
+    def tag(self, name: str, desc: str = ''):
+        pass
+
+    def list(self, name: str, desc: str = ''):
+        pass
+
+    def capture(self, rule: str = None):
+        return lambda function: function
+
+    def action_class(self, action_class):
+        return action_class
+
+class Context:
+    def __init__(self):
+        self.matches = ''
+        self.tags = []
+        self.lists = {}
+
+    def action_class(self, path: str):
+        return lambda action_class: action_class
+
+class ActionNamespace:
+    '''Returns a function that does nothing for every action that has not been given an implementation'''
+    def __init__(self, implementations = None):
+        self.implementations = implementations or {}
+
+    def __getattr__(self, name: str):
+        if name in self.implementations:
+            return self.implementations[name]
+        return do_nothing
+
+def do_nothing(*arguments, **keyword_arguments):
+    pass
+
+talon_user_directory = None
+
+def compute_talon_user_directory() -> str:
+    '''Creates a temporary talon user directory the first time it is needed'''
+    global talon_user_directory
+    if talon_user_directory is None:
+        talon_user_directory = tempfile.mkdtemp(prefix = 'talon_stub_user_')
+    return talon_user_directory
+
+actions = ActionNamespace({
+    'speech': ActionNamespace({'enabled': lambda: True}),
+    'path': ActionNamespace({'talon_user': compute_talon_user_directory}),
+    'user': ActionNamespace(),
+    'edit': ActionNamespace(),
+})
+
+class Clipboard:
+    def __init__(self):
+        self.clipboard_text = ''
+
+    def text(self) -> str:
+        return self.clipboard_text
+
+    def set_text(self, text: str):
+        self.clipboard_text = text
+
+    @contextlib.contextmanager
+    def revert(self):
+        previous_text = self.clipboard_text
+        try:
+            yield
+        finally:
+            self.clipboard_text = previous_text
+
+clip = Clipboard()
+
+class GUI:
+    def text(self, text: str):
+        pass
+
+    def line(self):
+        pass
+
+    def button(self, text: str) -> bool:
+        return False
+
+class ImguiWindow:
+    def __init__(self, draw):
+        self.draw = draw
+        self.showing = False
+
+    def show(self):
+        self.showing = True
+
+    def hide(self):
+        self.showing = False
+
+class Imgui:
+    GUI = GUI
+
+    def open(self, **keyword_arguments):
+        return ImguiWindow
+
+imgui = Imgui()
+
+class EventRegistry:
+    def __init__(self):
+        self.callbacks = {}
+
+    def register(self, event: str, callback):
+        self.callbacks.setdefault(event, []).append(callback)
+
+    def unregister(self, event: str, callback):
+        self.callbacks.get(event, []).remove(callback)
+
+    def trigger(self, event: str, *arguments):
+        for callback in self.callbacks.get(event, []):
+            callback(*arguments)
+
+speech_system = EventRegistry()
+noise = EventRegistry()
+app = EventRegistry()
+
+class Cron:
+    def after(self, duration: str, callback):
+        return callback
+
+    def interval(self, duration: str, callback):
+        return callback
+
+    def cancel(self, job):
+        pass
+
+cron = Cron()
@@ -0,0 +1,422 @@
+import math
+import os
+import struct
+import zlib
+from .action_records import BasicAction, TalonCapture, TalonTimeSpecification, RecordParser, \
+    RECORD_ENTRY_ACTION, RECORD_ENTRY_COMMAND_START, RECORD_ENTRY_TIME_DIFFERENCE, RECORD_ENTRY_RECORDING_START, \
+    create_action_record_entry, create_command_start_record_entry, create_time_difference_record_entry, create_recording_start_record_entry, \
+    compute_record_entry_line, iter_text_record_entries, compute_json_text_for_value, compute_value_from_json_text
+from .record_files import register_record_entry_reader
+
+# Binary record layout:
+#   file header: BINARY_RECORD_MAGIC
+#   block: BLOCK_MARKER, varint payload length, payload, crc32 of the payload (4 bytes little endian)
+#   payload: string table, command table, action data
+#     string table: varint count, then each string as varint byte length and utf-8 bytes
+#     command table: varint count, then for each entry a kind byte, a name string index for command starts,
+#         a varint time difference (0 when missing, otherwise the zigzag encoded seconds plus 1), and a varint action count
+#     action data: for every action counted in the command table in order, a varint name string index,
+#         a varint argument count, and the typed arguments
+# Every block has its own string table so that blocks can be appended and read independently.
+
+BINARY_RECORD_MAGIC = b'BARREC\x01\n'
+BINARY_RECORD_FILE_EXTENSION = '.bar'
+BLOCK_MARKER = 0xB1
+DEFAULT_ENTRIES_PER_BLOCK = 4096
+
+TABLE_ENTRY_CONTINUATION = 0
+TABLE_ENTRY_COMMAND_START = 1
+TABLE_ENTRY_RECORDING_START = 2
+TABLE_ENTRY_TIME_DIFFERENCE = 3
+
+ARGUMENT_NONE = 0
+ARGUMENT_FALSE = 1
+ARGUMENT_TRUE = 2
+ARGUMENT_INTEGER = 3
+ARGUMENT_INTEGRAL_FLOAT = 4
+ARGUMENT_FLOAT = 5
+ARGUMENT_STRING = 6
+ARGUMENT_TIME_SPECIFICATION = 7
+ARGUMENT_CAPTURE = 8
+ARGUMENT_JSON = 9
+
+STRING_ENCODING = 'utf-8'
+STRING_ENCODING_ERRORS = 'surrogatepass'
+double_structure = struct.Struct('<d')
+crc_structure = struct.Struct('<I')
+
+class BinaryRecordFormatError(Exception):
+    pass
+
+def append_varint(output: bytearray, value: int):
+    while value > 0x7F:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+
+def read_varint(data, position: int):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+def compute_zigzag_encoding(value: int) -> int:
+    if value >= 0:
+        return value << 1
+    return ((-value) << 1) - 1
+
+def compute_zigzag_decoding(value: int) -> int:
+    if value & 1:
+        return -((value + 1) >> 1)
+    return value >> 1
+
+def compute_encoded_time_difference(seconds_since_last_action) -> int:
+    if seconds_since_last_action is None:
+        return 0
+    return compute_zigzag_encoding(seconds_since_last_action) + 1
+
+def compute_decoded_time_difference(value: int):
+    if value == 0:
+        return None
+    return compute_zigzag_decoding(value - 1)
+
+class StringTable:
+    def __init__(self):
+        self.indexes = {}
+        self.strings = []
+
+    def compute_index(self, text: str) -> int:
+        index = self.indexes.get(text)
+        if index is None:
+            index = len(self.strings)
+            self.indexes[text] = index
+            self.strings.append(text)
+        return index
+
+    def append_to(self, output: bytearray):
+        append_varint(output, len(self.strings))
+        for text in self.strings:
+            encoded = text.encode(STRING_ENCODING, STRING_ENCODING_ERRORS)
+            append_varint(output, len(encoded))
+            output.extend(encoded)
+
+class TableEntry:
+    def __init__(self, kind: int, name: str = '', seconds_since_last_action: int = None):
+        self.kind = kind
+        self.name = name
+        self.seconds_since_last_action = seconds_since_last_action
+        self.actions = []
+
+def compute_table_entries(entries):
+    table = []
+    current = None
+    pending_seconds_since_last_action = None
+    time_difference_pending = False
+    for kind, value in entries:
+        if time_difference_pending and kind != RECORD_ENTRY_COMMAND_START:
+            current = TableEntry(TABLE_ENTRY_TIME_DIFFERENCE, seconds_since_last_action = pending_seconds_since_last_action)
+            table.append(current)
+            time_difference_pending = False
+        if kind == RECORD_ENTRY_ACTION:
+            if current is None:
+                current = TableEntry(TABLE_ENTRY_CONTINUATION)
+                table.append(current)
+            current.actions.append(value)
+        elif kind == RECORD_ENTRY_COMMAND_START:
+            seconds_since_last_action = pending_seconds_since_last_action if time_difference_pending else None
+            current = TableEntry(TABLE_ENTRY_COMMAND_START, value, seconds_since_last_action)
+            table.append(current)
+            time_difference_pending = False
+        elif kind == RECORD_ENTRY_TIME_DIFFERENCE:
+            pending_seconds_since_last_action = value
+            time_difference_pending = True
+        elif kind == RECORD_ENTRY_RECORDING_START:
+            current = TableEntry(TABLE_ENTRY_RECORDING_START)
+            table.append(current)
+    if time_difference_pending:
+        table.append(TableEntry(TABLE_ENTRY_TIME_DIFFERENCE, seconds_since_last_action = pending_seconds_since_last_action))
+    return table
+
+def compute_block(entries) -> bytes:
+    '''Encodes the record entries as a single block'''
+    table = compute_table_entries(entries)
+    strings = StringTable()
+    table_data = bytearray()
+    action_data = bytearray()
+    append_varint(table_data, len(table))
+    for table_entry in table:
+        table_data.append(table_entry.kind)
+        if table_entry.kind == TABLE_ENTRY_COMMAND_START:
+            append_varint(table_data, strings.compute_index(table_entry.name))
+        if table_entry.kind in (TABLE_ENTRY_COMMAND_START, TABLE_ENTRY_TIME_DIFFERENCE):
+            append_varint(table_data, compute_encoded_time_difference(table_entry.seconds_since_last_action))
+        append_varint(table_data, len(table_entry.actions))
+        for action in table_entry.actions:
+            append_action(action_data, action, strings)
+    payload = bytearray()
+    strings.append_to(payload)
+    payload.extend(table_data)
+    payload.extend(action_data)
+    block = bytearray()
+    block.append(BLOCK_MARKER)
+    append_varint(block, len(payload))
+    block.extend(payload)
+    block.extend(crc_structure.pack(zlib.crc32(payload)))
+    return bytes(block)
+
+def append_action(output: bytearray, action: BasicAction, strings: StringTable):
+    append_varint(output, strings.compute_index(action.get_name()))
+    arguments = action.get_arguments()
+    append_varint(output, len(arguments))
+    for argument in arguments:
+        append_argument(output, argument, strings)
+
+def append_argument(output: bytearray, argument, strings: StringTable):
+    argument_type = type(argument)
+    if argument is None:
+        output.append(ARGUMENT_NONE)
+    elif argument_type == bool:
+        output.append(ARGUMENT_TRUE if argument else ARGUMENT_FALSE)
+    elif argument_type == int:
+        output.append(ARGUMENT_INTEGER)
+        append_varint(output, compute_zigzag_encoding(argument))
+    elif argument_type == float:
+        append_float_argument(output, argument)
+    elif argument_type == str:
+        output.append(ARGUMENT_STRING)
+        append_varint(output, strings.compute_index(argument))
+    elif argument_type == TalonTimeSpecification:
+        output.append(ARGUMENT_TIME_SPECIFICATION)
+        append_argument(output, argument.amount, strings)
+        append_varint(output, strings.compute_index(argument.unit))
+    elif argument_type == TalonCapture:
+        output.append(ARGUMENT_CAPTURE)
+        append_varint(output, strings.compute_index(argument.name))
+        append_varint(output, compute_zigzag_encoding(argument.instance))
+        append_varint(output, strings.compute_index(argument.postfix))
+    else:
+        output.append(ARGUMENT_JSON)
+        append_varint(output, strings.compute_index(compute_json_text_for_value(argument)))
+
+def append_float_argument(output: bytearray, argument: float):
+    is_negative_zero = argument == 0 and math.copysign(1.0, argument) < 0
+    if argument.is_integer() and abs(argument) < 2**53 and not is_negative_zero:
+        output.append(ARGUMENT_INTEGRAL_FLOAT)
+        append_varint(output, compute_zigzag_encoding(int(argument)))
+    else:
+        output.append(ARGUMENT_FLOAT)
+        output.extend(double_structure.pack(argument))
+
+def read_block_payload(file):
+    '''Reads the payload of the next block in the file. Returns None at the end of the file or if the last block is incomplete.'''
+    marker = file.read(1)
+    if not marker:
+        return None
+    if marker[0] != BLOCK_MARKER:
+        raise BinaryRecordFormatError(f'Expected a block at position {file.tell() - 1}')
+    payload_length = read_varint_from_file(file)
+    if payload_length is None:
+        return None
+    data = file.read(payload_length + crc_structure.size)
+    if len(data) < payload_length + crc_structure.size:
+        return None
+    payload = memoryview(data)[:payload_length]
+    expected_crc, = crc_structure.unpack_from(data, payload_length)
+    if zlib.crc32(payload) != expected_crc:
+        raise BinaryRecordFormatError(f'Corrupted block ending at position {file.tell()}')
+    return payload
+
+def read_varint_from_file(file):
+    result = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        result |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return result
+        shift += 7
+
+def compute_entries_from_payload(payload):
+    strings, position = read_strings(payload, 0)
+    table, position = read_command_table(payload, position, strings)
+    entries = []
+    for kind, name, seconds_since_last_action, action_count in table:
+        if kind == TABLE_ENTRY_COMMAND_START:
+            if seconds_since_last_action is not None:
+                entries.append(create_time_difference_record_entry(seconds_since_last_action))
+            entries.append(create_command_start_record_entry(name))
+        elif kind == TABLE_ENTRY_RECORDING_START:
+            entries.append(create_recording_start_record_entry())
+        elif kind == TABLE_ENTRY_TIME_DIFFERENCE:
+            entries.append(create_time_difference_record_entry(seconds_since_last_action))
+        for _ in range(action_count):
+            action, position = read_action(payload, position, strings)
+            entries.append(create_action_record_entry(action))
+    return entries
+
+def read_strings(payload, position: int):
+    count, position = read_varint(payload, position)
+    strings = []
+    for _ in range(count):
+        length, position = read_varint(payload, position)
+        strings.append(bytes(payload[position:position + length]).decode(STRING_ENCODING, STRING_ENCODING_ERRORS))
+        position += length
+    return strings, position
+
+def read_command_table(payload, position: int, strings):
+    count, position = read_varint(payload, position)
+    table = []
+    for _ in range(count):
+        kind = payload[position]
+        position += 1
+        name = ''
+        seconds_since_last_action = None
+        if kind == TABLE_ENTRY_COMMAND_START:
+            name_index, position = read_varint(payload, position)
+            name = strings[name_index]
+        if kind in (TABLE_ENTRY_COMMAND_START, TABLE_ENTRY_TIME_DIFFERENCE):
+            encoded_time_difference, position = read_varint(payload, position)
+            seconds_since_last_action = compute_decoded_time_difference(encoded_time_difference)
+        action_count, position = read_varint(payload, position)
+        table.append((kind, name, seconds_since_last_action, action_count))
+    return table, position
+
+def read_action(payload, position: int, strings):
+    name_index, position = read_varint(payload, position)
+    argument_count, position = read_varint(payload, position)
+    arguments = []
+    for _ in range(argument_count):
+        argument, position = read_argument(payload, position, strings)
+        arguments.append(argument)
+    return BasicAction(strings[name_index], arguments), position
+
+def read_argument(payload, position: int, strings):
+    kind = payload[position]
+    position += 1
+    if kind == ARGUMENT_NONE:
+        return None, position
+    elif kind == ARGUMENT_FALSE:
+        return False, position
+    elif kind == ARGUMENT_TRUE:
+        return True, position
+    elif kind == ARGUMENT_INTEGER:
+        value, position = read_varint(payload, position)
+        return compute_zigzag_decoding(value), position
+    elif kind == ARGUMENT_INTEGRAL_FLOAT:
+        value, position = read_varint(payload, position)
+        return float(compute_zigzag_decoding(value)), position
+    elif kind == ARGUMENT_FLOAT:
+        value, = double_structure.unpack_from(payload, position)
+        return value, position + double_structure.size
+    elif kind == ARGUMENT_STRING:
+        index, position = read_varint(payload, position)
+        return strings[index], position
+    elif kind == ARGUMENT_TIME_SPECIFICATION:
+        amount, position = read_argument(payload, position, strings)
+        unit_index, position = read_varint(payload, position)
+        return TalonTimeSpecification(amount, strings[unit_index]), position
+    elif kind == ARGUMENT_CAPTURE:
+        name_index, position = read_varint(payload, position)
+        instance, position = read_varint(payload, position)
+        postfix_index, position = read_varint(payload, position)
+        return TalonCapture(strings[name_index], compute_zigzag_decoding(instance), strings[postfix_index]), position
+    elif kind == ARGUMENT_JSON:
+        index, position = read_varint(payload, position)
+        return compute_value_from_json_text(strings[index]), position
+    raise BinaryRecordFormatError(f'Unknown argument type {kind}')
+
+def iter_binary_record_entries(path: str):
+    '''Yields the record entries in a binary record file. An incomplete block at the end of the file is ignored.'''
+    with open(path, 'rb') as file:
+        yield from iter_binary_record_entries_from_file(file)
+
+def iter_binary_record_entries_from_file(file):
+    if file.read(len(BINARY_RECORD_MAGIC)) != BINARY_RECORD_MAGIC:
+        raise BinaryRecordFormatError(f'{file.name} is not a binary record file')
+    payload = read_block_payload(file)
+    while payload is not None:
+        yield from compute_entries_from_payload(payload)
+        payload = read_block_payload(file)
+
+def iter_binary_file_record(path: str):
+    '''Yields the commands and recording starts in the specified binary record file as they get parsed'''
+    parser = RecordParser()
+    for entry in iter_binary_record_entries(path):
+        parser.process_entry(entry)
+        yield from parser.take_records()
+    parser.finish()
+    yield from parser.take_records()
+
+def read_binary_file_record(path: str):
+    '''Obtains a list of the basic actions performed by the commands in the specified binary record file'''
+    return list(iter_binary_file_record(path))
+
+def is_binary_record_file(path: str) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(BINARY_RECORD_MAGIC)) == BINARY_RECORD_MAGIC
+
+def write_binary_record_entries(path: str, entries, entries_per_block: int = DEFAULT_ENTRIES_PER_BLOCK):
+    with open(path, 'wb') as file:
+        file.write(BINARY_RECORD_MAGIC)
+        block_entries = []
+        for entry in entries:
+            block_entries.append(entry)
+            if len(block_entries) >= entries_per_block:
+                file.write(compute_block(block_entries))
+                block_entries = []
+        if block_entries:
+            file.write(compute_block(block_entries))
+
+def convert_text_record_to_binary(text_path: str, binary_path: str):
+    '''Writes the contents of a text record file to a binary record file'''
+    write_binary_record_entries(binary_path, iter_text_record_entries(text_path))
+
+def convert_binary_record_to_text(binary_path: str, text_path: str):
+    '''Writes the contents of a binary record file to a text record file'''
+    with open(text_path, 'w') as file:
+        for entry in iter_binary_record_entries(binary_path):
+            file.write(compute_record_entry_line(entry) + '\n')
+
+def compute_converted_record_path(path: str) -> str:
+    base, extension = os.path.splitext(path)
+    if extension == BINARY_RECORD_FILE_EXTENSION:
+        return base + '.txt'
+    return base + BINARY_RECORD_FILE_EXTENSION
+
+class BinaryRecordFormat:
+    file_extension = BINARY_RECORD_FILE_EXTENSION
+
+    def open_file(self, path: str):
+        file = open(path, 'ab')
+        if file.tell() == 0:
+            file.write(BINARY_RECORD_MAGIC)
+        return file
+
+    def write_entries(self, file, entries) -> int:
+        '''Writes the entries to the file as a block and returns how many could not be encoded'''
+        try:
+            file.write(compute_block(entries))
+            return 0
+        except (TypeError, ValueError):
+            return self.write_encodable_entries(file, entries)
+
+    def write_encodable_entries(self, file, entries) -> int:
+        encodable_entries = []
+        for entry in entries:
+            try:
+                compute_block([entry])
+                encodable_entries.append(entry)
+            except (TypeError, ValueError):
+                pass
+        if encodable_entries:
+            file.write(compute_block(encodable_entries))
+        return len(entries) - len(encodable_entries)
+
+register_record_entry_reader(BINARY_RECORD_FILE_EXTENSION, iter_binary_record_entries_from_file)
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+
+DROP_OLDEST_OVERFLOW_POLICY = 'drop oldest'
+BLOCK_OVERFLOW_POLICY = 'block'
+OVERFLOW_POLICIES = (DROP_OLDEST_OVERFLOW_POLICY, BLOCK_OVERFLOW_POLICY)
+DEFAULT_MAXIMUM_QUEUE_SIZE = 10000
+DEFAULT_MAXIMUM_BATCH_SIZE = 256
+DEFAULT_CLOSE_TIMEOUT_SECONDS = 2
+
+class CallbackSubscriberStatistics:
+    def __init__(self, name: str, asynchronous: bool, delivered_action_count: int, dropped_action_count: int, error_count: int,
+                queue_depth: int, total_latency_seconds: float, maximum_latency_seconds: float):
+        self.name = name
+        self.asynchronous = asynchronous
+        self.delivered_action_count = delivered_action_count
+        self.dropped_action_count = dropped_action_count
+        self.error_count = error_count
+        self.queue_depth = queue_depth
+        self.total_latency_seconds = total_latency_seconds
+        self.maximum_latency_seconds = maximum_latency_seconds
+
+    def compute_average_latency_seconds(self) -> float:
+        if self.delivered_action_count == 0:
+            return 0
+        return self.total_latency_seconds/self.delivered_action_count
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'{self.name}: delivered: {self.delivered_action_count}, dropped: {self.dropped_action_count}, errors: {self.error_count}, ' + \
+            f'queue depth: {self.queue_depth}, average latency: {self.compute_average_latency_seconds()*1000:.3f}ms, ' + \
+            f'maximum latency: {self.maximum_latency_seconds*1000:.3f}ms'
+
+class CallbackSubscriber:
+    '''Delivers actions to a callback function right away and keeps it from breaking recording when it raises an exception'''
+    def __init__(self, name: str, function, action_names = None):
+        self.name = name
+        self.function = function
+        self.action_names = None if action_names is None else frozenset(action_names)
+        self.delivered_action_count = 0
+        self.dropped_action_count = 0
+        self.error_count = 0
+        self.total_latency_seconds = 0
+        self.maximum_latency_seconds = 0
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_action_names(self):
+        '''Returns the names of the actions the subscriber receives or None if it receives every action'''
+        return self.action_names
+
+    def is_asynchronous(self) -> bool:
+        return False
+
+    def receive_action(self, action):
+        start_time = time.perf_counter()
+        self.deliver(self.function, action)
+        self.record_delivery(1, time.perf_counter() - start_time)
+
+    def deliver(self, function, value):
+        try:
+            function(value)
+        except Exception as exception:
+            self.error_count += 1
+            print('Basic Action Recorder: callback function', self.name, 'raised an exception:', repr(exception))
+
+    def record_delivery(self, action_count: int, latency_seconds: float):
+        self.delivered_action_count += action_count
+        self.total_latency_seconds += latency_seconds*action_count
+        if latency_seconds > self.maximum_latency_seconds:
+            self.maximum_latency_seconds = latency_seconds
+
+    def close(self, timeout: float = DEFAULT_CLOSE_TIMEOUT_SECONDS):
+        pass
+
+    def get_queue_depth(self) -> int:
+        return 0
+
+    def get_statistics(self) -> CallbackSubscriberStatistics:
+        return CallbackSubscriberStatistics(self.name, self.is_asynchronous(), self.delivered_action_count, self.dropped_action_count,
+            self.error_count, self.get_queue_depth(), self.total_latency_seconds, self.maximum_latency_seconds)
+
+class AsynchronousCallbackSubscriber(CallbackSubscriber):
+    '''Queues actions for a callback function that a background thread delivers them to, optionally in batches.
+        The latency of an action is the time between it being queued and it being delivered.'''
+    def __init__(self, name: str, function, action_names = None, batch: bool = False, overflow_policy: str = DROP_OLDEST_OVERFLOW_POLICY,
+                maximum_queue_size: int = DEFAULT_MAXIMUM_QUEUE_SIZE, maximum_batch_size: int = DEFAULT_MAXIMUM_BATCH_SIZE):
+        super().__init__(name, function, action_names)
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow_policy}. The overflow policy must be one of {OVERFLOW_POLICIES}.')
+        self.batch = batch
+        self.overflow_policy = overflow_policy
+        self.maximum_queue_size = max(maximum_queue_size, 1)
+        self.maximum_batch_size = max(maximum_batch_size, 1)
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.closing = False
+        self.thread = threading.Thread(target=self.run, name='BAR callback ' + name, daemon=True)
+        self.thread.start()
+
+    def is_asynchronous(self) -> bool:
+        return True
+
+    def receive_action(self, action):
+        with self.condition:
+            if self.closing:
+                self.dropped_action_count += 1
+                return
+            if len(self.queue) >= self.maximum_queue_size:
+                if self.overflow_policy == BLOCK_OVERFLOW_POLICY:
+                    self.condition.wait_for(lambda: len(self.queue) < self.maximum_queue_size or self.closing)
+                    if self.closing:
+                        self.dropped_action_count += 1
+                        return
+                else:
+                    self.queue.popleft()
+                    self.dropped_action_count += 1
+            self.queue.append((action, time.perf_counter()))
+            if len(self.queue) == 1:
+                self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: len(self.queue) > 0 or self.closing)
+                if len(self.queue) == 0:
+                    return
+                batch_size = min(len(self.queue), self.maximum_batch_size if self.batch else 1)
+                entries = [self.queue.popleft() for _ in range(batch_size)]
+                self.condition.notify_all()
+            self.deliver_entries(entries)
+
+    def deliver_entries(self, entries):
+        delivery_time = time.perf_counter()
+        if self.batch:
+            self.deliver(self.function, [action for action, _ in entries])
+        else:
+            self.deliver(self.function, entries[0][0])
+        with self.condition:
+            for _, queue_time in entries:
+                self.record_delivery(1, delivery_time - queue_time)
+
+    def close(self, timeout: float = DEFAULT_CLOSE_TIMEOUT_SECONDS):
+        '''Delivers the queued actions and stops the background thread, waiting at most timeout seconds for a slow callback function.
+            The daemon thread finishes delivering the queued actions on its own if the timeout runs out.'''
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def get_queue_depth(self) -> int:
+        with self.condition:
+            return len(self.queue)
+
+    def get_statistics(self) -> CallbackSubscriberStatistics:
+        with self.condition:
+            return super().get_statistics()
+
+class CallbackDispatcher:
+    '''Delivers actions to the subscribers that want them through an index from action names to subscribers'''
+    def __init__(self):
+        self.subscribers = {}
+        self.subscribers_by_action_name = {}
+        self.subscribers_to_every_action = ()
+
+    def insert_subscriber(self, subscriber: CallbackSubscriber):
+        '''Adds the subscriber, replacing any subscriber with the same name'''
+        self.remove_subscriber_with_name(subscriber.get_name())
+        self.subscribers[subscriber.get_name()] = subscriber
+        self.update_index()
+
+    def insert_callback_function_with_name(self, callback_function, name: str):
+        self.insert_subscriber(CallbackSubscriber(name, callback_function))
+
+    def remove_subscriber_with_name(self, name: str, timeout: float = DEFAULT_CLOSE_TIMEOUT_SECONDS):
+        subscriber = self.subscribers.pop(name, None)
+        if subscriber is not None:
+            self.update_index()
+            subscriber.close(timeout)
+
+    def remove_callback_function_with_name(self, name: str):
+        self.remove_subscriber_with_name(name)
+
+    def is_listening(self) -> bool:
+        return len(self.subscribers) > 0
+
+    def handle_action(self, action):
+        for subscriber in self.subscribers_by_action_name.get(action.name, self.subscribers_to_every_action):
+            subscriber.receive_action(action)
+
+    def update_index(self):
+        subscribers_to_every_action = []
+        action_names = set()
+        for subscriber in self.subscribers.values():
+            if subscriber.get_action_names() is None:
+                subscribers_to_every_action.append(subscriber)
+            else:
+                action_names.update(subscriber.get_action_names())
+        subscribers_by_action_name = {}
+        for action_name in action_names:
+            subscribers_by_action_name[action_name] = tuple(subscriber for subscriber in self.subscribers.values()
+                if subscriber.get_action_names() is None or action_name in subscriber.get_action_names())
+        self.subscribers_by_action_name = subscribers_by_action_name
+        self.subscribers_to_every_action = tuple(subscribers_to_every_action)
+
+    def get_statistics(self):
+        return [subscriber.get_statistics() for subscriber in self.subscribers.values()]
+
+    def close(self, timeout: float = DEFAULT_CLOSE_TIMEOUT_SECONDS):
+        for subscriber in self.subscribers.values():
+            subscriber.close(timeout)
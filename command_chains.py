@@ -0,0 +1,159 @@
+import time
+from .action_records import Command, CommandChain
+
+DEFAULT_MAXIMUM_CHAIN_GAP_SECONDS = 2
+DEFAULT_MINIMUM_CHAIN_SIZE = 2
+DEFAULT_MAXIMUM_CHAIN_SIZE = 32
+DEFAULT_MAXIMUM_INDEXED_CHAINS = 10000
+
+class ChainFrequency:
+    '''How many times a chain of commands with the same names and actions was completed, along with the most recent one'''
+    __slots__ = ('chain', 'count')
+
+    def __init__(self, chain: CommandChain):
+        self.chain = chain
+        self.count = 1
+
+    def get_chain(self) -> CommandChain:
+        return self.chain
+
+    def get_count(self) -> int:
+        return self.count
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'ChainFrequency(count: {self.count}, size: {self.chain.get_size()}, {self.chain.get_name()})'
+
+class CommandChainDetector:
+    '''Builds maximal chains of consecutive commands that each started within maximum_gap_seconds of the last action of the command before them.
+        Commands get processed one at a time, so the detector works on parsed records as well as on commands as they are spoken.
+        A recording start, a command without time information, or reaching maximum_chain_size ends the current chain.
+        Completed chains with at least minimum_chain_size commands get counted in a frequency index of at most maximum_indexed_chains chains,
+        where the least frequent half gets forgotten when it fills up. Processing a command takes amortized constant time for a bounded chain size.'''
+    def __init__(self, maximum_gap_seconds: float = DEFAULT_MAXIMUM_CHAIN_GAP_SECONDS, minimum_chain_size: int = DEFAULT_MINIMUM_CHAIN_SIZE,
+            maximum_chain_size: int = DEFAULT_MAXIMUM_CHAIN_SIZE, maximum_indexed_chains: int = DEFAULT_MAXIMUM_INDEXED_CHAINS):
+        self.maximum_gap_seconds = maximum_gap_seconds
+        self.minimum_chain_size = minimum_chain_size
+        self.maximum_chain_size = maximum_chain_size
+        self.maximum_indexed_chains = maximum_indexed_chains
+        self.frequencies = {}
+        self.record_index = 0
+        self.completed_chain_count = 0
+        self.current_chain = None
+        self.current_chain_key = []
+
+    def set_maximum_gap_seconds(self, maximum_gap_seconds: float):
+        self.maximum_gap_seconds = maximum_gap_seconds
+
+    def process_records(self, records):
+        for record in records:
+            self.process_record(record)
+        self.finish_current_chain()
+
+    def process_record(self, record):
+        if record.is_command_record():
+            self.process_command(record)
+        else:
+            self.process_recording_start()
+
+    def process_command(self, command: Command):
+        if self.current_chain is not None and not self.is_continuing_chain(command):
+            self.finish_current_chain()
+        if self.current_chain is None:
+            self.current_chain = CommandChain(None, [], self.record_index)
+        self.current_chain.append_command(command)
+        self.current_chain_key.append((command.get_name(), tuple(command.get_actions())))
+        self.record_index += 1
+        if self.current_chain.get_size() >= self.maximum_chain_size:
+            self.finish_current_chain()
+
+    def process_recording_start(self):
+        self.finish_current_chain()
+        self.record_index += 1
+
+    def is_continuing_chain(self, command: Command) -> bool:
+        return command.is_time_information_available() and command.get_seconds_since_action() <= self.maximum_gap_seconds
+
+    def finish_current_chain(self):
+        '''Ends the current chain, such as when no more commands are coming, and counts it if it is large enough'''
+        chain = self.current_chain
+        if chain is None:
+            return
+        if chain.get_size() >= self.minimum_chain_size:
+            self.count_chain(tuple(self.current_chain_key), chain)
+        self.current_chain = None
+        self.current_chain_key = []
+
+    def count_chain(self, key, chain: CommandChain):
+        self.completed_chain_count += 1
+        frequency = self.frequencies.get(key)
+        if frequency is None:
+            self.frequencies[key] = ChainFrequency(chain)
+            if len(self.frequencies) > self.maximum_indexed_chains:
+                self.prune()
+        else:
+            frequency.count += 1
+            frequency.chain = chain
+
+    def prune(self):
+        '''Forgets at least half of the indexed chains, starting with the least frequent'''
+        counts = sorted(frequency.count for frequency in self.frequencies.values())
+        threshold = counts[len(counts)//2]
+        self.frequencies = {key: frequency for key, frequency in self.frequencies.items() if frequency.count > threshold}
+
+    def get_current_chain(self) -> CommandChain:
+        return self.current_chain
+
+    def get_completed_chain_count(self) -> int:
+        return self.completed_chain_count
+
+    def get_indexed_chain_count(self) -> int:
+        return len(self.frequencies)
+
+    def compute_most_frequent_chains(self, count: int):
+        return sorted(self.frequencies.values(), key = lambda frequency: frequency.count, reverse = True)[:count]
+
+class LiveCommandAssembler:
+    '''Turns phrases and the actions performed after them into commands for a chain detector as they are spoken.
+        A command gets passed on when the next one starts, with the seconds between its start and the last thing the previous command did.'''
+    def __init__(self, detector: CommandChainDetector, compute_current_time = time.monotonic):
+        self.detector = detector
+        self.compute_current_time = compute_current_time
+        self.command_name = None
+        self.command_actions = []
+        self.seconds_since_action = None
+        self.last_activity_time = None
+
+    def receive_command_start(self, name: str):
+        current_time = self.compute_current_time()
+        self.pass_on_current_command()
+        self.command_name = name
+        if self.last_activity_time is not None:
+            self.seconds_since_action = current_time - self.last_activity_time
+        self.last_activity_time = current_time
+
+    def receive_action(self, action):
+        if self.command_name is not None:
+            self.command_actions.append(action)
+            self.last_activity_time = self.compute_current_time()
+
+    def pass_on_current_command(self):
+        if self.command_name is not None:
+            self.detector.process_command(Command(self.command_name, self.command_actions, self.seconds_since_action))
+        self.command_name = None
+        self.command_actions = []
+        self.seconds_since_action = None
+
+    def finish(self):
+        '''Passes on the current command and ends the current chain, such as when chain detection gets turned off'''
+        self.pass_on_current_command()
+        self.detector.finish_current_chain()
+        self.last_activity_time = None
+
+def detect_command_chains(records, **keyword_arguments) -> CommandChainDetector:
+    '''Returns a detector that has processed the records, such as the output of read_file_record or iter_file_record'''
+    detector = CommandChainDetector(**keyword_arguments)
+    detector.process_records(records)
+    return detector
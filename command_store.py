@@ -0,0 +1,141 @@
+from array import array
+from .action_records import BasicAction, Command, RecordingStart
+
+# Every argument is stored as a kind along with a double. Booleans, integers small enough to be exact as doubles, and floats are stored directly.
+# Strings and other objects are stored as indexes into the shared string and object tables.
+ARGUMENT_FALSE = 0
+ARGUMENT_TRUE = 1
+ARGUMENT_INTEGER = 2
+ARGUMENT_FLOAT = 3
+ARGUMENT_STRING = 4
+ARGUMENT_OBJECT = 5
+
+MAXIMUM_EXACT_INTEGER = 2**53
+NO_TIME_INFORMATION = -2**63
+RECORDING_START_NAME_CODE = 2**32 - 1
+
+class CommandStore:
+    '''Stores the commands and recording starts of records in flat arrays shared by all of them instead of as separate objects.
+        Indexing and iterating hand out Command and RecordingStart objects built from the stored data.'''
+    def __init__(self, records = ()):
+        self.strings = []
+        self.string_codes = {}
+        self.objects = []
+        self.command_name_codes = array('I')
+        self.command_seconds_since_action = array('q')
+        self.command_action_starts = array('I', [0])
+        self.action_name_codes = array('I')
+        self.action_argument_starts = array('I', [0])
+        self.argument_kinds = array('B')
+        self.argument_values = array('d')
+        self.extend(records)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        if not record.is_command_record():
+            self.command_name_codes.append(RECORDING_START_NAME_CODE)
+            self.command_seconds_since_action.append(NO_TIME_INFORMATION)
+        else:
+            self.command_name_codes.append(self.compute_string_code(record.get_name()))
+            seconds_since_action = record.get_seconds_since_action()
+            self.command_seconds_since_action.append(NO_TIME_INFORMATION if seconds_since_action is None else seconds_since_action)
+            for action in record.get_actions():
+                self.append_action(action)
+        self.command_action_starts.append(len(self.action_name_codes))
+
+    def append_action(self, action: BasicAction):
+        self.action_name_codes.append(self.compute_string_code(action.get_name()))
+        for argument in action.get_arguments():
+            self.append_argument(argument)
+        self.action_argument_starts.append(len(self.argument_kinds))
+
+    def append_argument(self, argument):
+        argument_type = type(argument)
+        if argument_type == bool:
+            self.argument_kinds.append(ARGUMENT_TRUE if argument else ARGUMENT_FALSE)
+            self.argument_values.append(0)
+        elif argument_type == int and -MAXIMUM_EXACT_INTEGER <= argument <= MAXIMUM_EXACT_INTEGER:
+            self.argument_kinds.append(ARGUMENT_INTEGER)
+            self.argument_values.append(argument)
+        elif argument_type == float:
+            self.argument_kinds.append(ARGUMENT_FLOAT)
+            self.argument_values.append(argument)
+        elif argument_type == str:
+            self.argument_kinds.append(ARGUMENT_STRING)
+            self.argument_values.append(self.compute_string_code(argument))
+        else:
+            self.argument_kinds.append(ARGUMENT_OBJECT)
+            self.argument_values.append(len(self.objects))
+            self.objects.append(argument)
+
+    def compute_string_code(self, text: str) -> int:
+        code = self.string_codes.get(text)
+        if code is None:
+            code = len(self.strings)
+            self.string_codes[text] = code
+            self.strings.append(text)
+        return code
+
+    def __len__(self):
+        return len(self.command_name_codes)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('CommandStore index out of range')
+        name_code = self.command_name_codes[index]
+        if name_code == RECORDING_START_NAME_CODE:
+            return RecordingStart()
+        seconds_since_action = self.command_seconds_since_action[index]
+        if seconds_since_action == NO_TIME_INFORMATION:
+            seconds_since_action = None
+        actions = [self.get_action(action_index) for action_index in range(self.command_action_starts[index], self.command_action_starts[index + 1])]
+        return Command(self.strings[name_code], actions, seconds_since_action)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_action_count(self) -> int:
+        return len(self.action_name_codes)
+
+    def get_command_action_count(self, index: int) -> int:
+        return self.command_action_starts[index + 1] - self.command_action_starts[index]
+
+    def get_command_name(self, index: int):
+        '''Obtains the name of the command at the index without building its actions or None for a recording start'''
+        name_code = self.command_name_codes[index]
+        if name_code == RECORDING_START_NAME_CODE:
+            return None
+        return self.strings[name_code]
+
+    def get_action(self, action_index: int) -> BasicAction:
+        arguments = [self.get_argument(argument_index) for argument_index in
+            range(self.action_argument_starts[action_index], self.action_argument_starts[action_index + 1])]
+        return BasicAction(self.strings[self.action_name_codes[action_index]], arguments)
+
+    def get_action_name(self, action_index: int) -> str:
+        return self.strings[self.action_name_codes[action_index]]
+
+    def iter_actions(self):
+        for action_index in range(self.get_action_count()):
+            yield self.get_action(action_index)
+
+    def get_argument(self, argument_index: int):
+        kind = self.argument_kinds[argument_index]
+        value = self.argument_values[argument_index]
+        if kind == ARGUMENT_FLOAT:
+            return value
+        elif kind == ARGUMENT_INTEGER:
+            return int(value)
+        elif kind == ARGUMENT_STRING:
+            return self.strings[int(value)]
+        elif kind == ARGUMENT_TRUE:
+            return True
+        elif kind == ARGUMENT_FALSE:
+            return False
+        return self.objects[int(value)]
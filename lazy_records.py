@@ -0,0 +1,222 @@
+import locale
+import mmap
+import os
+from .action_records import BasicAction, Command, RecordParser, COMMAND_NAME_PREFIX, RECORDING_START_MESSAGE
+from .record_files import compute_active_record_path, compute_record_segment_paths, is_text_record_path, iter_file_record
+
+ACTION_LINE_START = ord('{')
+COMMAND_LINE_START = ord('C')
+TIME_DIFFERENCE_LINE_START = ord('T')
+RECORDING_START_LINE_START = ord('S')
+COMMAND_LINE_PREFIX = COMMAND_NAME_PREFIX.encode()
+RECORDING_START_LINE = RECORDING_START_MESSAGE.encode()
+# Actions get written with the name first, so the name can usually be read without decoding the JSON
+ACTION_NAME_PREFIX = b'{"name": "'
+COUNTING_CHUNK_SIZE = 16*1024*1024
+
+class LazyCommand(Command):
+    '''A command read from a memory mapped text record that keeps its actions as the raw bytes of their lines until get_actions gets called.
+        The record stays mapped while the command exists.'''
+    __slots__ = ('buffer', 'action_start', 'action_end', 'action_count', 'encoding')
+
+    def __init__(self, name: str, buffer, action_start: int, action_end: int, action_count: int, seconds_since_action: int = None, encoding: str = 'utf-8'):
+        super().__init__(name, None, seconds_since_action)
+        self.buffer = buffer
+        self.action_start = action_start
+        self.action_end = action_end
+        self.action_count = action_count
+        self.encoding = encoding
+
+    def get_actions(self):
+        if self.actions is None:
+            self.actions = [BasicAction.from_json(line.decode(self.encoding)) for line in self.iter_action_lines()]
+            self.buffer = None
+        return self.actions
+
+    def get_action_count(self) -> int:
+        return self.action_count
+
+    def compute_action_names(self):
+        '''Obtains the names of the actions, only decoding the JSON of actions whose name is not at the start of their line'''
+        if self.actions is not None:
+            return [action.get_name() for action in self.actions]
+        names = []
+        for line in self.iter_action_lines():
+            if line.startswith(ACTION_NAME_PREFIX):
+                name_end = line.find(b'"', len(ACTION_NAME_PREFIX))
+                if name_end >= 0 and line.find(b'\\', len(ACTION_NAME_PREFIX), name_end) < 0:
+                    names.append(line[len(ACTION_NAME_PREFIX):name_end].decode(self.encoding))
+                    continue
+            names.append(BasicAction.from_json(line.decode(self.encoding)).get_name())
+        return names
+
+    def iter_action_lines(self):
+        # Lines that are not actions, such as time differences, can appear between the actions of a command
+        for line in self.buffer[self.action_start:self.action_end].split(b'\n'):
+            line = line.strip()
+            if line and line[0] == ACTION_LINE_START:
+                yield line
+
+    def copy(self):
+        return Command(self.name, self.get_actions()[:])
+
+    def has_same_actions_as(self, other) -> bool:
+        return self.get_actions() == other.get_actions()
+
+    def __str__(self):
+        self.get_actions()
+        return super().__str__()
+
+class LazyRecordParser(RecordParser):
+    '''Parses the lines of a text record by their first byte, keeping track of where the actions of the current command are instead of decoding them'''
+    def __init__(self, buffer, encoding: str):
+        super().__init__()
+        self.buffer = buffer
+        self.encoding = encoding
+        self.action_start = 0
+        self.action_end = 0
+        self.action_count = 0
+
+    def parse_range(self, start: int, end: int):
+        buffer = self.buffer
+        position = start
+        while position < end:
+            line_end = buffer.find(b'\n', position, end)
+            if line_end < 0:
+                line_end = end
+            first_byte = buffer[position]
+            if first_byte == ACTION_LINE_START:
+                if self.action_count == 0:
+                    self.action_start = position
+                self.action_end = line_end
+                self.action_count += 1
+            elif first_byte == COMMAND_LINE_START:
+                line = buffer[position:line_end].strip()
+                if line.startswith(COMMAND_LINE_PREFIX):
+                    self.process_command_start(line[len(COMMAND_LINE_PREFIX):].decode(self.encoding))
+            elif first_byte == TIME_DIFFERENCE_LINE_START:
+                self.process_time_difference(int(buffer[position + 1:line_end]))
+            elif first_byte == RECORDING_START_LINE_START and buffer[position:line_end].strip() == RECORDING_START_LINE:
+                self.process_recording_start()
+            position = line_end + 1
+
+    def is_command_found(self):
+        return self.action_count > 0
+
+    def add_current_command(self):
+        self.commands.append(LazyCommand(self.current_command_name, self.buffer, self.action_start, self.action_end, self.action_count,
+            self.compute_current_command_seconds_since_last_action(), self.encoding))
+
+    def reset_command_information_except_name(self):
+        super().reset_command_information_except_name()
+        self.action_count = 0
+
+    def finish(self):
+        super().finish()
+        self.action_count = 0
+
+class RecordLineCounts:
+    def __init__(self, command_count: int, action_count: int, time_difference_count: int, recording_start_count: int):
+        self.command_count = command_count
+        self.action_count = action_count
+        self.time_difference_count = time_difference_count
+        self.recording_start_count = recording_start_count
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'RecordLineCounts(commands: {self.command_count}, actions: {self.action_count}, time differences: {self.time_difference_count}, ' + \
+            f'recording starts: {self.recording_start_count})'
+
+class LazyRecordReader:
+    '''Memory maps an uncompressed text record file and reads it without decoding actions until they get used.
+        Scans that only need command names, time differences, or line counts jump between the lines they need and never build action objects.
+        Closing the reader unmaps the file once the lazy commands from it are gone, so use it as a context manager or close it when done.'''
+    def __init__(self, path: str, encoding: str = None):
+        self.path = path
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.buffer = b''
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size > 0:
+                self.buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.size = len(self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def close(self):
+        # Lazy commands keep the mapping alive through their own reference until their actions get decoded
+        self.buffer = b''
+
+    def iter_records(self):
+        '''Yields the LazyCommand and RecordingStart objects in the record as it gets parsed, with the same results as reading it with RecordParser'''
+        parser = LazyRecordParser(self.buffer, self.encoding)
+        position = 0
+        while position < self.size:
+            end = self.buffer.find(b'\n', min(position + COUNTING_CHUNK_SIZE, self.size))
+            end = self.size if end < 0 else end + 1
+            parser.parse_range(position, end)
+            position = end
+            yield from parser.take_records()
+        parser.finish()
+        yield from parser.take_records()
+
+    def read_records(self):
+        return list(self.iter_records())
+
+    def iter_lines_starting_with(self, prefix: bytes):
+        '''Yields the lines that start with the prefix without their trailing new lines, skipping over every other line'''
+        buffer = self.buffer
+        if buffer[:len(prefix)] == prefix:
+            position = 0
+        else:
+            position = buffer.find(b'\n' + prefix)
+            if position >= 0:
+                position += 1
+        while position >= 0:
+            line_end = buffer.find(b'\n', position)
+            if line_end < 0:
+                line_end = self.size
+            yield buffer[position:line_end].rstrip()
+            position = buffer.find(b'\n' + prefix, line_end)
+            if position >= 0:
+                position += 1
+
+    def iter_command_names(self):
+        '''Yields the name of every command start line in the record, including commands that performed no actions'''
+        for line in self.iter_lines_starting_with(COMMAND_LINE_PREFIX):
+            yield line[len(COMMAND_LINE_PREFIX):].decode(self.encoding)
+
+    def iter_time_differences(self):
+        '''Yields the seconds since the last action of every time difference line in the record'''
+        for line in self.iter_lines_starting_with(b'T'):
+            yield int(line[1:])
+
+    def compute_line_counts(self) -> RecordLineCounts:
+        '''Counts the lines of each kind by the byte after every new line. Command starts include commands that performed no actions.'''
+        counts = {COMMAND_LINE_START: 0, ACTION_LINE_START: 0, TIME_DIFFERENCE_LINE_START: 0, RECORDING_START_LINE_START: 0}
+        if self.size > 0 and self.buffer[0] in counts:
+            counts[self.buffer[0]] += 1
+        for start in range(0, self.size, COUNTING_CHUNK_SIZE):
+            # Each chunk overlaps the next by a byte so that new lines at the end of a chunk are counted with the byte after them
+            chunk = self.buffer[start:start + COUNTING_CHUNK_SIZE + 1]
+            for first_byte in counts:
+                counts[first_byte] += chunk.count(b'\n' + bytes((first_byte,)))
+        return RecordLineCounts(counts[COMMAND_LINE_START], counts[ACTION_LINE_START], counts[TIME_DIFFERENCE_LINE_START], counts[RECORDING_START_LINE_START])
+
+def can_read_lazily(path: str) -> bool:
+    '''Determines if the record is a single uncompressed text file that can be memory mapped'''
+    record_path = compute_active_record_path(path)
+    return is_text_record_path(record_path) and os.path.isfile(record_path) and not compute_record_segment_paths(record_path)
+
+def read_lazy_file_record(path: str):
+    '''Obtains the commands and recording starts in the record with their actions decoded when they first get used.
+        Records with segments or in other formats cannot be memory mapped and get read normally instead.'''
+    if not can_read_lazily(path):
+        return list(iter_file_record(path))
+    with LazyRecordReader(compute_active_record_path(path)) as reader:
+        return reader.read_records()
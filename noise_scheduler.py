@@ -0,0 +1,164 @@
+import heapq
+import threading
+import time
+
+class NoiseTiming:
+    '''How a noise gets recognized. The start of a noise gets recorded once it has gone on for the start delay.
+        A noise that stops before lasting the minimum duration gets cancelled, so neither its start nor its end gets recorded.
+        A noise that lasts the minimum duration but stops before the start delay gets its start and end recorded when it stops.
+        Noises within the coalescing window of the previous one get recorded together with a count.'''
+    def __init__(self, start_delay_seconds: float = 0, minimum_duration_seconds: float = 0, coalescing_window_seconds: float = 0):
+        self.start_delay_seconds = start_delay_seconds
+        self.minimum_duration_seconds = minimum_duration_seconds
+        self.coalescing_window_seconds = coalescing_window_seconds
+
+    def compute_start_recording_delay(self) -> float:
+        '''A start cannot be taken back once recorded, so it waits for the minimum duration even when the start delay is shorter'''
+        return max(self.start_delay_seconds, self.minimum_duration_seconds)
+
+    def compute_with_start_delay(self, start_delay_seconds: float):
+        return NoiseTiming(start_delay_seconds, self.minimum_duration_seconds, self.coalescing_window_seconds)
+
+    def compute_with_coalescing_window(self, coalescing_window_seconds: float):
+        return NoiseTiming(self.start_delay_seconds, self.minimum_duration_seconds, coalescing_window_seconds)
+
+    def is_coalescing(self) -> bool:
+        return self.coalescing_window_seconds > 0
+
+    def is_delayed(self) -> bool:
+        return self.compute_start_recording_delay() > 0
+
+IMMEDIATE_NOISE_TIMING = NoiseTiming()
+
+class PendingNoise:
+    __slots__ = ('deadline', 'count', 'started', 'start_time')
+
+    def __init__(self, deadline: float, start_time: float = None):
+        self.deadline = deadline
+        self.count = 1
+        self.started = False
+        self.start_time = start_time
+
+class NoiseScheduler:
+    '''Delays and coalesces noises according to their timing with a single shared timer.
+        record_noise(name, active, count) gets called when a noise should be recorded, where count is how many noises were coalesced.
+        schedule_timer(seconds, callback) must call the callback once after the seconds pass and return something cancel_timer accepts.'''
+    def __init__(self, record_noise, schedule_timer, cancel_timer, compute_current_time = time.monotonic):
+        self.record_noise = record_noise
+        self.schedule_timer = schedule_timer
+        self.cancel_timer = cancel_timer
+        self.compute_current_time = compute_current_time
+        self.timings = {}
+        self.pending_noises = {}
+        self.deadlines = []
+        self.timer = None
+        self.timer_deadline = None
+        self.lock = threading.Lock()
+
+    def set_noise_timing(self, name: str, timing: NoiseTiming):
+        with self.lock:
+            self.timings[name] = timing
+
+    def set_noise_start_delay(self, name: str, start_delay_seconds: float):
+        '''Changes the start delay of the noise while keeping the rest of its timing'''
+        with self.lock:
+            self.timings[name] = self.get_noise_timing(name).compute_with_start_delay(start_delay_seconds)
+
+    def set_noise_coalescing_window(self, name: str, coalescing_window_seconds: float):
+        '''Changes the coalescing window of the noise while keeping the rest of its timing'''
+        with self.lock:
+            self.timings[name] = self.get_noise_timing(name).compute_with_coalescing_window(coalescing_window_seconds)
+
+    def get_noise_timing(self, name: str) -> NoiseTiming:
+        return self.timings.get(name, IMMEDIATE_NOISE_TIMING)
+
+    def handle_noise(self, name: str, active: bool):
+        timing = self.timings.get(name, IMMEDIATE_NOISE_TIMING)
+        if timing.is_coalescing():
+            self.handle_coalescing_noise(name, active, timing)
+        elif timing.is_delayed():
+            self.handle_delayed_noise(name, active, timing)
+        else:
+            self.record_noise(name, active, 1)
+
+    def handle_coalescing_noise(self, name: str, active: bool, timing: NoiseTiming):
+        if not active:
+            return
+        with self.lock:
+            deadline = self.compute_current_time() + timing.coalescing_window_seconds
+            pending_noise = self.pending_noises.get(name)
+            if pending_noise is None:
+                self.pending_noises[name] = PendingNoise(deadline)
+            else:
+                pending_noise.count += 1
+                pending_noise.deadline = deadline
+            self.schedule_deadline(deadline, name)
+
+    def handle_delayed_noise(self, name: str, active: bool, timing: NoiseTiming):
+        with self.lock:
+            pending_noise = self.pending_noises.get(name)
+            if active:
+                if pending_noise is None:
+                    current_time = self.compute_current_time()
+                    deadline = current_time + timing.compute_start_recording_delay()
+                    self.pending_noises[name] = PendingNoise(deadline, current_time)
+                    self.schedule_deadline(deadline, name)
+                return
+            if pending_noise is None:
+                return
+            del self.pending_noises[name]
+            started = pending_noise.started
+            lasted_minimum_duration = self.compute_current_time() - pending_noise.start_time >= timing.minimum_duration_seconds
+        if not started:
+            if not lasted_minimum_duration:
+                return
+            self.record_noise(name, True, 1)
+        self.record_noise(name, False, 1)
+
+    def schedule_deadline(self, deadline: float, name: str):
+        heapq.heappush(self.deadlines, (deadline, name))
+        if self.timer_deadline is None or deadline < self.timer_deadline:
+            self.restart_timer(deadline)
+
+    def restart_timer(self, deadline: float):
+        if self.timer is not None:
+            self.cancel_timer(self.timer)
+        self.timer_deadline = deadline
+        self.timer = self.schedule_timer(max(deadline - self.compute_current_time(), 0), self.process_due_noises)
+
+    def process_due_noises(self):
+        '''Records the noises whose deadlines have passed and schedules the timer for the next deadline'''
+        due_noises = []
+        with self.lock:
+            self.timer = None
+            self.timer_deadline = None
+            current_time = self.compute_current_time()
+            while self.deadlines and self.deadlines[0][0] <= current_time:
+                deadline, name = heapq.heappop(self.deadlines)
+                self.take_due_noise(name, deadline, due_noises)
+            if self.deadlines:
+                self.restart_timer(self.deadlines[0][0])
+        for name, count in due_noises:
+            self.record_noise(name, True, count)
+
+    def take_due_noise(self, name: str, deadline: float, due_noises):
+        pending_noise = self.pending_noises.get(name)
+        # Deadlines of noises that ended or got extended by a later noise in the same burst are left in the heap and skipped here
+        if pending_noise is None or pending_noise.deadline != deadline or pending_noise.started:
+            return
+        if self.get_noise_timing(name).is_coalescing():
+            del self.pending_noises[name]
+        else:
+            pending_noise.started = True
+        due_noises.append((name, pending_noise.count))
+
+    def flush(self):
+        '''Records the coalesced noises that are still waiting for their window to pass, such as before recording stops'''
+        due_noises = []
+        with self.lock:
+            for name, pending_noise in list(self.pending_noises.items()):
+                if self.get_noise_timing(name).is_coalescing():
+                    del self.pending_noises[name]
+                    due_noises.append((name, pending_noise.count))
+        for name, count in due_noises:
+            self.record_noise(name, True, count)
@@ -0,0 +1,239 @@
+import locale
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .action_records import RecordParser, compute_record_entry_from_line, RECORD_ENTRY_COMMAND_START, RECORD_ENTRY_TIME_DIFFERENCE, \
+    RECORD_ENTRY_RECORDING_START, COMMAND_NAME_PREFIX, TIME_DIFFERENCE_PREFIX, RECORDING_START_MESSAGE
+from .record_files import read_file_record, compute_record_segment_paths, compute_record_segment_format_extensions, is_text_record_path, is_record_file_name, \
+    open_record_segment, iter_record_segment_entries, RECORD_SEGMENT_DIRECTORY_NAME
+# Importing binary_records registers the binary record reader in the worker processes
+from . import binary_records
+
+DEFAULT_CHUNK_SIZE_BYTES = 16*1024*1024
+
+class RecordFileMetadata:
+    def __init__(self, path: str, segment_count: int, command_count: int, action_count: int, recording_start_count: int,
+                recorded_seconds: int, last_modified_time: float):
+        self.path = path
+        self.segment_count = segment_count
+        self.command_count = command_count
+        self.action_count = action_count
+        self.recording_start_count = recording_start_count
+        self.recorded_seconds = recorded_seconds
+        self.last_modified_time = last_modified_time
+
+    def get_estimated_start_time(self) -> float:
+        return self.last_modified_time - self.recorded_seconds
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'RecordFileMetadata({self.path}, segments: {self.segment_count}, commands: {self.command_count}, actions: {self.action_count}, ' + \
+            f'recording starts: {self.recording_start_count}, recorded seconds: {self.recorded_seconds})'
+
+class RecordFileResult:
+    def __init__(self, path: str, records, metadata: RecordFileMetadata):
+        self.path = path
+        self.records = records
+        self.metadata = metadata
+
+    def get_records(self):
+        return self.records
+
+    def get_metadata(self) -> RecordFileMetadata:
+        return self.metadata
+
+class RecordCollection:
+    def __init__(self, file_results):
+        self.file_results = file_results
+
+    def get_file_results(self):
+        '''Obtains the results for every record in chronological order'''
+        return self.file_results
+
+    def get_metadata(self):
+        return [file_result.get_metadata() for file_result in self.file_results]
+
+    def get_records(self):
+        '''Obtains the commands and recording starts of every record merged in chronological order'''
+        records = []
+        for file_result in self.file_results:
+            records.extend(file_result.get_records())
+        return records
+
+class RecordUnitResult:
+    '''The result of parsing a record unit on its own. The leading entries come before the first point where a fresh parser is guaranteed to
+        be in the same state as a parser that read everything before the unit, so they have to be given to that parser instead.
+        The records come after that point, and the parser holds the state at the end of the unit, including a command that may continue in the next unit.
+        Units without such a point only have leading entries.'''
+    def __init__(self, leading_entries, records = (), parser: RecordParser = None):
+        self.leading_entries = leading_entries
+        self.records = records
+        self.parser = parser
+
+    def is_synchronized(self) -> bool:
+        return self.parser is not None
+
+class RecordUnit:
+    '''A part of a record that can be parsed independently: a whole segment or active file, or a byte range of an uncompressed text file'''
+    def __init__(self, path: str, start_offset: int = 0, end_offset: int = None):
+        self.path = path
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+
+def read_all_records(directory: str, workers: int = None, chunk_size_bytes: int = DEFAULT_CHUNK_SIZE_BYTES) -> RecordCollection:
+    '''Parses every record in the directory and returns the records in chronological order along with metadata about each of them.
+        With more than one worker, the segments of the records and chunks of large text record files get parsed in a process pool.
+        Records are ordered by when they were last modified because records do not store absolute times.'''
+    record_paths = compute_record_paths_in_chronological_order(directory)
+    if workers == 1:
+        return RecordCollection([compute_record_file_result(path, read_file_record(path)) for path in record_paths])
+    units_by_record = [compute_record_units(path, chunk_size_bytes) for path in record_paths]
+    units = [unit for record_units in units_by_record for unit in record_units]
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        unit_results = iter(executor.map(parse_record_unit, units))
+        file_results = []
+        for path, record_units in zip(record_paths, units_by_record):
+            records = merge_unit_results(next(unit_results) for _ in record_units)
+            file_results.append(compute_record_file_result(path, records))
+    return RecordCollection(file_results)
+
+def compute_record_paths_in_chronological_order(directory: str):
+    '''Records with the same name in different formats, for instance after the record file format setting changed, are separate records'''
+    record_paths = set()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and is_record_file_name(entry.name):
+                record_paths.add(entry.path)
+    segment_directory = os.path.join(directory, RECORD_SEGMENT_DIRECTORY_NAME)
+    if os.path.isdir(segment_directory):
+        for name in os.listdir(segment_directory):
+            for extension in compute_record_segment_format_extensions(os.path.join(segment_directory, name)):
+                record_paths.add(os.path.join(directory, name + extension))
+    return sorted(record_paths, key = compute_record_last_modified_time)
+
+def compute_record_last_modified_time(record_path: str) -> float:
+    if os.path.exists(record_path):
+        return os.path.getmtime(record_path)
+    segment_paths = compute_record_segment_paths(record_path)
+    if segment_paths:
+        return os.path.getmtime(segment_paths[-1])
+    return 0
+
+def compute_record_units(record_path: str, chunk_size_bytes: int):
+    units = [RecordUnit(segment_path) for segment_path in compute_record_segment_paths(record_path)]
+    if os.path.exists(record_path):
+        if is_text_record_path(record_path):
+            offsets = compute_text_record_chunk_offsets(record_path, chunk_size_bytes)
+            units.extend(RecordUnit(record_path, start, end) for start, end in zip(offsets, offsets[1:]))
+        else:
+            units.append(RecordUnit(record_path))
+    return units
+
+def compute_text_record_chunk_offsets(path: str, chunk_size_bytes: int):
+    '''Splits a text record into byte ranges that begin where a command or recording starts so that the parsers of the ranges synchronize right away'''
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as file:
+        while offsets[-1] + chunk_size_bytes < size:
+            boundary = find_chunk_boundary(file, offsets[-1] + chunk_size_bytes)
+            if boundary is None or boundary >= size:
+                break
+            offsets.append(boundary)
+    offsets.append(size)
+    return offsets
+
+def find_chunk_boundary(file, offset: int):
+    file.seek(offset)
+    file.readline()
+    previous_line = None
+    line_start_offset = file.tell()
+    line = file.readline()
+    while line:
+        if line.startswith(TIME_DIFFERENCE_PREFIX.encode()) or line.strip() == RECORDING_START_MESSAGE.encode():
+            return line_start_offset
+        if line.startswith(COMMAND_NAME_PREFIX.encode()) and previous_line is not None and not previous_line.startswith(TIME_DIFFERENCE_PREFIX.encode()):
+            return line_start_offset
+        previous_line = line
+        line_start_offset = file.tell()
+        line = file.readline()
+    return None
+
+def parse_record_unit(unit: RecordUnit) -> RecordUnitResult:
+    if is_text_record_path(unit.path):
+        entries = read_text_record_unit_entries(unit)
+    else:
+        entries = list(iter_record_segment_entries(unit.path))
+    synchronization_index, synchronization_entry_count = compute_synchronization_point(entries)
+    if synchronization_entry_count == 0:
+        return RecordUnitResult(entries)
+    parser = RecordParser()
+    for entry in entries[synchronization_index:synchronization_index + synchronization_entry_count]:
+        parser.process_entry(entry)
+    # The parser that read everything before the unit produces the records for the synchronization entries itself
+    parser.take_records()
+    for entry in entries[synchronization_index + synchronization_entry_count:]:
+        parser.process_entry(entry)
+    return RecordUnitResult(entries[:synchronization_index + synchronization_entry_count], parser.take_records(), parser)
+
+def read_text_record_unit_entries(unit: RecordUnit):
+    encoding = locale.getpreferredencoding(False)
+    with open_record_segment(unit.path) as file:
+        file.seek(unit.start_offset)
+        data = file.read() if unit.end_offset is None else file.read(unit.end_offset - unit.start_offset)
+    entries = []
+    for raw_line in data.splitlines():
+        entry = compute_record_entry_from_line(raw_line.decode(encoding).strip())
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+def compute_synchronization_point(entries):
+    '''Finds the first entries after which a fresh parser is in the same state as one that parsed anything else before them.
+        Returns their index and how many there are, which is an index of len(entries) when there is no such point.
+        A time difference followed by a command start always synchronizes the parsers.
+        A command or recording start does if a command or recording start came before it in the unit without a time difference in between,
+        since the time difference found before a command is the only state that survives a command start.'''
+    command_started_without_time_difference = False
+    for index, (kind, _) in enumerate(entries):
+        if kind == RECORD_ENTRY_TIME_DIFFERENCE:
+            if index + 1 < len(entries) and entries[index + 1][0] == RECORD_ENTRY_COMMAND_START:
+                return index, 2
+            command_started_without_time_difference = False
+        elif kind == RECORD_ENTRY_COMMAND_START or kind == RECORD_ENTRY_RECORDING_START:
+            if command_started_without_time_difference:
+                return index, 1
+            command_started_without_time_difference = True
+    return len(entries), 0
+
+def merge_unit_results(unit_results):
+    '''Combines the results of the units of a record in order into the records that parsing the whole record sequentially gives'''
+    records = []
+    parser = RecordParser()
+    for unit_result in unit_results:
+        for entry in unit_result.leading_entries:
+            parser.process_entry(entry)
+        records.extend(parser.take_records())
+        if unit_result.is_synchronized():
+            records.extend(unit_result.records)
+            parser = unit_result.parser
+    parser.finish()
+    records.extend(parser.take_records())
+    return records
+
+def compute_record_file_result(record_path: str, records) -> RecordFileResult:
+    command_count = 0
+    action_count = 0
+    recording_start_count = 0
+    recorded_seconds = 0
+    for record in records:
+        if record.is_command_record():
+            command_count += 1
+            action_count += len(record.get_actions())
+            if record.is_time_information_available():
+                recorded_seconds += record.get_seconds_since_action()
+        else:
+            recording_start_count += 1
+    metadata = RecordFileMetadata(record_path, len(compute_record_segment_paths(record_path)), command_count, action_count,
+        recording_start_count, recorded_seconds, compute_record_last_modified_time(record_path))
+    return RecordFileResult(record_path, records, metadata)
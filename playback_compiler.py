@@ -0,0 +1,42 @@
+from .action_records import BasicAction
+from .action_optimizer import optimize_actions, PLAYBACK_COALESCING_PASSES
+
+class PlaybackPlan:
+    '''The actions of a recording resolved to the functions that perform them along with their converted arguments'''
+    def __init__(self, steps):
+        self.steps = steps
+
+    def perform(self):
+        for function, arguments in self.steps:
+            function(*arguments)
+
+    def get_step_count(self) -> int:
+        return len(self.steps)
+
+def compile_playback_plan(recorded_actions, action_namespace, coalesce: bool = False) -> PlaybackPlan:
+    '''Resolves every action to its function in the action namespace (talon.actions) once.
+        With coalesce, adjacent inserts and consecutive key actions get performed as single actions.'''
+    if coalesce:
+        recorded_actions = optimize_actions(recorded_actions, PLAYBACK_COALESCING_PASSES)
+    functions = {}
+    steps = []
+    for action in recorded_actions:
+        name = action.get_name()
+        function = functions.get(name)
+        if function is None:
+            function = resolve_action_function(action_namespace, name)
+            functions[name] = function
+        steps.append((function, compute_playback_arguments(action)))
+    return PlaybackPlan(tuple(steps))
+
+def resolve_action_function(action_namespace, name: str):
+    function = action_namespace
+    for part in name.split('.'):
+        function = getattr(function, part)
+    return function
+
+def compute_playback_arguments(action: BasicAction) -> tuple:
+    arguments = action.get_arguments()
+    if action.get_name() == 'sleep': #Special case for sleep because it cannot be recorded directly
+        return (str(arguments[0]),)
+    return tuple(arguments)
@@ -0,0 +1,227 @@
+import json
+import os
+from .record_files import read_file_record, compute_active_record_path, compute_record_segment_paths
+from .command_store import CommandStore, ARGUMENT_INTEGER, ARGUMENT_FLOAT, ARGUMENT_STRING, NO_TIME_INFORMATION, RECORDING_START_NAME_CODE
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NO_CODE = -1
+MOUSE_MOVE_ACTION_NAME = 'mouse_move'
+KEY_ACTION_NAME = 'key'
+STRING_ENCODING = 'utf-8'
+STRING_ENCODING_ERRORS = 'surrogatepass'
+SOURCE_SIGNATURE_NAME = 'source_signature'
+COLUMN_NAMES = (
+    'command_record_ids', 'command_segment_ids', 'command_name_codes', 'command_seconds_since_action', 'command_action_starts',
+    'action_command_ids', 'action_segment_ids', 'action_name_codes', 'action_string_codes', 'action_x', 'action_y',
+    'string_bytes', 'string_offsets',
+)
+
+def require_numpy():
+    if numpy is None:
+        raise ImportError('The numpy package is needed for record columns')
+
+class RecordColumns:
+    '''The commands and actions of one or more records as columns of numpy arrays. Recording starts are not rows but end segments,
+        and segment ids keep counting up across records. Names and string arguments are codes into a shared string table.
+        Actions that are not mouse movements have NaN coordinates, actions without a string first argument have a string code of -1,
+        and commands without time information have NaN as their seconds since the last action.
+        command_action_starts has an extra entry at the end so that the actions of command i are at command_action_starts[i]:command_action_starts[i + 1].'''
+    def __init__(self, columns: dict, record_paths):
+        for name in COLUMN_NAMES:
+            setattr(self, name, columns[name])
+        self.record_paths = list(record_paths)
+        self.string_codes = None
+
+    def get_command_count(self) -> int:
+        return len(self.command_name_codes)
+
+    def get_action_count(self) -> int:
+        return len(self.action_name_codes)
+
+    def get_string_count(self) -> int:
+        return len(self.string_offsets) - 1
+
+    def get_string(self, code: int) -> str:
+        start = self.string_offsets[code]
+        end = self.string_offsets[code + 1]
+        return self.string_bytes[start:end].tobytes().decode(STRING_ENCODING, STRING_ENCODING_ERRORS)
+
+    def compute_strings(self):
+        return [self.get_string(code) for code in range(self.get_string_count())]
+
+    def compute_string_code(self, text: str) -> int:
+        '''Returns the code of the string or -1 if it is not in the string table'''
+        if self.string_codes is None:
+            self.string_codes = {text: code for code, text in enumerate(self.compute_strings())}
+        return self.string_codes.get(text, NO_CODE)
+
+    def get_columns(self) -> dict:
+        return {name: getattr(self, name) for name in COLUMN_NAMES}
+
+def compute_record_columns(records_by_path) -> RecordColumns:
+    '''Builds the columns from (record path, records) pairs, such as a path with the output of read_file_record'''
+    require_numpy()
+    store = CommandStore()
+    record_paths = []
+    record_ends = []
+    for path, records in records_by_path:
+        store.extend(records)
+        record_paths.append(path)
+        record_ends.append(len(store))
+    name_codes = compute_array(store.command_name_codes, numpy.int64)
+    is_command = name_codes != RECORDING_START_NAME_CODE
+    row_record_ids = numpy.repeat(numpy.arange(len(record_ends)), numpy.diff(numpy.array([0] + record_ends, dtype = numpy.int64)))
+    # Every recording start and every record after the first begins a new segment
+    starts_segment = ~is_command
+    record_starts = numpy.array(record_ends[:-1], dtype = numpy.int64)
+    starts_segment[record_starts[record_starts < len(starts_segment)]] = True
+    row_segment_ids = numpy.cumsum(starts_segment)
+    seconds_since_action = compute_array(store.command_seconds_since_action, numpy.int64)
+    row_action_starts = compute_array(store.command_action_starts, numpy.int64)
+    action_counts = numpy.diff(row_action_starts)[is_command]
+    command_action_starts = numpy.concatenate(([0], numpy.cumsum(action_counts))).astype(numpy.int64)
+    command_segment_ids = row_segment_ids[is_command]
+    columns = {
+        'command_record_ids': row_record_ids[is_command].astype(numpy.int32),
+        'command_segment_ids': command_segment_ids.astype(numpy.int32),
+        'command_name_codes': name_codes[is_command].astype(numpy.int32),
+        'command_seconds_since_action': numpy.where(seconds_since_action == NO_TIME_INFORMATION, numpy.nan, seconds_since_action)[is_command],
+        'command_action_starts': command_action_starts,
+        'action_command_ids': numpy.repeat(numpy.arange(len(action_counts), dtype = numpy.int32), action_counts),
+        'action_segment_ids': numpy.repeat(command_segment_ids, action_counts).astype(numpy.int32),
+        'action_name_codes': compute_array(store.action_name_codes, numpy.int32),
+    }
+    columns.update(compute_argument_columns(store, columns['action_name_codes']))
+    columns['string_bytes'], columns['string_offsets'] = compute_string_table(store.strings)
+    return RecordColumns(columns, record_paths)
+
+def compute_array(values, dtype):
+    return numpy.frombuffer(values, dtype = values.typecode).astype(dtype) if len(values) > 0 else numpy.zeros(0, dtype = dtype)
+
+def compute_argument_columns(store: CommandStore, action_name_codes) -> dict:
+    argument_starts = compute_array(store.action_argument_starts, numpy.int64)
+    argument_counts = numpy.diff(argument_starts)
+    first_arguments = argument_starts[:-1]
+    argument_kinds = compute_array(store.argument_kinds, numpy.uint8)
+    argument_values = compute_array(store.argument_values, numpy.float64)
+    has_argument = argument_counts > 0
+    string_codes = numpy.full(len(action_name_codes), NO_CODE, dtype = numpy.int32)
+    has_string_argument = has_argument.copy()
+    has_string_argument[has_argument] = argument_kinds[first_arguments[has_argument]] == ARGUMENT_STRING
+    string_codes[has_string_argument] = argument_values[first_arguments[has_string_argument]]
+    action_x = numpy.full(len(action_name_codes), numpy.nan)
+    action_y = numpy.full(len(action_name_codes), numpy.nan)
+    mouse_move_code = store.string_codes.get(MOUSE_MOVE_ACTION_NAME)
+    if mouse_move_code is not None:
+        is_mouse_move = (action_name_codes == mouse_move_code) & (argument_counts >= 2)
+        is_mouse_move[is_mouse_move] = is_number_kind(argument_kinds[first_arguments[is_mouse_move]]) & \
+            is_number_kind(argument_kinds[first_arguments[is_mouse_move] + 1])
+        action_x[is_mouse_move] = argument_values[first_arguments[is_mouse_move]]
+        action_y[is_mouse_move] = argument_values[first_arguments[is_mouse_move] + 1]
+    return {'action_string_codes': string_codes, 'action_x': action_x, 'action_y': action_y}
+
+def is_number_kind(kinds):
+    return (kinds == ARGUMENT_INTEGER) | (kinds == ARGUMENT_FLOAT)
+
+def compute_string_table(strings):
+    encoded_strings = [text.encode(STRING_ENCODING, STRING_ENCODING_ERRORS) for text in strings]
+    offsets = numpy.zeros(len(encoded_strings) + 1, dtype = numpy.int64)
+    numpy.cumsum([len(encoded_string) for encoded_string in encoded_strings], out = offsets[1:])
+    return numpy.frombuffer(b''.join(encoded_strings), dtype = numpy.uint8), offsets
+
+def compute_record_source_paths(path: str):
+    record_path = compute_active_record_path(path)
+    source_paths = compute_record_segment_paths(record_path)
+    if os.path.exists(record_path):
+        source_paths.append(record_path)
+    return source_paths
+
+def compute_source_signature(paths) -> str:
+    '''Describes the files the records were read from, so that a cache can tell when any of them changed'''
+    signature = []
+    for path in paths:
+        for source_path in compute_record_source_paths(path):
+            status = os.stat(source_path)
+            signature.append([os.path.abspath(source_path), status.st_size, status.st_mtime_ns])
+    return json.dumps(signature)
+
+def save_record_columns(columns: RecordColumns, path: str, source_signature: str = ''):
+    '''Saves the columns to a compressed .npz file'''
+    require_numpy()
+    numpy.savez_compressed(path, record_paths = numpy.array(columns.record_paths, dtype = str),
+        **{SOURCE_SIGNATURE_NAME: numpy.array(source_signature)}, **columns.get_columns())
+
+def load_record_columns(path: str) -> RecordColumns:
+    require_numpy()
+    with numpy.load(path) as data:
+        return RecordColumns({name: data[name] for name in COLUMN_NAMES}, data['record_paths'].tolist())
+
+def load_cached_record_source_signature(cache_path: str):
+    try:
+        with numpy.load(cache_path) as data:
+            return str(data[SOURCE_SIGNATURE_NAME])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def read_record_columns(paths, cache_path: str = None) -> RecordColumns:
+    '''Reads the records at the paths into columns. With a cache path, the columns get loaded from the cache when none of the record files
+        or their segments changed since it was saved, and otherwise get saved to it after reading the records.'''
+    require_numpy()
+    if isinstance(paths, str):
+        paths = [paths]
+    if cache_path is None:
+        return compute_record_columns((path, read_file_record(path)) for path in paths)
+    source_signature = compute_source_signature(paths)
+    if os.path.exists(cache_path) and load_cached_record_source_signature(cache_path) == source_signature:
+        return load_record_columns(cache_path)
+    columns = compute_record_columns((path, read_file_record(path)) for path in paths)
+    save_record_columns(columns, cache_path, source_signature)
+    return columns
+
+def compute_code_counts(columns: RecordColumns, codes) -> dict:
+    '''Counts how many times each code appears and returns the counts by string'''
+    codes = codes[codes >= 0]
+    counts = numpy.bincount(codes, minlength = columns.get_string_count())
+    return {columns.get_string(code): int(counts[code]) for code in numpy.flatnonzero(counts)}
+
+def compute_command_name_counts(columns: RecordColumns) -> dict:
+    return compute_code_counts(columns, columns.command_name_codes)
+
+def compute_action_name_counts(columns: RecordColumns) -> dict:
+    return compute_code_counts(columns, columns.action_name_codes)
+
+def compute_key_frequencies(columns: RecordColumns) -> dict:
+    '''Counts the key actions by their key argument, such as ctrl-c'''
+    key_code = columns.compute_string_code(KEY_ACTION_NAME)
+    return compute_code_counts(columns, columns.action_string_codes[columns.action_name_codes == key_code])
+
+def compute_actions_per_command(columns: RecordColumns):
+    return numpy.diff(columns.command_action_starts)
+
+def compute_command_gaps(columns: RecordColumns):
+    '''Returns the seconds between each command and the last action before it for the commands with time information'''
+    gaps = columns.command_seconds_since_action
+    return gaps[~numpy.isnan(gaps)]
+
+def compute_command_gap_histogram(columns: RecordColumns, bins = 10):
+    '''Returns the counts and bin edges of the distribution of the seconds between commands'''
+    return numpy.histogram(compute_command_gaps(columns), bins = bins)
+
+def compute_mouse_travel_distances(columns: RecordColumns):
+    '''Returns the distance the mouse moved within each segment, only counting movement between consecutive recorded mouse movements'''
+    is_mouse_move = ~numpy.isnan(columns.action_x)
+    x = columns.action_x[is_mouse_move]
+    y = columns.action_y[is_mouse_move]
+    segment_ids = columns.action_segment_ids[is_mouse_move]
+    segment_count = int(columns.command_segment_ids.max()) + 1 if columns.get_command_count() > 0 else 0
+    if len(x) < 2:
+        return numpy.zeros(segment_count)
+    distances = numpy.hypot(numpy.diff(x), numpy.diff(y))
+    within_segment = segment_ids[1:] == segment_ids[:-1]
+    return numpy.bincount(segment_ids[1:][within_segment], weights = distances[within_segment], minlength = segment_count)
+
+def compute_mouse_travel_distance(columns: RecordColumns) -> float:
+    return float(compute_mouse_travel_distances(columns).sum())
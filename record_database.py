@@ -0,0 +1,375 @@
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from .action_records import BasicAction, Command, RecordParser, RECORD_ENTRY_COMMAND_START, \
+    RECORD_ENTRY_RECORDING_START, compute_json_text_for_value, compute_value_from_json_text
+from .record_files import iter_file_record, compute_active_record_path
+
+RECORD_DATABASE_FILE_NAME = 'records.sqlite3'
+LIVE_RECORD_SOURCE = 'live'
+DEFAULT_MAXIMUM_QUEUE_SIZE = 50000
+DEFAULT_COMMIT_INTERVAL_SECONDS = 1.0
+IMPORT_BATCH_SIZE = 10000
+# Older versions of sqlite only allow 999 parameters in a statement
+QUERY_BATCH_SIZE = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    name TEXT,
+    seconds_since_action INTEGER,
+    timestamp REAL
+);
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    command_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    arguments TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commands_by_name ON commands (name);
+CREATE INDEX IF NOT EXISTS commands_by_timestamp ON commands (timestamp);
+CREATE INDEX IF NOT EXISTS commands_by_source ON commands (source);
+CREATE INDEX IF NOT EXISTS actions_by_name ON actions (name, command_id);
+CREATE INDEX IF NOT EXISTS actions_by_command ON actions (command_id);
+'''
+
+class RecordDatabase:
+    '''Stores records in a sqlite database with indexes on command names, action names, and command timestamps so that they can be queried without reading whole records.
+        Recording starts are stored as commands without a name. Every command belongs to a source, which is the name of the record it was imported from
+        or live for commands recorded while the database was enabled. Only live commands have timestamps because records do not store when commands were spoken.
+        A connection can only be used on the thread that opened it, but any number of threads can have their own connection to the same database.'''
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level = None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def get_path(self) -> str:
+        return self.path
+
+    def close(self):
+        self.connection.close()
+
+    def insert_records(self, records, source: str, timestamps = None):
+        '''Appends the commands and recording starts to the source in a single transaction. timestamps has the time each record started or None.
+            Returns how many actions could not be stored because their arguments cannot be encoded as JSON.'''
+        return self.run_in_transaction(self.insert_records_in_transaction, records, source, timestamps)
+
+    def replace_source(self, records, source: str) -> int:
+        '''Replaces everything stored for the source with the records in a single transaction'''
+        return self.run_in_transaction(self.replace_source_in_transaction, records, source)
+
+    def delete_source(self, source: str):
+        self.run_in_transaction(self.delete_source_in_transaction, source)
+
+    def run_in_transaction(self, function, *arguments):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = function(*arguments)
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return result
+
+    def replace_source_in_transaction(self, records, source: str) -> int:
+        self.delete_source_in_transaction(source)
+        return self.insert_records_in_transaction(records, source, None)
+
+    def delete_source_in_transaction(self, source: str):
+        self.connection.execute('DELETE FROM actions WHERE command_id IN (SELECT id FROM commands WHERE source = ?)', (source,))
+        self.connection.execute('DELETE FROM commands WHERE source = ?', (source,))
+
+    def insert_records_in_transaction(self, records, source: str, timestamps):
+        # The write lock taken at the start of the transaction keeps other connections from using the ids assigned here
+        command_id = self.connection.execute('SELECT COALESCE(MAX(id), 0) FROM commands').fetchone()[0]
+        command_rows = []
+        action_rows = []
+        invalid_action_count = 0
+        if timestamps is None:
+            timestamps = itertools.repeat(None)
+        for record, timestamp in zip(records, timestamps):
+            command_id += 1
+            if record.is_command_record():
+                command_rows.append((command_id, source, record.get_name(), record.get_seconds_since_action(), timestamp))
+                for action in record.get_actions():
+                    try:
+                        action_rows.append((command_id, action.get_name(), compute_json_text_for_value(action.get_arguments())))
+                    except (TypeError, ValueError):
+                        invalid_action_count += 1
+            else:
+                command_rows.append((command_id, source, None, None, timestamp))
+            if len(action_rows) >= IMPORT_BATCH_SIZE or len(command_rows) >= IMPORT_BATCH_SIZE:
+                self.insert_rows(command_rows, action_rows)
+                command_rows = []
+                action_rows = []
+        self.insert_rows(command_rows, action_rows)
+        return invalid_action_count
+
+    def insert_rows(self, command_rows, action_rows):
+        self.connection.executemany('INSERT INTO commands (id, source, name, seconds_since_action, timestamp) VALUES (?, ?, ?, ?, ?)', command_rows)
+        self.connection.executemany('INSERT INTO actions (command_id, name, arguments) VALUES (?, ?, ?)', action_rows)
+
+    def compute_sources(self):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT source FROM commands ORDER BY source')]
+
+    def count_commands(self, name: str, start_time: float = None, end_time: float = None) -> int:
+        '''Counts the commands with the name, only counting live commands that started within the time range if one is given'''
+        condition, parameters = compute_command_condition(name, start_time, end_time)
+        return self.connection.execute('SELECT COUNT(*) FROM commands WHERE ' + condition, parameters).fetchone()[0]
+
+    def compute_commands(self, name: str = None, start_time: float = None, end_time: float = None, limit: int = None):
+        '''Returns the commands with the name, or every command if name is None, in the order they were recorded.
+            A time range only includes live commands that started within it.'''
+        condition, parameters = compute_command_condition(name, start_time, end_time)
+        return self.compute_commands_from_query('SELECT id, name, seconds_since_action FROM commands WHERE ' + condition + ' ORDER BY id', parameters, limit)
+
+    def compute_commands_with_action(self, action_name: str, limit: int = None):
+        '''Returns the commands that performed an action with the name'''
+        query = 'SELECT id, name, seconds_since_action FROM commands WHERE id IN (SELECT command_id FROM actions WHERE name = ?) ORDER BY id'
+        return self.compute_commands_from_query(query, (action_name,), limit)
+
+    def compute_commands_following(self, name: str, limit: int = None):
+        '''Returns the command recorded right after each command with the name, skipping the ones followed by a recording start or nothing'''
+        query = '''SELECT next.id, next.name, next.seconds_since_action FROM commands AS command
+            JOIN commands AS next ON next.id = (SELECT id FROM commands WHERE source = command.source AND id > command.id ORDER BY id LIMIT 1)
+            WHERE command.name = ? AND next.name IS NOT NULL ORDER BY command.id'''
+        return self.compute_commands_from_query(query, (name,), limit)
+
+    def compute_action_counts(self, limit: int = None):
+        '''Returns (action name, count) pairs from the most performed action to the least'''
+        query = 'SELECT name, COUNT(*) AS count FROM actions GROUP BY name ORDER BY count DESC'
+        if limit is not None:
+            return self.connection.execute(query + ' LIMIT ?', (limit,)).fetchall()
+        return self.connection.execute(query).fetchall()
+
+    def compute_commands_from_query(self, query: str, parameters, limit: int = None):
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters = tuple(parameters) + (limit,)
+        rows = self.connection.execute(query, parameters).fetchall()
+        actions = self.compute_command_actions([row[0] for row in rows])
+        return [Command(name, actions.get(command_id, []), seconds_since_action) for command_id, name, seconds_since_action in rows]
+
+    def compute_command_actions(self, command_ids):
+        '''Returns a dictionary from command id to the actions of the command in the order they were performed'''
+        actions = {}
+        for start in range(0, len(command_ids), QUERY_BATCH_SIZE):
+            batch = command_ids[start:start + QUERY_BATCH_SIZE]
+            query = 'SELECT command_id, name, arguments FROM actions WHERE command_id IN (' + ','.join('?'*len(batch)) + ') ORDER BY id'
+            for command_id, name, arguments in self.connection.execute(query, batch):
+                actions.setdefault(command_id, []).append(BasicAction(name, compute_value_from_json_text(arguments)))
+        return actions
+
+def compute_command_condition(name: str, start_time: float, end_time: float):
+    conditions = ['name IS NOT NULL' if name is None else 'name = ?']
+    parameters = [] if name is None else [name]
+    if start_time is not None:
+        conditions.append('timestamp >= ?')
+        parameters.append(start_time)
+    if end_time is not None:
+        conditions.append('timestamp < ?')
+        parameters.append(end_time)
+    return ' AND '.join(conditions), parameters
+
+def compute_record_database_path(directory: str) -> str:
+    return os.path.join(directory, RECORD_DATABASE_FILE_NAME)
+
+def compute_record_source_name(path: str) -> str:
+    return os.path.basename(compute_active_record_path(path))
+
+def import_record(database: RecordDatabase, path: str) -> int:
+    '''Imports a record along with its sealed segments in a single pass, replacing what was imported from it before. Returns how many commands were imported.'''
+    command_counter = itertools.count()
+    def count_commands(records):
+        for record in records:
+            if record.is_command_record():
+                next(command_counter)
+            yield record
+    database.replace_source(count_commands(iter_file_record(path)), compute_record_source_name(path))
+    return next(command_counter)
+
+class RecordDatabaseWriter:
+    '''Stores live record entries in the record database from a background thread through a bounded queue so that recording never waits on the database.
+        The entries queued since the last commit get stored in a single transaction at most every commit_interval_seconds.
+        A command gets stored once the next command or recording start arrives, since its actions come after its start.'''
+    def __init__(self, maximum_queue_size: int = DEFAULT_MAXIMUM_QUEUE_SIZE, commit_interval_seconds: float = DEFAULT_COMMIT_INTERVAL_SECONDS):
+        self.maximum_queue_size = maximum_queue_size
+        self.commit_interval_seconds = commit_interval_seconds
+        self.path = None
+        self.database = None
+        self.parser = RecordParser()
+        self.current_command_timestamp = None
+        self.queue = deque()
+        self.tasks = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.closing = False
+        self.requested_flush_number = 0
+        self.completed_flush_number = 0
+        self.stored_command_count = 0
+        self.dropped_entry_count = 0
+        self.error_count = 0
+
+    def set_path(self, path: str):
+        with self.condition:
+            self.path = path
+
+    def write_entries(self, entries):
+        '''Queues the entries along with the current time. Drops all of them if the queue does not have room for them.'''
+        with self.condition:
+            if len(self.queue) + len(entries) > self.maximum_queue_size or self.closing:
+                self.dropped_entry_count += len(entries)
+                return
+            timestamp = time.time()
+            was_empty = len(self.queue) == 0
+            for entry in entries:
+                self.queue.append((entry, timestamp))
+            self.start_thread_if_needed()
+            if was_empty:
+                self.condition.notify()
+
+    def run_database_task(self, task):
+        '''Runs task(database) on the background thread, such as to import a record without blocking talon'''
+        with self.condition:
+            self.tasks.append(task)
+            self.start_thread_if_needed()
+            self.condition.notify()
+
+    def flush(self, timeout: float = None) -> bool:
+        '''Waits until every entry queued so far has been handled. Returns False if the timeout expired first.'''
+        with self.condition:
+            if self.thread is None:
+                return len(self.queue) == 0
+            self.requested_flush_number += 1
+            flush_number = self.requested_flush_number
+            self.condition.notify()
+            return self.condition.wait_for(lambda: self.completed_flush_number >= flush_number, timeout)
+
+    def close(self, timeout: float = None):
+        '''Stores the remaining entries including the current command, stops the background thread, and closes the database'''
+        with self.condition:
+            thread = self.thread
+            self.closing = True
+            self.condition.notify()
+        if thread is not None:
+            thread.join(timeout)
+        with self.condition:
+            self.thread = None
+            self.closing = False
+
+    def get_stored_command_count(self) -> int:
+        return self.stored_command_count
+
+    def get_dropped_entry_count(self) -> int:
+        return self.dropped_entry_count
+
+    def get_error_count(self) -> int:
+        return self.error_count
+
+    def start_thread_if_needed(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target = self.run, name = 'BAR record database writer', daemon = True)
+            self.thread.start()
+
+    def is_work_urgent(self):
+        return self.closing or self.requested_flush_number > self.completed_flush_number or len(self.tasks) > 0
+
+    def run(self):
+        while True:
+            with self.condition:
+                if len(self.queue) == 0 and not self.is_work_urgent():
+                    self.condition.wait()
+                self.condition.wait_for(self.is_work_urgent, self.commit_interval_seconds)
+                queued_entries = list(self.queue)
+                self.queue.clear()
+                tasks = self.tasks
+                self.tasks = []
+                path = self.path
+                flush_number = self.requested_flush_number
+                closing = self.closing
+            self.handle_queued_work(path, queued_entries, tasks, closing)
+            with self.condition:
+                self.completed_flush_number = flush_number
+                self.condition.notify_all()
+                if closing and len(self.queue) == 0:
+                    return
+
+    def handle_queued_work(self, path: str, queued_entries, tasks, closing: bool):
+        # Any failure gets counted instead of ending the thread, which would leave the queue filling up and flushes waiting forever
+        try:
+            database = self.compute_database(path)
+            if database is None:
+                self.count_dropped_entries(len(queued_entries))
+                return
+            try:
+                self.store_entries(database, queued_entries, closing)
+            except Exception as exception:
+                self.count_error()
+                print('Basic Action Recorder: failed to store entries in the record database', path, exception)
+            for task in tasks:
+                try:
+                    task(database)
+                except Exception as exception:
+                    self.count_error()
+                    print('Basic Action Recorder: a record database task failed', path, exception)
+        except Exception as exception:
+            self.count_error()
+            print('Basic Action Recorder: failed to use the record database', path, exception)
+        finally:
+            if closing:
+                try:
+                    self.close_database()
+                except Exception as exception:
+                    self.database = None
+                    print('Basic Action Recorder: failed to close the record database', path, exception)
+
+    def compute_database(self, path: str):
+        if self.database is not None and self.database.get_path() != path:
+            self.close_database()
+        if self.database is None and path is not None:
+            self.database = RecordDatabase(path)
+        return self.database
+
+    def close_database(self):
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+
+    def store_entries(self, database: RecordDatabase, queued_entries, closing: bool):
+        records = []
+        timestamps = []
+        for entry, timestamp in queued_entries:
+            kind = entry[0]
+            if kind == RECORD_ENTRY_COMMAND_START or kind == RECORD_ENTRY_RECORDING_START:
+                # The parser only completes a command when the next one starts, so the completed command started at the previous command start
+                self.parser.process_entry(entry)
+                self.take_parsed_records(records, timestamps)
+                self.current_command_timestamp = timestamp if kind == RECORD_ENTRY_COMMAND_START else None
+            else:
+                self.parser.process_entry(entry)
+        if closing:
+            self.parser.finish()
+            self.take_parsed_records(records, timestamps)
+        if records:
+            invalid_action_count = database.insert_records(records, LIVE_RECORD_SOURCE, timestamps)
+            self.stored_command_count += sum(1 for record in records if record.is_command_record())
+            self.count_dropped_entries(invalid_action_count)
+
+    def count_dropped_entries(self, count: int):
+        with self.condition:
+            self.dropped_entry_count += count
+
+    def count_error(self):
+        with self.condition:
+            self.error_count += 1
+
+    def take_parsed_records(self, records, timestamps):
+        for record in self.parser.take_records():
+            records.append(record)
+            timestamps.append(self.current_command_timestamp if record.is_command_record() else None)
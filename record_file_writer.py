@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+from collections import deque
+from .record_rotation import RecordRotationPolicy, compute_record_start_time, seal_record_file, compress_segment_in_background
+
+DEFAULT_MAXIMUM_QUEUE_SIZE = 50000
+DEFAULT_FLUSH_ENTRY_COUNT = 512
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_IDLE_CLOSE_SECONDS = 30.0
+
+class RecordFileWriterStatistics:
+    def __init__(self, queue_depth: int, maximum_queue_depth: int, written_entry_count: int, dropped_entry_count: int, flush_count: int, error_count: int, rotation_count: int):
+        self.queue_depth = queue_depth
+        self.maximum_queue_depth = maximum_queue_depth
+        self.written_entry_count = written_entry_count
+        self.dropped_entry_count = dropped_entry_count
+        self.flush_count = flush_count
+        self.error_count = error_count
+        self.rotation_count = rotation_count
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'queue depth: {self.queue_depth}, maximum queue depth: {self.maximum_queue_depth}, written entries: {self.written_entry_count}, ' + \
+            f'dropped entries: {self.dropped_entry_count}, flushes: {self.flush_count}, errors: {self.error_count}, rotations: {self.rotation_count}'
+
+class RecordFileWriter:
+    '''Appends record entries to a record file from a background thread through a bounded queue so that the caller never performs file input/output'''
+    def __init__(self, maximum_queue_size: int = DEFAULT_MAXIMUM_QUEUE_SIZE, flush_entry_count: int = DEFAULT_FLUSH_ENTRY_COUNT,
+                flush_interval_seconds: float = DEFAULT_FLUSH_INTERVAL_SECONDS, idle_close_seconds: float = DEFAULT_IDLE_CLOSE_SECONDS):
+        self.maximum_queue_size = maximum_queue_size
+        self.flush_entry_count = flush_entry_count
+        self.flush_interval_seconds = flush_interval_seconds
+        self.idle_close_seconds = idle_close_seconds
+        self.path = None
+        self.record_format = None
+        self.file = None
+        self.file_path = None
+        self.file_record_format = None
+        self.file_start_time = 0
+        self.record_start_times = {}
+        self.rotation_policy = RecordRotationPolicy()
+        self.last_write_time = 0
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.requested_flush_number = 0
+        self.completed_flush_number = 0
+        self.thread = None
+        self.closing = False
+        self.file_tasks = []
+        self.maximum_queue_depth = 0
+        self.written_entry_count = 0
+        self.dropped_entry_count = 0
+        self.flush_count = 0
+        self.error_count = 0
+        self.rotation_count = 0
+        self.flush_listener = None
+
+    def set_flush_listener(self, flush_listener):
+        '''The listener gets called with the path of the record file on the background thread every time entries have been written to it and flushed'''
+        with self.condition:
+            self.flush_listener = flush_listener
+
+    def set_rotation_policy(self, rotation_policy: RecordRotationPolicy):
+        with self.condition:
+            self.rotation_policy = rotation_policy
+
+    def set_record_start_time(self, path: str, start_time: float):
+        '''Sets when the record file started, for instance from the saved record state, so that its age for rotation survives restarting talon'''
+        with self.condition:
+            self.record_start_times[path] = start_time
+
+    def get_record_start_time(self, path: str):
+        '''Returns when the record file started or None if it has not been opened or set yet'''
+        with self.condition:
+            return self.record_start_times.get(path)
+
+    def set_path(self, path: str, record_format):
+        '''Changes the file and format that later entries get written with after flushing the entries queued for the previous file'''
+        if path == self.path and record_format is self.record_format:
+            return
+        if self.path is not None:
+            self.flush()
+        with self.condition:
+            self.path = path
+            self.record_format = record_format
+
+    def get_path(self):
+        return self.path
+
+    def write_entry(self, entry):
+        self.write_entries((entry,))
+
+    def write_entries(self, entries):
+        '''Queues the entries to get written together. Drops all of them if the queue does not have room for them.'''
+        with self.condition:
+            if len(self.queue) + len(entries) > self.maximum_queue_size or self.closing:
+                self.dropped_entry_count += len(entries)
+                return
+            was_empty = len(self.queue) == 0
+            self.queue.extend(entries)
+            queue_depth = len(self.queue)
+            if queue_depth > self.maximum_queue_depth:
+                self.maximum_queue_depth = queue_depth
+            self.start_thread_if_needed()
+            if was_empty or queue_depth >= self.flush_entry_count:
+                self.condition.notify()
+
+    def flush(self, timeout: float = None) -> bool:
+        '''Waits until every entry queued so far has been written to disk. Returns False if the timeout expired first.'''
+        with self.condition:
+            if self.thread is None:
+                return len(self.queue) == 0
+            self.requested_flush_number += 1
+            flush_number = self.requested_flush_number
+            self.condition.notify()
+            return self.condition.wait_for(lambda: self.completed_flush_number >= flush_number, timeout)
+
+    def close(self, timeout: float = None):
+        '''Writes out the remaining queued entries, stops the background thread, and closes the file'''
+        with self.condition:
+            thread = self.thread
+            self.closing = True
+            self.condition.notify()
+        if thread is not None:
+            thread.join(timeout)
+        with self.condition:
+            self.thread = None
+            self.closing = False
+
+    def run_file_task(self, task):
+        '''Runs the task on the background thread with the record file closed before writing any more entries,
+            so the task can change record files without racing the writer'''
+        with self.condition:
+            self.file_tasks.append(task)
+            self.start_thread_if_needed()
+            self.condition.notify()
+
+    def get_statistics(self) -> RecordFileWriterStatistics:
+        with self.condition:
+            return RecordFileWriterStatistics(len(self.queue), self.maximum_queue_depth, self.written_entry_count,
+                self.dropped_entry_count, self.flush_count, self.error_count, self.rotation_count)
+
+    def start_thread_if_needed(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='BAR record file writer', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if len(self.queue) == 0 and not self.is_flush_needed():
+                    self.condition.wait(self.compute_idle_timeout())
+                self.condition.wait_for(self.is_flush_needed, self.flush_interval_seconds)
+                entries = list(self.queue)
+                self.queue.clear()
+                path = self.path
+                record_format = self.record_format
+                flush_number = self.requested_flush_number
+                closing = self.closing
+                file_tasks = self.file_tasks
+                self.file_tasks = []
+            if file_tasks:
+                self.run_file_tasks(file_tasks)
+            self.write_entries_to_file(entries, path, record_format)
+            if closing or self.is_idle():
+                self.close_file()
+            with self.condition:
+                self.completed_flush_number = flush_number
+                self.condition.notify_all()
+                if closing and len(self.queue) == 0:
+                    return
+
+    def is_flush_needed(self):
+        return len(self.queue) >= self.flush_entry_count or self.closing or self.requested_flush_number > self.completed_flush_number or len(self.file_tasks) > 0
+
+    def run_file_tasks(self, file_tasks):
+        self.close_file()
+        for task in file_tasks:
+            # Any failure gets counted instead of ending the thread, which would leave the queue filling up and flushes waiting forever
+            try:
+                task()
+            except Exception as exception:
+                with self.condition:
+                    self.error_count += 1
+                print('Basic Action Recorder: a record file task failed', exception)
+
+    def compute_idle_timeout(self):
+        if self.file is None:
+            return None
+        return self.idle_close_seconds
+
+    def is_idle(self):
+        return self.file is not None and time.monotonic() - self.last_write_time >= self.idle_close_seconds
+
+    def write_entries_to_file(self, entries, path: str, record_format):
+        if len(entries) == 0:
+            return
+        if path is None:
+            with self.condition:
+                self.dropped_entry_count += len(entries)
+            return
+        try:
+            file = self.compute_file_for_path(path, record_format)
+            invalid_entry_count = record_format.write_entries(file, entries)
+            file.flush()
+            self.last_write_time = time.monotonic()
+            self.rotate_file_if_needed(path, record_format)
+            with self.condition:
+                self.written_entry_count += len(entries) - invalid_entry_count
+                self.dropped_entry_count += invalid_entry_count
+                self.error_count += invalid_entry_count
+                self.flush_count += 1
+                flush_listener = self.flush_listener
+        except Exception as exception:
+            self.close_file()
+            with self.condition:
+                self.dropped_entry_count += len(entries)
+                self.error_count += 1
+            print('Basic Action Recorder: failed to write to the record file', path, exception)
+            return
+        if flush_listener is not None:
+            try:
+                flush_listener(path)
+            except Exception as exception:
+                with self.condition:
+                    self.error_count += 1
+                print('Basic Action Recorder: the record file flush listener failed', exception)
+
+    def compute_file_for_path(self, path: str, record_format):
+        if self.file is not None and (self.file_path != path or self.file_record_format is not record_format):
+            self.close_file()
+        if self.file is None:
+            is_new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            self.file = record_format.open_file(path)
+            self.file_path = path
+            self.file_record_format = record_format
+            self.file_start_time = self.compute_file_start_time(path, is_new_file)
+        return self.file
+
+    def compute_file_start_time(self, path: str, is_new_file: bool) -> float:
+        '''The start time is remembered for every record file, so closing the file while idle and opening it again does not restart its age'''
+        start_time = self.get_record_start_time(path)
+        if is_new_file or start_time is None:
+            start_time = time.time() if is_new_file else compute_record_start_time(path)
+            self.set_record_start_time(path, start_time)
+        return start_time
+
+    def rotate_file_if_needed(self, path: str, record_format):
+        rotation_policy = self.rotation_policy
+        if rotation_policy.is_enabled() and rotation_policy.should_rotate(self.file.tell(), self.file_start_time):
+            self.close_file()
+            try:
+                segment_path = seal_record_file(path)
+            except OSError as exception:
+                print('Basic Action Recorder: failed to seal the record file', path, exception)
+                return
+            compress_segment_in_background(segment_path, rotation_policy.compression)
+            self.compute_file_for_path(path, record_format)
+            with self.condition:
+                self.rotation_count += 1
+
+    def close_file(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except Exception:
+                pass
+            self.file = None
+            self.file_path = None
+            self.file_record_format = None
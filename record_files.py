@@ -0,0 +1,293 @@
+import gzip
+import locale
+import os
+import time
+from .action_records import RecordParser, TEXT_RECORD_FILE_EXTENSION, iter_text_record_entries_from_file, is_line_command_start, is_line_recording_start, \
+    is_line_time_deference
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+record_entry_readers = {TEXT_RECORD_FILE_EXTENSION: iter_text_record_entries_from_file}
+
+def register_record_entry_reader(file_extension: str, reader):
+    '''Makes records with the file extension readable with the reader, which yields the record entries from a file opened in binary mode'''
+    record_entry_readers[file_extension] = reader
+
+RECORD_SEGMENT_DIRECTORY_NAME = 'segments'
+GZIP_FILE_EXTENSION = '.gz'
+ZSTANDARD_FILE_EXTENSION = '.zst'
+RECORD_SEGMENT_NUMBER_DIGITS = 6
+
+def open_zstandard_file(path: str):
+    if zstandard is None:
+        raise ImportError(f'The zstandard package is needed to read {path}')
+    return zstandard.open(path, 'rb')
+
+record_file_openers = {GZIP_FILE_EXTENSION: gzip.open, ZSTANDARD_FILE_EXTENSION: open_zstandard_file}
+
+def open_record_file(path: str):
+    '''Opens a record file or segment in binary mode, decompressing it on the fly if needed'''
+    compression_extension = os.path.splitext(path)[1]
+    if compression_extension in record_file_openers:
+        return record_file_openers[compression_extension](path)
+    return open(path, 'rb')
+
+def open_record_segment(path: str):
+    '''Opens a segment, falling back to its compressed version if it got compressed since its path was obtained'''
+    try:
+        return open_record_file(path)
+    except FileNotFoundError:
+        for compression_extension in record_file_openers:
+            if os.path.exists(path + compression_extension):
+                return open_record_file(path + compression_extension)
+        raise
+
+def compute_record_format_extension(path: str) -> str:
+    path_without_compression_extension, extension = os.path.splitext(path)
+    if extension in record_file_openers:
+        extension = os.path.splitext(path_without_compression_extension)[1]
+    return extension
+
+def is_text_record_path(path: str) -> bool:
+    return compute_record_format_extension(path) == TEXT_RECORD_FILE_EXTENSION
+
+def iter_record_file_entries(path: str):
+    with open_record_file(path) as file:
+        yield from compute_record_entry_reader(path)(file)
+
+def iter_record_segment_entries(path: str):
+    with open_record_segment(path) as file:
+        yield from compute_record_entry_reader(path)(file)
+
+def compute_record_entry_reader(path: str):
+    extension = compute_record_format_extension(path)
+    if extension not in record_entry_readers:
+        raise ValueError(f'No reader is registered for {path}. Binary records need binary_records to be imported.')
+    return record_entry_readers[extension]
+
+def compute_record_segment_directory(record_path: str) -> str:
+    directory, file_name = os.path.split(record_path)
+    logical_name = os.path.splitext(file_name)[0] if os.path.splitext(file_name)[1] in record_entry_readers else file_name
+    return os.path.join(directory, RECORD_SEGMENT_DIRECTORY_NAME, logical_name)
+
+def compute_record_segment_number(segment_file_name: str):
+    number_text = segment_file_name.split('.', 1)[0]
+    if number_text.isdigit() and not segment_file_name.endswith('.tmp'):
+        return int(number_text)
+    return None
+
+def compute_record_segment_paths(record_path: str):
+    '''Obtains the paths to the sealed segments of a record in order. An uncompressed segment is preferred while its compression is in progress.
+        Records with the same name in different formats share a segment directory, so only the segments in the format of the record are included.'''
+    segment_directory = compute_record_segment_directory(record_path)
+    if not os.path.isdir(segment_directory):
+        return []
+    format_extension = compute_record_format_extension(record_path)
+    segment_names = {}
+    for name in os.listdir(segment_directory):
+        number = compute_record_segment_number(name)
+        if number is None or (format_extension in record_entry_readers and compute_record_format_extension(name) != format_extension):
+            continue
+        if number not in segment_names or os.path.splitext(name)[1] in record_entry_readers:
+            segment_names[number] = name
+    return [os.path.join(segment_directory, segment_names[number]) for number in sorted(segment_names)]
+
+def compute_record_segment_format_extensions(segment_directory: str):
+    '''Obtains the file extensions of the record formats that have segments in the segment directory'''
+    if not os.path.isdir(segment_directory):
+        return set()
+    return {compute_record_format_extension(name) for name in os.listdir(segment_directory)
+        if compute_record_segment_number(name) is not None and compute_record_format_extension(name) in record_entry_readers}
+
+def compute_active_record_path(path: str) -> str:
+    '''Resolves the name of a record without a file extension to the path of its active file'''
+    if os.path.isfile(path) or os.path.splitext(path)[1] in record_entry_readers:
+        return path
+    for extension in record_entry_readers:
+        if os.path.isfile(path + extension):
+            return path + extension
+    return path + TEXT_RECORD_FILE_EXTENSION
+
+RECORD_FILE_NAME_PREFIX = 'record'
+
+def is_record_file_name(name: str) -> bool:
+    return name.startswith(RECORD_FILE_NAME_PREFIX) and os.path.splitext(name)[1] in record_entry_readers
+
+RECORD_STREAM_CHUNK_SIZE = 1 << 20
+DEFAULT_FOLLOW_POLL_INTERVAL_SECONDS = 0.5
+
+class RecordStream:
+    '''Parses a record incrementally starting from a byte offset in its active file. 
+        The resume offset is the offset to start from later to continue right after the records yielded so far.
+        When starting from the beginning, the sealed segments of the record get read first.'''
+    def __init__(self, path: str, start_offset: int = 0, follow: bool = False, poll_interval_seconds: float = DEFAULT_FOLLOW_POLL_INTERVAL_SECONDS):
+        self.path = compute_active_record_path(path)
+        self.start_offset = start_offset
+        self.follow = follow
+        self.poll_interval_seconds = poll_interval_seconds
+        self.offset = start_offset
+        self.resume_offset = start_offset
+        self.stopped = False
+        self.encoding = locale.getpreferredencoding(False)
+        self.segment_paths = compute_record_segment_paths(self.path)
+        self.file_identity = None
+        if not is_text_record_path(self.path) and (follow or start_offset != 0):
+            raise ValueError('Only text records can be followed or read from an offset')
+
+    def get_start_offset(self) -> int:
+        return self.start_offset
+
+    def get_resume_offset(self) -> int:
+        return self.resume_offset
+
+    def stop(self):
+        '''Makes a following stream stop waiting for new lines'''
+        self.stopped = True
+
+    def __iter__(self):
+        return self.iterate_records()
+
+    def iterate_records(self):
+        parser = RecordParser()
+        if self.start_offset == 0:
+            yield from self.iterate_segment_records(parser)
+        if not is_text_record_path(self.path):
+            yield from self.iterate_entry_records(parser, self.path)
+            return
+        command_start_offset = self.offset
+        previous_line_was_time_difference = False
+        while not self.stopped:
+            file_replaced = self.follow and self.was_file_replaced()
+            if file_replaced:
+                lines, end_of_file_reached = self.read_lines_sealed_since_start(), False
+            else:
+                lines, end_of_file_reached = self.read_available_lines()
+            for line_start_offset, line_end_offset, line in lines:
+                if is_line_command_start(line) and not previous_line_was_time_difference or is_line_time_deference(line):
+                    command_start_offset = line_start_offset
+                parser.process_line(line)
+                self.offset = line_end_offset
+                if is_line_recording_start(line):
+                    command_start_offset = line_end_offset
+                previous_line_was_time_difference = is_line_time_deference(line)
+                records = parser.take_records()
+                if records:
+                    self.resume_offset = command_start_offset
+                    yield from records
+            if file_replaced:
+                self.offset = 0
+                self.resume_offset = 0
+                command_start_offset = 0
+                self.file_identity = None
+            elif end_of_file_reached:
+                if not self.follow:
+                    parser.finish()
+                    self.resume_offset = self.offset
+                    yield from parser.take_records()
+                    return
+                time.sleep(self.poll_interval_seconds)
+
+    def iterate_segment_records(self, parser):
+        for segment_path in self.segment_paths:
+            for entry in iter_record_segment_entries(segment_path):
+                parser.process_entry(entry)
+                yield from parser.take_records()
+
+    def iterate_entry_records(self, parser, path: str):
+        if os.path.exists(path):
+            for entry in iter_record_file_entries(path):
+                parser.process_entry(entry)
+                yield from parser.take_records()
+        parser.finish()
+        yield from parser.take_records()
+
+    def was_file_replaced(self) -> bool:
+        if self.were_segments_sealed():
+            return True
+        try:
+            return self.file_identity is not None and compute_file_identity(self.path) != self.file_identity or os.path.getsize(self.path) < self.offset
+        except OSError:
+            return False
+
+    def were_segments_sealed(self) -> bool:
+        return len(compute_record_segment_paths(self.path)) > len(self.segment_paths)
+
+    def read_lines_sealed_since_start(self):
+        '''Reads the rest of the previously active file and any other file that got sealed into a segment since the last check'''
+        new_segment_paths = compute_record_segment_paths(self.path)[len(self.segment_paths):]
+        self.segment_paths = self.segment_paths + new_segment_paths
+        lines = []
+        offset = self.offset
+        for segment_path in new_segment_paths:
+            with open_record_segment(segment_path) as file:
+                file.seek(offset)
+                lines.extend(compute_lines_with_offsets(file.read(), offset, self.encoding))
+            offset = 0
+        return lines
+
+    def read_available_lines(self):
+        return self.read_lines_from_offset(self.offset, final = not self.follow)
+
+    def read_lines_from_offset(self, offset: int, final: bool):
+        size = RECORD_STREAM_CHUNK_SIZE
+        data = self.read_bytes(offset, size)
+        end_of_file_reached = len(data) < size
+        last_newline_index = data.rfind(b'\n')
+        while last_newline_index == -1 and not end_of_file_reached:
+            size *= 2
+            data = self.read_bytes(offset, size)
+            end_of_file_reached = len(data) < size
+            last_newline_index = data.rfind(b'\n')
+        if not (end_of_file_reached and final):
+            data = data[:last_newline_index + 1]
+        return compute_lines_with_offsets(data, offset, self.encoding), end_of_file_reached
+
+    def read_bytes(self, offset: int, size: int) -> bytes:
+        try:
+            with open(self.path, 'rb') as file:
+                file_identity = compute_open_file_identity(file)
+                if self.file_identity is None:
+                    if self.follow and self.were_segments_sealed():
+                        return b''
+                    self.file_identity = file_identity
+                elif file_identity != self.file_identity:
+                    return b''
+                file.seek(offset)
+                return file.read(size)
+        except FileNotFoundError:
+            if self.follow or self.segment_paths:
+                return b''
+            raise
+
+def compute_lines_with_offsets(data: bytes, offset: int, encoding: str):
+    lines = []
+    line_start_offset = offset
+    for raw_line in data.splitlines(keepends = True):
+        line_end_offset = line_start_offset + len(raw_line)
+        lines.append((line_start_offset, line_end_offset, raw_line.decode(encoding).strip()))
+        line_start_offset = line_end_offset
+    return lines
+
+def compute_file_identity(path: str):
+    status = os.stat(path)
+    return (status.st_dev, status.st_ino)
+
+def compute_open_file_identity(file):
+    status = os.fstat(file.fileno())
+    return (status.st_dev, status.st_ino)
+
+def read_file_record(path: str):
+    '''Obtains a list of the basic actions performed by the commands in the specified record. 
+        The path can be a record file or the name of a record without a file extension. The sealed segments of the record get read first.'''
+    record_path = compute_active_record_path(path)
+    if is_text_record_path(record_path) and not compute_record_segment_paths(record_path):
+        parser = RecordParser(record_path)
+        return parser.get_record()
+    return list(RecordStream(record_path))
+
+def iter_file_record(path: str, start_offset: int = 0, follow: bool = False, poll_interval_seconds: float = DEFAULT_FOLLOW_POLL_INTERVAL_SECONDS) -> RecordStream:
+    '''Obtains an iterable that yields the commands and recording starts in the specified record as they get parsed starting at the specified byte offset.
+        With follow set, the stream keeps waiting for new lines at the end of the file until it gets stopped.'''
+    return RecordStream(path, start_offset, follow, poll_interval_seconds)
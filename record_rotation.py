@@ -0,0 +1,104 @@
+import gzip
+import os
+import shutil
+import threading
+import time
+from .record_files import compute_record_segment_directory, compute_record_segment_paths, compute_record_segment_number, compute_record_segment_format_extensions, \
+    GZIP_FILE_EXTENSION, ZSTANDARD_FILE_EXTENSION, RECORD_SEGMENT_NUMBER_DIGITS, zstandard
+
+NO_COMPRESSION = 'none'
+GZIP_COMPRESSION = 'gzip'
+ZSTANDARD_COMPRESSION = 'zstd'
+COMPRESSION_FILE_EXTENSIONS = {GZIP_COMPRESSION: GZIP_FILE_EXTENSION, ZSTANDARD_COMPRESSION: ZSTANDARD_FILE_EXTENSION}
+TEMPORARY_FILE_EXTENSION = '.tmp'
+COPY_BUFFER_SIZE = 1 << 20
+
+class RecordRotationPolicy:
+    def __init__(self, maximum_size_bytes: int = 0, maximum_age_seconds: float = 0, compression: str = GZIP_COMPRESSION):
+        self.maximum_size_bytes = maximum_size_bytes
+        self.maximum_age_seconds = maximum_age_seconds
+        self.compression = compression
+
+    def is_enabled(self) -> bool:
+        return self.maximum_size_bytes > 0 or self.maximum_age_seconds > 0
+
+    def should_rotate(self, size: int, start_time: float) -> bool:
+        if size == 0:
+            return False
+        if self.maximum_size_bytes > 0 and size >= self.maximum_size_bytes:
+            return True
+        return self.maximum_age_seconds > 0 and time.time() - start_time >= self.maximum_age_seconds
+
+def compute_supported_compression(compression: str) -> str:
+    if compression == ZSTANDARD_COMPRESSION and zstandard is None:
+        print('Basic Action Recorder: the zstandard package is not available, so record segments will be compressed with gzip')
+        return GZIP_COMPRESSION
+    if compression not in COMPRESSION_FILE_EXTENSIONS and compression != NO_COMPRESSION:
+        print('Basic Action Recorder: unknown record segment compression', compression, 'using', GZIP_COMPRESSION)
+        return GZIP_COMPRESSION
+    return compression
+
+def compute_record_start_time(record_path: str) -> float:
+    '''Estimates when the active file of a record started as when its last segment got sealed or when the file got created.
+        Only used when the start time was not saved in the record state, because linux does not report when a file got created.'''
+    segment_paths = compute_record_segment_paths(record_path)
+    if segment_paths:
+        return os.path.getmtime(segment_paths[-1])
+    status = os.stat(record_path)
+    if hasattr(status, 'st_birthtime'):
+        return status.st_birthtime
+    if os.name == 'nt':
+        return status.st_ctime
+    return time.time()
+
+def compute_next_segment_number(segment_directory: str) -> int:
+    numbers = [compute_record_segment_number(name) for name in os.listdir(segment_directory)]
+    return max([number for number in numbers if number is not None], default = 0) + 1
+
+def seal_record_file(record_path: str) -> str:
+    '''Moves the active file of a record into its segment directory as the next segment and returns the path to the segment'''
+    segment_directory = compute_record_segment_directory(record_path)
+    os.makedirs(segment_directory, exist_ok = True)
+    number = compute_next_segment_number(segment_directory)
+    extension = os.path.splitext(record_path)[1]
+    segment_path = os.path.join(segment_directory, str(number).zfill(RECORD_SEGMENT_NUMBER_DIGITS) + extension)
+    os.replace(record_path, segment_path)
+    return segment_path
+
+def compress_segment(segment_path: str, compression: str) -> str:
+    '''Compresses a sealed segment and removes the uncompressed version once the compressed version is complete'''
+    if compression == NO_COMPRESSION:
+        return segment_path
+    compressed_path = segment_path + COMPRESSION_FILE_EXTENSIONS[compression]
+    temporary_path = compressed_path + TEMPORARY_FILE_EXTENSION
+    with open(segment_path, 'rb') as source, open_compressed_output(temporary_path, compression) as destination:
+        shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+    os.replace(temporary_path, compressed_path)
+    os.remove(segment_path)
+    return compressed_path
+
+def open_compressed_output(path: str, compression: str):
+    if compression == ZSTANDARD_COMPRESSION:
+        return zstandard.open(path, 'wb')
+    return gzip.open(path, 'wb')
+
+def compress_segment_in_background(segment_path: str, compression: str):
+    thread = threading.Thread(target=compress_segment_reporting_errors, args=(segment_path, compression), name='BAR record segment compression', daemon=True)
+    thread.start()
+    return thread
+
+def compress_segment_reporting_errors(segment_path: str, compression: str):
+    try:
+        compress_segment(segment_path, compression)
+    except OSError as exception:
+        print('Basic Action Recorder: failed to compress the record segment', segment_path, exception)
+
+def compress_uncompressed_segments(record_path: str, compression: str):
+    '''Compresses segments left uncompressed, for instance because talon exited during compression'''
+    if compression == NO_COMPRESSION:
+        return
+    record_path_without_extension = os.path.splitext(record_path)[0]
+    for format_extension in compute_record_segment_format_extensions(compute_record_segment_directory(record_path)):
+        for segment_path in compute_record_segment_paths(record_path_without_extension + format_extension):
+            if os.path.splitext(segment_path)[1] not in COMPRESSION_FILE_EXTENSIONS.values():
+                compress_segment_reporting_errors(segment_path, compression)
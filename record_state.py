@@ -0,0 +1,179 @@
+import json
+import os
+from .record_files import is_record_file_name
+from .binary_records import BINARY_RECORD_MAGIC, BINARY_RECORD_FILE_EXTENSION, BLOCK_MARKER, BinaryRecordFormatError, read_block_payload
+
+RECORD_STATE_FILE_NAME = 'record state.json'
+TEMPORARY_FILE_EXTENSION = '.tmp'
+TAIL_READ_SIZE = 64*1024
+
+class ActiveRecordState:
+    '''What the basic action recorder knew about the active record file the last time it saved its state.
+        offset is the end of the last entry known to be complete, which is the size of the file after a clean shutdown.
+        start_time is when the file started, which rotation by age needs, or None if it was not known.'''
+    def __init__(self, name: str, size: int, offset: int, modification_time_ns: int, start_time: float = None):
+        self.name = name
+        self.size = size
+        self.offset = offset
+        self.modification_time_ns = modification_time_ns
+        self.start_time = start_time
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_offset(self) -> int:
+        return self.offset
+
+    def get_start_time(self):
+        return self.start_time
+
+    def matches_file(self, directory: str) -> bool:
+        '''Determines if the record file is unchanged since the state was saved, meaning nothing was written to it without updating the state'''
+        try:
+            status = os.stat(os.path.join(directory, self.name))
+        except OSError:
+            return False
+        return status.st_size == self.size and status.st_mtime_ns == self.modification_time_ns
+
+    def to_json(self) -> str:
+        return json.dumps({'name': self.name, 'size': self.size, 'offset': self.offset, 'modification_time_ns': self.modification_time_ns,
+            'start_time': self.start_time})
+
+    @staticmethod
+    def from_json(text: str):
+        representation = json.loads(text)
+        return ActiveRecordState(representation['name'], representation['size'], representation['offset'], representation['modification_time_ns'],
+            representation.get('start_time'))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'ActiveRecordState({self.name}, size: {self.size}, offset: {self.offset})'
+
+def compute_record_state_path(directory: str) -> str:
+    return os.path.join(directory, RECORD_STATE_FILE_NAME)
+
+def read_active_record_state(directory: str):
+    '''Returns the saved state or None if there is no usable state file'''
+    try:
+        with open(compute_record_state_path(directory)) as file:
+            return ActiveRecordState.from_json(file.read())
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def compute_active_record_state(directory: str, name: str, start_time: float = None) -> ActiveRecordState:
+    '''Returns the state of the record file as it is now, treating everything in it as complete. A missing file has a size of 0.'''
+    try:
+        status = os.stat(os.path.join(directory, name))
+    except OSError:
+        return ActiveRecordState(name, 0, 0, 0, start_time)
+    return ActiveRecordState(name, status.st_size, status.st_size, status.st_mtime_ns, start_time)
+
+def write_active_record_state(directory: str, state: ActiveRecordState):
+    '''Replaces the state file in a single step, so a crash while saving leaves the previous state'''
+    path = compute_record_state_path(directory)
+    temporary_path = path + TEMPORARY_FILE_EXTENSION
+    try:
+        with open(temporary_path, 'w') as file:
+            file.write(state.to_json())
+        os.replace(temporary_path, path)
+    except OSError as exception:
+        print('Basic Action Recorder: failed to save the active record state', exception)
+
+def compute_most_recently_updated_record_file_name(directory: str) -> str:
+    '''Finds the most recently modified record file in a single pass over the directory, reusing the information from the directory listing'''
+    most_recently_updated_filename = ''
+    most_recent_update_time = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if is_record_file_name(entry.name) and entry.is_file():
+                update_time = entry.stat().st_mtime
+                if update_time > most_recent_update_time:
+                    most_recently_updated_filename = entry.name
+                    most_recent_update_time = update_time
+    return most_recently_updated_filename
+
+def compute_active_record_file_name(directory: str, state: ActiveRecordState) -> str:
+    '''Uses the saved state when the record file it names is unchanged and otherwise falls back to scanning the directory'''
+    if state is not None and state.matches_file(directory):
+        return state.get_name()
+    return compute_most_recently_updated_record_file_name(directory)
+
+def repair_record_tail(path: str, valid_offset: int = 0) -> int:
+    '''Removes an incomplete entry at the end of a record file left by a crash, so that later entries do not get appended to it.
+        Only the part of the file after valid_offset gets checked. Returns the number of bytes removed.'''
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if size <= valid_offset:
+        return 0
+    if os.path.splitext(path)[1] == BINARY_RECORD_FILE_EXTENSION:
+        complete_size = compute_complete_binary_record_size(path, valid_offset)
+    else:
+        complete_size = compute_complete_text_record_size(path, valid_offset, size)
+    if complete_size < size:
+        with open(path, 'r+b') as file:
+            file.truncate(complete_size)
+    return size - complete_size
+
+def compute_complete_text_record_size(path: str, valid_offset: int, size: int) -> int:
+    '''Returns the size of the record up to and including its last new line'''
+    with open(path, 'rb') as file:
+        end = size
+        while end > valid_offset:
+            start = max(end - TAIL_READ_SIZE, valid_offset)
+            file.seek(start)
+            data = file.read(end - start)
+            new_line_index = data.rfind(b'\n')
+            if new_line_index >= 0:
+                return start + new_line_index + 1
+            end = start
+    return valid_offset
+
+def compute_complete_binary_record_size(path: str, valid_offset: int) -> int:
+    '''Returns the size of the record up to the end of its last complete block.
+        Only an incomplete or corrupted block at the end of the file gets left out. Corrupted data followed by complete blocks gets reported
+        and kept, since removing it would also remove the blocks after it.'''
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        if valid_offset < len(BINARY_RECORD_MAGIC):
+            if file.read(len(BINARY_RECORD_MAGIC)) != BINARY_RECORD_MAGIC:
+                return 0
+            valid_offset = len(BINARY_RECORD_MAGIC)
+        while valid_offset < size:
+            if is_complete_block_at_offset(file, valid_offset):
+                valid_offset = file.tell()
+                continue
+            next_block_offset = find_next_complete_block_offset(file, valid_offset + 1)
+            if next_block_offset is None:
+                break
+            print('Basic Action Recorder: skipped corrupted data from position', valid_offset, 'to', next_block_offset, 'of', path)
+            valid_offset = next_block_offset
+    return valid_offset
+
+def is_complete_block_at_offset(file, offset: int) -> bool:
+    '''Determines if a complete block with a matching checksum starts at the offset, leaving the file at the end of the block if so'''
+    file.seek(offset)
+    try:
+        return read_block_payload(file) is not None
+    except BinaryRecordFormatError:
+        return False
+
+def find_next_complete_block_offset(file, offset: int):
+    '''Returns the offset of the first complete block at or after the offset or None if there is none'''
+    marker = bytes((BLOCK_MARKER,))
+    while True:
+        file.seek(offset)
+        data = file.read(TAIL_READ_SIZE)
+        if not data:
+            return None
+        marker_index = data.find(marker)
+        if marker_index < 0:
+            offset += len(data)
+            continue
+        candidate_offset = offset + marker_index
+        if is_complete_block_at_offset(file, candidate_offset):
+            return candidate_offset
+        offset = candidate_offset + 1
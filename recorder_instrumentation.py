@@ -0,0 +1,133 @@
+import math
+import time
+
+DEFAULT_SIGNIFICANT_BITS = 5
+INSTRUMENTATION_PERCENTILES = (50, 90, 99, 99.9)
+ACTION_STAGE = 'action'
+RECORD_STAGE = 'record'
+SINK_STAGE_PREFIX = 'sink: '
+NANOSECONDS_PER_MICROSECOND = 1000
+
+class LatencyHistogram:
+    '''An HDR style histogram of nanosecond durations with a fixed relative precision.
+        Values below 2**significant_bits get their own buckets, and every larger power of two range gets split into 2**(significant_bits - 1) buckets,
+        so recording a value only computes a bucket index and increments a count.'''
+    def __init__(self, significant_bits: int = DEFAULT_SIGNIFICANT_BITS):
+        self.significant_bits = significant_bits
+        self.exact_value_limit = 1 << significant_bits
+        self.counts = [0]*self.exact_value_limit
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = 0
+
+    def record(self, value: int):
+        if value < self.exact_value_limit:
+            index = max(value, 0)
+        else:
+            shift = value.bit_length() - self.significant_bits
+            index = (shift << (self.significant_bits - 1)) + (value >> shift)
+        if index >= len(self.counts):
+            self.counts.extend([0]*(index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+
+    def compute_bucket_highest_value(self, index: int) -> int:
+        if index < self.exact_value_limit:
+            return index
+        shift = (index >> (self.significant_bits - 1)) - 1
+        mantissa = index - (shift << (self.significant_bits - 1))
+        return ((mantissa + 1) << shift) - 1
+
+    def compute_percentile(self, percentile: float) -> int:
+        '''Returns the highest value that could be in the bucket containing the percentile, which is within the precision of the histogram'''
+        if self.count == 0:
+            return 0
+        target_count = max(math.ceil(percentile/100*self.count), 1)
+        cumulative_count = 0
+        for index, count in enumerate(self.counts):
+            cumulative_count += count
+            if cumulative_count >= target_count:
+                return min(self.compute_bucket_highest_value(index), self.maximum)
+        return self.maximum
+
+    def compute_mean(self) -> float:
+        if self.count == 0:
+            return 0
+        return self.total/self.count
+
+    def get_count(self) -> int:
+        return self.count
+
+    def get_maximum(self) -> int:
+        return self.maximum
+
+class LatencySummary:
+    def __init__(self, stage: str, name: str, histogram: LatencyHistogram):
+        self.stage = stage
+        self.name = name
+        self.count = histogram.get_count()
+        self.mean_microseconds = histogram.compute_mean()/NANOSECONDS_PER_MICROSECOND
+        self.percentile_microseconds = {percentile: histogram.compute_percentile(percentile)/NANOSECONDS_PER_MICROSECOND for percentile in INSTRUMENTATION_PERCENTILES}
+        self.maximum_microseconds = histogram.get_maximum()/NANOSECONDS_PER_MICROSECOND
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        percentiles = ', '.join(f'p{percentile}: {microseconds:.1f}' for percentile, microseconds in self.percentile_microseconds.items())
+        return f'{self.stage} {self.name}: count: {self.count}, mean: {self.mean_microseconds:.1f}, {percentiles}, max: {self.maximum_microseconds:.1f} (microseconds)'
+
+class RecorderInstrumentation:
+    '''Keeps a latency histogram for every stage of the recorder and name of an action, command, or noise.
+        Nothing gets timed while disabled because the recorder only times its stages while enabled.'''
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def is_enabled(self) -> bool:
+        return self.enabled
+
+    def record(self, stage: str, name: str, nanoseconds: int):
+        key = (stage, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self.histograms[key] = histogram
+        histogram.record(nanoseconds)
+
+    def compute_total_nanoseconds(self, stage: str, name: str) -> int:
+        histogram = self.histograms.get((stage, name))
+        if histogram is None:
+            return 0
+        return histogram.total
+
+    def reset(self):
+        self.histograms = {}
+
+    def compute_summaries(self):
+        '''Returns a summary of every histogram sorted by stage and then by how much time was spent on the name'''
+        histograms = list(self.histograms.items())
+        histograms.sort(key = lambda item: (item[0][0], -item[1].total))
+        return [LatencySummary(stage, name, histogram) for (stage, name), histogram in histograms]
+
+    def compute_timed_function(self, stage: str, function, compute_name):
+        '''Returns a version of the function that records how long each call takes under the name compute_name computes from the arguments'''
+        def timed_function(*arguments):
+            start_time = time.perf_counter_ns()
+            try:
+                return function(*arguments)
+            finally:
+                self.record(stage, compute_name(*arguments), time.perf_counter_ns() - start_time)
+        return timed_function
@@ -0,0 +1,129 @@
+import os
+import pickle
+import tempfile
+from .action_records import create_action_record_entry, RECORD_ENTRY_ACTION
+from .binary_records import compute_block, read_block_payload, compute_entries_from_payload
+
+DEFAULT_MAXIMUM_ACTIONS_IN_MEMORY = 100000
+DEFAULT_SPILL_CHUNK_SIZE = 4096
+SPILL_FILE_PREFIX = 'recording spill '
+BINARY_BLOCK_CHUNK = 0
+# Chunks with arguments that binary records cannot store, such as arbitrary objects from user actions, get pickled instead
+PICKLED_CHUNK = 1
+
+class SpilledChunk:
+    __slots__ = ('offset', 'size', 'kind', 'action_count')
+
+    def __init__(self, offset: int, size: int, kind: int, action_count: int):
+        self.offset = offset
+        self.size = size
+        self.kind = kind
+        self.action_count = action_count
+
+class RecordingBufferStatistics:
+    def __init__(self, in_memory_action_count: int, spilled_action_count: int, spilled_chunk_count: int, spilled_bytes: int):
+        self.in_memory_action_count = in_memory_action_count
+        self.spilled_action_count = spilled_action_count
+        self.spilled_chunk_count = spilled_chunk_count
+        self.spilled_bytes = spilled_bytes
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'RecordingBufferStatistics(in memory: {self.in_memory_action_count}, spilled: {self.spilled_action_count}, ' + \
+            f'spilled chunks: {self.spilled_chunk_count}, spilled bytes: {self.spilled_bytes})'
+
+class SpillingActionBuffer:
+    '''Holds recorded actions in order while keeping at most maximum_actions_in_memory of them in memory.
+        Once there are more, the oldest spill_chunk_size actions get written as a binary record block to a temporary file
+        in the directory given by compute_spill_directory, which gets deleted when the buffer is cleared or closed.
+        Iterating reads the spilled chunks back one at a time, so memory stays flat no matter how many actions get recorded.
+        A maximum of 0 keeps every action in memory.'''
+    def __init__(self, compute_spill_directory = lambda: None, maximum_actions_in_memory: int = DEFAULT_MAXIMUM_ACTIONS_IN_MEMORY,
+            spill_chunk_size: int = DEFAULT_SPILL_CHUNK_SIZE):
+        self.compute_spill_directory = compute_spill_directory
+        self.maximum_actions_in_memory = maximum_actions_in_memory
+        self.spill_chunk_size = spill_chunk_size
+        self.actions = []
+        self.spill_file = None
+        self.spilled_chunks = []
+        self.spilled_action_count = 0
+        self.spilled_bytes = 0
+
+    def set_maximum_actions_in_memory(self, maximum_actions_in_memory: int):
+        self.maximum_actions_in_memory = maximum_actions_in_memory
+        self.spill_if_needed()
+
+    def append(self, action):
+        self.actions.append(action)
+        if self.maximum_actions_in_memory > 0 and len(self.actions) > self.maximum_actions_in_memory:
+            self.spill_if_needed()
+
+    def spill_if_needed(self):
+        while self.maximum_actions_in_memory > 0 and len(self.actions) > self.maximum_actions_in_memory:
+            chunk_size = max(min(self.spill_chunk_size, len(self.actions) - 1), 1)
+            try:
+                self.spill(self.actions[:chunk_size])
+            except OSError as exception:
+                print('Basic Action Recorder: keeping the recording in memory because it could not be spilled to a file', exception)
+                self.maximum_actions_in_memory = 0
+                return
+            del self.actions[:chunk_size]
+
+    def spill(self, chunk):
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile(prefix = SPILL_FILE_PREFIX, dir = self.compute_spill_directory())
+        kind, data = compute_spilled_chunk_data(chunk)
+        self.spill_file.seek(0, os.SEEK_END)
+        offset = self.spill_file.tell()
+        self.spill_file.write(data)
+        self.spilled_chunks.append(SpilledChunk(offset, len(data), kind, len(chunk)))
+        self.spilled_action_count += len(chunk)
+        self.spilled_bytes += len(data)
+
+    def iter_chunks(self):
+        '''Yields the actions in lists of at most the spill chunk size (or everything in memory), oldest first'''
+        for chunk in self.spilled_chunks[:]:
+            yield self.read_spilled_chunk(chunk)
+        if self.actions:
+            yield self.actions[:]
+
+    def read_spilled_chunk(self, chunk: SpilledChunk):
+        self.spill_file.seek(chunk.offset)
+        if chunk.kind == PICKLED_CHUNK:
+            return pickle.loads(self.spill_file.read(chunk.size))
+        payload = read_block_payload(self.spill_file)
+        return [value for kind, value in compute_entries_from_payload(payload) if kind == RECORD_ENTRY_ACTION]
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def __len__(self):
+        return self.spilled_action_count + len(self.actions)
+
+    def has_spilled_actions(self) -> bool:
+        return self.spilled_action_count > 0
+
+    def get_statistics(self) -> RecordingBufferStatistics:
+        return RecordingBufferStatistics(len(self.actions), self.spilled_action_count, len(self.spilled_chunks), self.spilled_bytes)
+
+    def clear(self):
+        self.actions = []
+        self.close()
+
+    def close(self):
+        '''Deletes the spill file. The buffer only keeps the actions that were still in memory.'''
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+        self.spilled_chunks = []
+        self.spilled_action_count = 0
+        self.spilled_bytes = 0
+
+def compute_spilled_chunk_data(chunk):
+    try:
+        return BINARY_BLOCK_CHUNK, compute_block([create_action_record_entry(action) for action in chunk])
+    except (TypeError, ValueError):
+        return PICKLED_CHUNK, pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL)
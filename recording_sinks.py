@@ -0,0 +1,49 @@
+class RecordingSinkPipeline:
+    '''Passes recorded values to the sinks that are currently active.
+        The active sinks get compiled into a tuple whenever a sink is turned on or off, so processing a value does not check any settings or state.'''
+    def __init__(self):
+        self.sinks = {}
+        self.active_sink_names = set()
+        self.active_sinks = ()
+        self.wrap_sink = None
+
+    def register_sink(self, name: str, sink, active: bool = False):
+        '''Adds a sink that gets called with every processed value while active. Sinks run in the order they were registered.'''
+        self.sinks[name] = sink
+        if active:
+            self.active_sink_names.add(name)
+        self.compile()
+
+    def set_sink_active(self, name: str, active: bool):
+        if active == (name in self.active_sink_names):
+            return
+        if active:
+            self.active_sink_names.add(name)
+        else:
+            self.active_sink_names.discard(name)
+        self.compile()
+
+    def set_sink_wrapper(self, wrap_sink):
+        '''Makes the pipeline call wrap_sink(name, sink) instead of the sinks themselves, such as to time them. None removes the wrapper.'''
+        self.wrap_sink = wrap_sink
+        self.compile()
+
+    def is_sink_active(self, name: str) -> bool:
+        return name in self.active_sink_names
+
+    def is_active(self) -> bool:
+        return len(self.active_sinks) > 0
+
+    def get_active_sinks(self):
+        return self.active_sinks
+
+    def process(self, *values):
+        for sink in self.active_sinks:
+            sink(*values)
+
+    def compile(self):
+        active_sinks = [(name, sink) for name, sink in self.sinks.items() if name in self.active_sink_names]
+        if self.wrap_sink is None:
+            self.active_sinks = tuple(sink for _, sink in active_sinks)
+        else:
+            self.active_sinks = tuple(self.wrap_sink(name, sink) for name, sink in active_sinks)
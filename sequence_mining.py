@@ -0,0 +1,239 @@
+from collections import deque
+from .action_records import CommandChain
+from .record_files import iter_file_record
+
+# Windows get hashed with a polynomial rolling hash modulo a Mersenne prime, so hashing every window ending at an action takes constant time per length.
+ROLLING_HASH_MODULUS = (1 << 61) - 1
+ROLLING_HASH_BASE = 1_000_003
+MAXIMUM_SEQUENCE_LENGTH_LIMIT = 63
+SEQUENCE_LENGTH_BITS = 6
+
+DEFAULT_MINIMUM_SEQUENCE_LENGTH = 2
+DEFAULT_MAXIMUM_ACTION_SEQUENCE_LENGTH = 12
+DEFAULT_MAXIMUM_COMMAND_SEQUENCE_LENGTH = 6
+DEFAULT_MINIMUM_OCCURRENCES = 3
+DEFAULT_CANDIDATE_COUNT = 20
+DEFAULT_MAXIMUM_TRACKED_SEQUENCES = 200_000
+# Seconds since the last action above this are treated as the user taking a break rather than speaking the command
+MAXIMUM_COMMAND_SECONDS = 10
+DEFAULT_COMMAND_SECONDS = 1.0
+# How many of the best scoring sequences get compared to each other when removing sequences contained in better ones
+CANDIDATE_POOL_FACTOR = 10
+
+class RepeatedSequence:
+    '''A sequence of actions or commands that was repeated count times without the repetitions overlapping.
+        The estimated seconds saved assumes the sequence gets replaced with a single command that takes as long to say as an average command.'''
+    def __init__(self, items, count: int, estimated_seconds_saved: float):
+        self.items = items
+        self.count = count
+        self.estimated_seconds_saved = estimated_seconds_saved
+
+    def get_count(self) -> int:
+        return self.count
+
+    def get_length(self) -> int:
+        return len(self.items)
+
+    def get_estimated_seconds_saved(self) -> float:
+        return self.estimated_seconds_saved
+
+    def __repr__(self):
+        return self.__str__()
+
+class RepeatedActionSequence(RepeatedSequence):
+    def get_actions(self):
+        return self.items
+
+    def compute_talon_script(self):
+        return [action.compute_talon_script() for action in self.items]
+
+    def __str__(self):
+        return f'RepeatedActionSequence(count: {self.count}, seconds saved: {self.estimated_seconds_saved:.1f}, {list(self.items)})'
+
+class RepeatedCommandSequence(RepeatedSequence):
+    def get_commands(self):
+        return self.items
+
+    def compute_command_chain(self) -> CommandChain:
+        chain = CommandChain(None, [])
+        for command in self.items:
+            chain.append_command(command)
+        return chain
+
+    def compute_talon_script(self):
+        return [action.compute_talon_script() for action in self.compute_command_chain().get_actions()]
+
+    def __str__(self):
+        return f'RepeatedCommandSequence(count: {self.count}, seconds saved: {self.estimated_seconds_saved:.1f}, {[command.get_name() for command in self.items]})'
+
+class SequenceCount:
+    __slots__ = ('items', 'item_hashes', 'count', 'last_ending_position', 'total_seconds')
+
+    def __init__(self, items, item_hashes, ending_position: int, seconds: float):
+        self.items = items
+        self.item_hashes = item_hashes
+        self.count = 2
+        self.last_ending_position = ending_position
+        self.total_seconds = seconds
+
+class SequenceMiner:
+    '''Counts the non overlapping repetitions of every window of minimum_length to maximum_length consecutive items in a single pass.
+        Only maximum_tracked_sequences windows get counted at a time. When there are more, the least frequent half gets forgotten,
+        so memory stays bounded on arbitrarily large records at the cost of undercounting sequences that were forgotten before they became frequent.'''
+    def __init__(self, minimum_length: int, maximum_length: int, maximum_tracked_sequences: int = DEFAULT_MAXIMUM_TRACKED_SEQUENCES):
+        if not 1 <= minimum_length <= maximum_length <= MAXIMUM_SEQUENCE_LENGTH_LIMIT:
+            raise ValueError(f'sequence lengths must satisfy 1 <= minimum length <= maximum length <= {MAXIMUM_SEQUENCE_LENGTH_LIMIT}')
+        self.minimum_length = minimum_length
+        self.maximum_length = maximum_length
+        self.maximum_tracked_sequences = maximum_tracked_sequences
+        self.base_powers = [pow(ROLLING_HASH_BASE, length, ROLLING_HASH_MODULUS) for length in range(maximum_length + 1)]
+        self.counts = {}
+        self.position = 0
+        self.pruned_count = 0
+        self.reset_window()
+
+    def reset_window(self):
+        '''Keeps windows from spanning the point where this gets called, such as the start of a new recording'''
+        self.items = deque(maxlen = self.maximum_length)
+        self.item_hashes = deque(maxlen = self.maximum_length)
+        self.prefix_hashes = deque([0], maxlen = self.maximum_length + 1)
+        self.prefix_seconds = deque([0.0], maxlen = self.maximum_length + 1)
+
+    def process(self, item, item_hash: int, seconds: float):
+        '''Counts every window ending with the item. seconds is how long the item took to perform by voice.'''
+        self.position += 1
+        self.items.append(item)
+        self.item_hashes.append(item_hash)
+        prefix_hash = (self.prefix_hashes[-1]*ROLLING_HASH_BASE + (item_hash % ROLLING_HASH_MODULUS)) % ROLLING_HASH_MODULUS
+        prefix_seconds = self.prefix_seconds[-1] + seconds
+        self.prefix_hashes.append(prefix_hash)
+        self.prefix_seconds.append(prefix_seconds)
+        window_count = len(self.items)
+        for length in range(self.minimum_length, min(window_count, self.maximum_length) + 1):
+            self.count_window(length, prefix_hash, prefix_seconds)
+
+    def count_window(self, length: int, prefix_hash: int, prefix_seconds: float):
+        window_hash = (prefix_hash - self.prefix_hashes[-1 - length]*self.base_powers[length]) % ROLLING_HASH_MODULUS
+        key = (window_hash << SEQUENCE_LENGTH_BITS) | length
+        sequence_count = self.counts.get(key)
+        seconds = prefix_seconds - self.prefix_seconds[-1 - length]
+        if sequence_count is None:
+            # Most windows only occur once, so their items only get kept once they repeat
+            self.counts[key] = (self.position, seconds)
+            if len(self.counts) > self.maximum_tracked_sequences:
+                self.prune()
+        elif type(sequence_count) is tuple:
+            first_ending_position, first_seconds = sequence_count
+            if self.position - length >= first_ending_position:
+                start = len(self.items) - length
+                self.counts[key] = SequenceCount(tuple(self.items)[start:], tuple(self.item_hashes)[start:], self.position, first_seconds + seconds)
+        elif self.position - length >= sequence_count.last_ending_position:
+            sequence_count.count += 1
+            sequence_count.last_ending_position = self.position
+            sequence_count.total_seconds += seconds
+
+    def prune(self):
+        '''Forgets at least half of the tracked sequences, starting with the least frequent'''
+        counts = sorted(compute_sequence_count(sequence_count) for sequence_count in self.counts.values())
+        threshold = counts[len(counts)//2]
+        self.counts = {key: sequence_count for key, sequence_count in self.counts.items() if compute_sequence_count(sequence_count) > threshold}
+        self.pruned_count = max(self.pruned_count, threshold)
+
+    def get_pruned_count(self) -> int:
+        '''Returns the highest count of a sequence that got forgotten, which bounds how much any count could be too low by'''
+        return self.pruned_count
+
+    def compute_candidates(self, minimum_occurrences: int, replacement_seconds: float, candidate_count: int):
+        '''Returns the items, count, and estimated seconds saved of the sequences that save the most time,
+            leaving out sequences contained in a better candidate that occurred at least as often'''
+        candidates = []
+        for sequence_count in self.counts.values():
+            if type(sequence_count) is SequenceCount and sequence_count.count >= minimum_occurrences:
+                seconds_saved = sequence_count.total_seconds - sequence_count.count*replacement_seconds
+                if seconds_saved > 0:
+                    candidates.append((seconds_saved, sequence_count))
+        candidates.sort(key = lambda candidate: candidate[0], reverse = True)
+        selected = []
+        for seconds_saved, sequence_count in candidates[:candidate_count*CANDIDATE_POOL_FACTOR]:
+            if not any(is_sequence_covered_by(sequence_count, other) for _, other in selected):
+                selected.append((seconds_saved, sequence_count))
+                if len(selected) == candidate_count:
+                    break
+        return [(sequence_count.items, sequence_count.count, seconds_saved) for seconds_saved, sequence_count in selected]
+
+def compute_sequence_count(sequence_count) -> int:
+    if type(sequence_count) is tuple:
+        return 1
+    return sequence_count.count
+
+def is_sequence_covered_by(sequence_count: SequenceCount, other: SequenceCount) -> bool:
+    return other.count >= sequence_count.count and is_contiguous_subsequence(sequence_count.item_hashes, other.item_hashes)
+
+def is_contiguous_subsequence(items, other_items) -> bool:
+    length = len(items)
+    return any(other_items[start:start + length] == items for start in range(len(other_items) - length + 1))
+
+class RecordSequenceAnalysis:
+    '''Mines the action and command sequences of records in a single pass.
+        Every command is assumed to take the seconds since the last action recorded for it (up to MAXIMUM_COMMAND_SECONDS) to say,
+        which gets divided evenly among its actions. Commands without time information take the average of the commands with it.'''
+    def __init__(self, minimum_length: int = DEFAULT_MINIMUM_SEQUENCE_LENGTH, maximum_action_sequence_length: int = DEFAULT_MAXIMUM_ACTION_SEQUENCE_LENGTH,
+            maximum_command_sequence_length: int = DEFAULT_MAXIMUM_COMMAND_SEQUENCE_LENGTH, maximum_tracked_sequences: int = DEFAULT_MAXIMUM_TRACKED_SEQUENCES):
+        self.action_miner = SequenceMiner(minimum_length, maximum_action_sequence_length, maximum_tracked_sequences)
+        self.command_miner = SequenceMiner(minimum_length, maximum_command_sequence_length, maximum_tracked_sequences)
+        self.timed_command_count = 0
+        self.timed_command_seconds = 0.0
+
+    def process_records(self, records):
+        for record in records:
+            self.process_record(record)
+
+    def process_record(self, record):
+        if not record.is_command_record():
+            self.action_miner.reset_window()
+            self.command_miner.reset_window()
+            return
+        command_seconds = self.compute_command_seconds(record)
+        actions = record.get_actions()
+        self.command_miner.process(record, hash((record.get_name(), tuple(actions))), command_seconds)
+        if actions:
+            action_seconds = command_seconds/len(actions)
+            for action in actions:
+                self.action_miner.process(action, hash(action), action_seconds)
+
+    def compute_command_seconds(self, command) -> float:
+        if command.is_time_information_available():
+            seconds = min(max(command.get_seconds_since_action(), 0), MAXIMUM_COMMAND_SECONDS)
+            self.timed_command_count += 1
+            self.timed_command_seconds += seconds
+            return seconds
+        return self.compute_average_command_seconds()
+
+    def compute_average_command_seconds(self) -> float:
+        if self.timed_command_count == 0:
+            return DEFAULT_COMMAND_SECONDS
+        return self.timed_command_seconds/self.timed_command_count
+
+    def compute_repeated_action_sequences(self, candidate_count: int = DEFAULT_CANDIDATE_COUNT, minimum_occurrences: int = DEFAULT_MINIMUM_OCCURRENCES):
+        candidates = self.action_miner.compute_candidates(minimum_occurrences, self.compute_average_command_seconds(), candidate_count)
+        return [RepeatedActionSequence(items, count, seconds_saved) for items, count, seconds_saved in candidates]
+
+    def compute_repeated_command_sequences(self, candidate_count: int = DEFAULT_CANDIDATE_COUNT, minimum_occurrences: int = DEFAULT_MINIMUM_OCCURRENCES):
+        candidates = self.command_miner.compute_candidates(minimum_occurrences, self.compute_average_command_seconds(), candidate_count)
+        return [RepeatedCommandSequence(items, count, seconds_saved) for items, count, seconds_saved in candidates]
+
+def analyze_record_sequences(path: str, **keyword_arguments) -> RecordSequenceAnalysis:
+    '''Streams the record at the path through a sequence analysis without reading the whole record into memory'''
+    analysis = RecordSequenceAnalysis(**keyword_arguments)
+    analysis.process_records(iter_file_record(path))
+    return analysis
+
+def compute_macro_candidate_talon_file_text(candidates) -> str:
+    '''Returns talon script with a placeholder command for every candidate, ready to be pasted into a talon file and given better names'''
+    lines = []
+    for index, candidate in enumerate(candidates):
+        lines.append(f'# Repeated {candidate.get_count()} times, saving about {candidate.get_estimated_seconds_saved():.0f} seconds')
+        lines.append(f'macro candidate {index + 1}:')
+        lines.extend('    ' + line_of_code for line_of_code in candidate.compute_talon_script())
+        lines.append('')
+    return '\n'.join(lines)
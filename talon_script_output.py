@@ -0,0 +1,48 @@
+import os
+import re
+
+LINES_OUTPUT_MODE = 'lines'
+BLOCK_OUTPUT_MODE = 'block'
+CLIPBOARD_OUTPUT_MODE = 'clipboard'
+FILE_OUTPUT_MODE = 'file'
+TALON_SCRIPT_OUTPUT_MODES = (LINES_OUTPUT_MODE, BLOCK_OUTPUT_MODE, CLIPBOARD_OUTPUT_MODE, FILE_OUTPUT_MODE)
+RECORDED_COMMANDS_DIRECTORY_NAME = 'Recorded Commands'
+DEFAULT_RECORDED_COMMAND_NAME = 'recorded command'
+TALON_FILE_EXTENSION = '.talon'
+TALON_SCRIPT_INDENTATION = '    '
+
+def compute_talon_script_block(code) -> str:
+    '''Returns the lines of talon script as a single text ending with a new line like typing each line and pressing enter would'''
+    return ''.join(line_of_code + '\n' for line_of_code in code)
+
+def compute_talon_command_rule(command_name: str) -> str:
+    '''Keeps only the words of the command name, so characters with a meaning in talon rules like parentheses, brackets, | and quotes cannot change the rule'''
+    return ' '.join(re.findall(r'[^\W_]+', command_name.replace("'", '')))
+
+def compute_talon_command_file_name(command_name: str) -> str:
+    return compute_talon_command_rule(command_name).replace(' ', '_') + TALON_FILE_EXTENSION
+
+def compute_talon_command_file_path(directory: str, command_name: str) -> str:
+    return os.path.join(directory, compute_talon_command_file_name(command_name))
+
+def compute_unused_recorded_command_name(directory: str) -> str:
+    '''Returns the first numbered default command name that does not have a talon file in the directory yet'''
+    number = 1
+    while os.path.exists(compute_talon_command_file_path(directory, f'{DEFAULT_RECORDED_COMMAND_NAME} {number}')):
+        number += 1
+    return f'{DEFAULT_RECORDED_COMMAND_NAME} {number}'
+
+def write_talon_command_file(directory: str, command_name: str, code) -> str:
+    '''Writes the code to a talon file for the command in the directory and returns its path. Talon loads the command as soon as the file appears.
+        The rule of the command is made of the words in the command name, which needs at least one.'''
+    rule = compute_talon_command_rule(command_name)
+    if not rule:
+        raise ValueError(f'The command name {command_name!r} does not contain any words to make a talon rule from')
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = compute_talon_command_file_path(directory, command_name)
+    with open(path, 'w') as file:
+        file.write(f'{rule}:\n')
+        for line_of_code in code:
+            file.write(TALON_SCRIPT_INDENTATION + line_of_code + '\n')
+    return path
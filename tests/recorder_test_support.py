@@ -0,0 +1,12 @@
+import importlib
+import os
+import sys
+
+# Talon loads every python file in the user directory, so the recorder modules only get imported when the tests run.
+
+def import_recorder_module(name: str):
+    repository_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parent_directory = os.path.dirname(repository_directory)
+    if parent_directory not in sys.path:
+        sys.path.insert(0, parent_directory)
+    return importlib.import_module(os.path.basename(repository_directory) + '.' + name)
@@ -0,0 +1,56 @@
+import unittest
+
+class ActionOptimizerTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.action_records = import_recorder_module('action_records')
+        self.action_optimizer = import_recorder_module('action_optimizer')
+
+    def action(self, name, *arguments):
+        return self.action_records.BasicAction(name, arguments)
+
+    def sleep(self, amount, unit = 'ms'):
+        return self.action('sleep', self.action_records.TalonTimeSpecification(amount, unit))
+
+    def optimize(self, optimization_names, actions):
+        passes, unknown_names = self.action_optimizer.compute_talon_script_optimization_passes(optimization_names)
+        self.assertEqual(unknown_names, [])
+        return [action.compute_talon_script() for action in self.action_optimizer.optimize_actions(actions, passes)]
+
+    def test_merge_adjacent_inserts(self):
+        actions = [self.action('insert', 'a'), self.action('insert', "b'"), self.action('key', 'enter'), self.action('insert', ''), self.action('insert', 'c')]
+        self.assertEqual(self.optimize(['inserts'], actions), ["insert('ab\\'')", "key('enter')", "insert('')", "insert('c')"])
+
+    def test_combine_consecutive_keys(self):
+        actions = [self.action('key', 'ctrl-a'), self.action('key', 'delete'), self.action('insert', 'x'), self.action('key', 'enter')]
+        self.assertEqual(self.optimize(['keys'], actions), ["key('ctrl-a delete')", "insert('x')", "key('enter')"])
+
+    def test_fold_repeated_keys(self):
+        actions = [self.action('key', 'down')]*5 + [self.action('key', 'down:2')]*2 + [self.action('key', 'up')]
+        self.assertEqual(self.optimize(['key_repeats'], actions), ["key('down:5')", "key('down:2')", "key('down:2')", "key('up')"])
+
+    def test_repeated_keys_get_folded_before_keys_get_combined(self):
+        actions = [self.action('key', 'down')]*3 + [self.action('key', 'enter')]
+        self.assertEqual(self.optimize(['keys', 'key_repeats'], actions), ["key('down:3 enter')"])
+
+    def test_drop_overwritten_mouse_movements(self):
+        actions = [self.action('mouse_move', 1, 2), self.action('mouse_move', 3, 4), self.action('mouse_click', 0), self.action('mouse_move', 5, 6)]
+        self.assertEqual(self.optimize(['mouse_moves'], actions), ['mouse_move(3, 4)', 'mouse_click(0)', 'mouse_move(5, 6)'])
+
+    def test_merge_adjacent_sleeps(self):
+        actions = [self.sleep(100), self.sleep(50), self.sleep(1, 's'), self.action('key', 'a'), self.action('sleep', 0.5), self.action('sleep', 1)]
+        self.assertEqual(self.optimize(['sleeps'], actions), ['sleep(150ms)', 'sleep(1s)', "key('a')", 'sleep(1.5)'])
+
+    def test_all_optimizations(self):
+        passes, unknown_names = self.action_optimizer.compute_talon_script_optimization_passes(['all', 'unknown'])
+        self.assertEqual(passes, list(self.action_optimizer.TALON_SCRIPT_OPTIMIZATION_PASSES.values()))
+        self.assertEqual(unknown_names, ['unknown'])
+
+    def test_optimizations_do_not_change_the_original_actions(self):
+        actions = [self.action('insert', 'a'), self.action('insert', 'b')]
+        original_actions = list(actions)
+        self.optimize(['all'], actions)
+        self.assertEqual(actions, original_actions)
+
+if __name__ == '__main__':
+    unittest.main()
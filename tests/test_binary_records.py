@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+class BinaryRecordTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.action_records = import_recorder_module('action_records')
+        self.binary_records = import_recorder_module('binary_records')
+        self.record_files = import_recorder_module('record_files')
+        self.directory = tempfile.mkdtemp()
+        self.text_path = os.path.join(self.directory, 'record.txt')
+        self.binary_path = os.path.join(self.directory, 'record.bar')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def compute_entries(self):
+        action_records = self.action_records
+        def action(name, *arguments):
+            return action_records.create_action_record_entry(action_records.BasicAction(name, arguments))
+        return [
+            action_records.create_recording_start_record_entry(),
+            action_records.create_time_difference_record_entry(3),
+            action_records.create_command_start_record_entry('press key'),
+            action('key', 'ctrl-a'),
+            action('insert', 'it\'s "quoted" \\ ünïcode 😀\n'),
+            action('mouse_move', 1.5, -2.0),
+            action('mouse_scroll', 0, -120),
+            action('user.custom', True, False, None, 2**40, -7, 0.1, 1e-300),
+            action('sleep', action_records.TalonTimeSpecification(150, 'ms')),
+            action('user.insert_formatted', action_records.TalonCapture('user.text', 1, '_list'), 'title'),
+            action('user.with_dictionary', {'key': [1, 'two'], 'bar_type': 'not a type'}),
+            action_records.create_time_difference_record_entry(0),
+            action_records.create_command_start_record_entry('press key'),
+            action('key', 'ctrl-a'),
+        ]
+
+    def compute_lines(self, entries):
+        # The text lines tell apart values that compare equal, such as True, 1 and 1.0
+        return [self.action_records.compute_record_entry_line(entry) for entry in entries]
+
+    def write_text_record(self, entries):
+        with open(self.text_path, 'w') as file:
+            file.writelines(line + '\n' for line in self.compute_lines(entries))
+
+    def test_entries_round_trip(self):
+        entries = self.compute_entries()
+        self.binary_records.write_binary_record_entries(self.binary_path, entries, entries_per_block = 4)
+        self.assertEqual(self.compute_lines(self.binary_records.iter_binary_record_entries(self.binary_path)), self.compute_lines(entries))
+
+    def test_conversion_round_trip(self):
+        self.write_text_record(self.compute_entries())
+        with open(self.text_path) as file:
+            text = file.read()
+        self.binary_records.convert_text_record_to_binary(self.text_path, self.binary_path)
+        os.remove(self.text_path)
+        self.binary_records.convert_binary_record_to_text(self.binary_path, self.text_path)
+        with open(self.text_path) as file:
+            self.assertEqual(file.read(), text)
+
+    def test_binary_record_parses_like_text_record(self):
+        self.write_text_record(self.compute_entries())
+        self.binary_records.convert_text_record_to_binary(self.text_path, self.binary_path)
+        def compute_comparable_records(records):
+            return [(record.get_name(), record.get_seconds_since_action(), [action.to_json() for action in record.get_actions()])
+                if record.is_command_record() else 'START' for record in records]
+        self.assertEqual(compute_comparable_records(self.binary_records.read_binary_file_record(self.binary_path)),
+            compute_comparable_records(self.record_files.read_file_record(self.text_path)))
+
+    def test_incomplete_block_at_end_is_ignored(self):
+        entries = self.compute_entries()
+        self.binary_records.write_binary_record_entries(self.binary_path, entries, entries_per_block = 4)
+        with open(self.binary_path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.binary_path) - 2)
+        self.assertEqual(self.compute_lines(self.binary_records.iter_binary_record_entries(self.binary_path)), self.compute_lines(entries[:12]))
+
+    def test_text_record_is_not_read_as_binary(self):
+        self.write_text_record(self.compute_entries())
+        with self.assertRaises(self.binary_records.BinaryRecordFormatError):
+            list(self.binary_records.iter_binary_record_entries(self.text_path))
+
+if __name__ == '__main__':
+    unittest.main()
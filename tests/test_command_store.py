@@ -0,0 +1,51 @@
+import unittest
+
+class CommandStoreTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.action_records = import_recorder_module('action_records')
+        self.command_store = import_recorder_module('command_store')
+        BasicAction = self.action_records.BasicAction
+        self.records = [
+            self.action_records.RecordingStart(),
+            self.action_records.Command('press key', [BasicAction('key', ['enter'])], 3),
+            self.action_records.Command('move', [BasicAction('mouse_move', [1.5, -2]), BasicAction('mouse_click', [0])], None),
+            self.action_records.Command('empty', [], 0),
+            self.action_records.Command('arguments', [
+                BasicAction('user.custom', [True, False, 1, 1.0, 2**60, None, 'text']),
+                BasicAction('sleep', [self.action_records.TalonTimeSpecification(150, 'ms')]),
+            ], 12),
+            self.action_records.Command('press key', [BasicAction('key', ['enter'])], 1),
+        ]
+
+    def compute_comparable_records(self, records):
+        # The JSON of the actions tells apart arguments that compare equal, such as True, 1 and 1.0
+        return [(record.get_name(), record.get_seconds_since_action(), [action.to_json() for action in record.get_actions()])
+            if record.is_command_record() else 'START' for record in records]
+
+    def test_records_round_trip(self):
+        store = self.command_store.CommandStore(self.records)
+        self.assertEqual(len(store), len(self.records))
+        self.assertEqual(self.compute_comparable_records(store), self.compute_comparable_records(self.records))
+        self.assertEqual(self.compute_comparable_records([store[-1]]), self.compute_comparable_records(self.records[-1:]))
+        with self.assertRaises(IndexError):
+            store[len(self.records)]
+
+    def test_names_and_counts_without_building_actions(self):
+        store = self.command_store.CommandStore()
+        store.extend(self.records[:3])
+        store.append(self.records[3])
+        self.assertEqual([store.get_command_name(index) for index in range(len(store))], [None, 'press key', 'move', 'empty'])
+        self.assertEqual([store.get_command_action_count(index) for index in range(len(store))], [0, 1, 2, 0])
+        self.assertEqual(store.get_action_count(), 3)
+        self.assertEqual([store.get_action_name(index) for index in range(store.get_action_count())], ['key', 'mouse_move', 'mouse_click'])
+        self.assertEqual([action.to_json() for action in store.iter_actions()],
+            [action.to_json() for record in self.records[:4] if record.is_command_record() for action in record.get_actions()])
+
+    def test_strings_are_shared(self):
+        store = self.command_store.CommandStore(self.records)
+        self.assertEqual(store.strings.count('press key'), 1)
+        self.assertEqual(store.strings.count('enter'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+class NoiseSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        noise_scheduler = import_recorder_module('noise_scheduler')
+        self.NoiseTiming = noise_scheduler.NoiseTiming
+        self.current_time = 0
+        self.timers = []
+        self.recorded_noises = []
+        self.scheduler = noise_scheduler.NoiseScheduler(lambda name, active, count: self.recorded_noises.append((name, active, count)),
+            self.schedule_timer, self.timers.remove, lambda: self.current_time)
+
+    def schedule_timer(self, seconds: float, callback):
+        timer = (self.current_time + seconds, callback)
+        self.timers.append(timer)
+        return timer
+
+    def advance_time(self, seconds: float):
+        self.current_time += seconds
+        for timer in [timer for timer in self.timers if timer[0] <= self.current_time]:
+            self.timers.remove(timer)
+            timer[1]()
+
+    def perform_noise(self, name: str, seconds: float):
+        self.scheduler.handle_noise(name, True)
+        self.advance_time(seconds)
+        self.scheduler.handle_noise(name, False)
+
+    def test_minimum_duration_cancels_short_noises(self):
+        self.scheduler.set_noise_timing('hiss', self.NoiseTiming(minimum_duration_seconds = 0.5))
+        self.perform_noise('hiss', 0.2)
+        self.advance_time(1)
+        self.assertEqual(self.recorded_noises, [])
+
+    def test_start_delay_does_not_cancel_noises_that_lasted_minimum_duration(self):
+        self.scheduler.set_noise_timing('hiss', self.NoiseTiming(start_delay_seconds = 0.5, minimum_duration_seconds = 0.1))
+        self.perform_noise('hiss', 0.2)
+        self.assertEqual(self.recorded_noises, [('hiss', True, 1), ('hiss', False, 1)])
+
+    def test_start_gets_recorded_after_start_delay(self):
+        self.scheduler.set_noise_timing('hiss', self.NoiseTiming(start_delay_seconds = 0.3))
+        self.scheduler.handle_noise('hiss', True)
+        self.advance_time(0.2)
+        self.assertEqual(self.recorded_noises, [])
+        self.advance_time(0.2)
+        self.assertEqual(self.recorded_noises, [('hiss', True, 1)])
+        self.scheduler.handle_noise('hiss', False)
+        self.assertEqual(self.recorded_noises, [('hiss', True, 1), ('hiss', False, 1)])
+
+    def test_start_delay_update_keeps_rest_of_timing(self):
+        self.scheduler.set_noise_timing('hiss', self.NoiseTiming(0.1, 0.4, 0))
+        self.scheduler.set_noise_start_delay('hiss', 0.35)
+        timing = self.scheduler.get_noise_timing('hiss')
+        self.assertEqual((timing.start_delay_seconds, timing.minimum_duration_seconds, timing.coalescing_window_seconds), (0.35, 0.4, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+def compute_comparable_records(records):
+    return [(record.get_name(), record.get_seconds_since_action(), [(action.get_name(), action.get_arguments()) for action in record.get_actions()])
+        if record.is_command_record() else 'START' for record in records]
+
+class ParallelRecordsTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.parallel_records = import_recorder_module('parallel_records')
+        self.record_rotation = import_recorder_module('record_rotation')
+        self.binary_records = import_recorder_module('binary_records')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_rotated_record(self, name: str, file_texts, binary: bool = False):
+        '''Writes every text but the last as a sealed segment of the record and the last as its active file'''
+        record_path = os.path.join(self.directory, name + ('.bar' if binary else '.txt'))
+        text_path = os.path.join(self.directory, 'text record.tmp') if binary else record_path
+        for text in file_texts:
+            with open(text_path, 'w') as file:
+                file.write(text)
+            if binary:
+                self.binary_records.convert_text_record_to_binary(text_path, record_path)
+                os.remove(text_path)
+            if text is not file_texts[-1]:
+                self.record_rotation.seal_record_file(record_path)
+        return record_path
+
+    def assert_parallel_matches_sequential(self, chunk_size_bytes: int = None):
+        arguments = {} if chunk_size_bytes is None else {'chunk_size_bytes': chunk_size_bytes}
+        sequential = self.parallel_records.read_all_records(self.directory, workers = 1)
+        parallel = self.parallel_records.read_all_records(self.directory, workers = 2, **arguments)
+        self.assertEqual(compute_comparable_records(parallel.get_records()), compute_comparable_records(sequential.get_records()))
+        self.assertEqual([str(metadata) for metadata in parallel.get_metadata()], [str(metadata) for metadata in sequential.get_metadata()])
+
+    def test_command_start_at_end_of_segment(self):
+        self.write_rotated_record('record', [
+            'T0\nCommand: one\n{"name": "insert", "arguments": ["a"]}\nT5\nCommand: two\n',
+            '{"name": "insert", "arguments": ["b"]}\n',
+        ])
+        records = self.parallel_records.read_all_records(self.directory, workers = 2).get_records()
+        self.assertEqual(compute_comparable_records(records), [('one', 0, [('insert', ('a',))]), ('two', 5, [('insert', ('b',))])])
+        self.assert_parallel_matches_sequential()
+
+    def test_time_difference_at_end_of_segment(self):
+        self.write_rotated_record('record', [
+            'T0\nCommand: one\n{"name": "insert", "arguments": ["a"]}\nT5\n',
+            'Command: two\n{"name": "insert", "arguments": ["b"]}\nCommand: three\n{"name": "key", "arguments": ["c"]}\n',
+        ])
+        self.assert_parallel_matches_sequential()
+
+    def test_actions_continuing_across_segments(self):
+        self.write_rotated_record('record', [
+            'Command: one\n{"name": "insert", "arguments": ["a"]}\n',
+            '{"name": "insert", "arguments": ["b"]}\n',
+            '{"name": "insert", "arguments": ["c"]}\nSTART\nCommand: two\n{"name": "key", "arguments": ["d"]}\n',
+        ])
+        self.assert_parallel_matches_sequential()
+
+    def test_records_with_same_name_in_different_formats(self):
+        text_path = self.write_rotated_record('record', ['Command: one\n{"name": "insert", "arguments": ["a"]}\n', 'Command: two\n{"name": "insert", "arguments": ["c"]}\n'])
+        binary_path = self.write_rotated_record('record', ['Command: three\n{"name": "key", "arguments": ["b"]}\n', 'Command: four\n{"name": "key", "arguments": ["d"]}\n'], binary = True)
+        for workers in (1, 2):
+            records = self.parallel_records.read_all_records(self.directory, workers = workers).get_records()
+            self.assertEqual(sorted(record.get_name() for record in records), ['four', 'one', 'three', 'two'])
+        os.remove(text_path)
+        os.remove(binary_path)
+        for workers in (1, 2):
+            records = self.parallel_records.read_all_records(self.directory, workers = workers).get_records()
+            self.assertEqual(sorted(record.get_name() for record in records), ['one', 'three'])
+
+    def test_random_rotations_and_chunks(self):
+        random_generator = random.Random(0)
+        for record_index in range(3):
+            lines = []
+            for _ in range(300):
+                choice = random_generator.random()
+                if choice < 0.05:
+                    lines.append('START')
+                elif choice < 0.35:
+                    if random_generator.random() < 0.7:
+                        lines.append('T' + str(random_generator.randrange(60)))
+                    lines.append('Command: command ' + str(random_generator.randrange(10)))
+                else:
+                    lines.append('{"name": "key", "arguments": ["' + str(random_generator.randrange(10)) + '"]}')
+            boundaries = sorted(random_generator.sample(range(1, len(lines)), 5))
+            file_texts = [''.join(line + '\n' for line in lines[start:end]) for start, end in zip([0] + boundaries, boundaries + [len(lines)])]
+            self.write_rotated_record(f'record {record_index}', file_texts)
+        self.assert_parallel_matches_sequential(chunk_size_bytes = 200)
+
+if __name__ == '__main__':
+    unittest.main()
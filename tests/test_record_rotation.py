@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+class RecordRotationTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.action_records = import_recorder_module('action_records')
+        self.record_files = import_recorder_module('record_files')
+        self.record_rotation = import_recorder_module('record_rotation')
+        self.record_file_writer = import_recorder_module('record_file_writer')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'record.txt')
+        self.writer = None
+
+    def tearDown(self):
+        if self.writer is not None:
+            self.writer.close()
+        shutil.rmtree(self.directory)
+
+    def write_file(self, text: str):
+        with open(self.path, 'w') as file:
+            file.write(text)
+
+    def create_writer(self, rotation_policy = None):
+        self.writer = self.record_file_writer.RecordFileWriter(idle_close_seconds = 0)
+        self.writer.set_path(self.path, self.action_records.TextRecordFormat())
+        if rotation_policy is not None:
+            self.writer.set_rotation_policy(rotation_policy)
+        return self.writer
+
+    def write_action(self):
+        self.writer.write_entry(self.action_records.create_action_record_entry(self.action_records.BasicAction('key', ['a'])))
+        self.assertTrue(self.writer.flush(10))
+
+    def test_sealed_segments_get_numbered_in_order(self):
+        for text in ('one\n', 'two\n'):
+            self.write_file(text)
+            self.record_rotation.seal_record_file(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        segment_paths = self.record_files.compute_record_segment_paths(self.path)
+        self.assertEqual([os.path.basename(path) for path in segment_paths], ['000001.txt', '000002.txt'])
+        with open(segment_paths[1]) as file:
+            self.assertEqual(file.read(), 'two\n')
+
+    def test_compressed_segment_replaces_uncompressed_segment(self):
+        self.write_file('Command: one\n')
+        segment_path = self.record_rotation.seal_record_file(self.path)
+        compressed_path = self.record_rotation.compress_segment(segment_path, self.record_rotation.GZIP_COMPRESSION)
+        self.assertEqual(self.record_files.compute_record_segment_paths(self.path), [compressed_path])
+        with self.record_files.open_record_segment(segment_path) as file:
+            self.assertEqual(file.read(), b'Command: one\n')
+
+    def test_rotation_policy(self):
+        policy = self.record_rotation.RecordRotationPolicy(maximum_size_bytes = 100, maximum_age_seconds = 60)
+        self.assertFalse(policy.should_rotate(0, 0))
+        self.assertFalse(policy.should_rotate(99, time.time()))
+        self.assertTrue(policy.should_rotate(100, time.time()))
+        self.assertTrue(policy.should_rotate(1, time.time() - 61))
+
+    def test_start_time_survives_closing_idle_file(self):
+        self.create_writer()
+        self.write_action()
+        start_time = self.writer.get_record_start_time(self.path)
+        time.sleep(0.01)
+        self.write_action()
+        self.assertEqual(self.writer.get_record_start_time(self.path), start_time)
+
+    def test_saved_start_time_rotates_by_age(self):
+        self.write_file('Command: one\n')
+        self.create_writer(self.record_rotation.RecordRotationPolicy(maximum_age_seconds = 3600, compression = self.record_rotation.NO_COMPRESSION))
+        self.writer.set_record_start_time(self.path, time.time() - 7200)
+        self.write_action()
+        self.assertEqual(len(self.record_files.compute_record_segment_paths(self.path)), 1)
+        self.assertEqual(self.writer.get_statistics().rotation_count, 1)
+        self.assertGreater(self.writer.get_record_start_time(self.path), time.time() - 60)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+class BinaryRecordRepairTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.action_records = import_recorder_module('action_records')
+        self.binary_records = import_recorder_module('binary_records')
+        self.record_state = import_recorder_module('record_state')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'record.bar')
+        self.blocks = [self.binary_records.compute_block([
+            self.action_records.create_command_start_record_entry('command ' + str(index)),
+            self.action_records.create_action_record_entry(self.action_records.BasicAction('key', ['a'])),
+        ]) for index in range(3)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_record(self, blocks):
+        data = self.binary_records.BINARY_RECORD_MAGIC + b''.join(blocks)
+        with open(self.path, 'wb') as file:
+            file.write(data)
+        return data
+
+    def repair(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            removed_byte_count = self.record_state.repair_record_tail(self.path)
+        with open(self.path, 'rb') as file:
+            return removed_byte_count, file.read(), output.getvalue()
+
+    def test_incomplete_block_at_end_gets_removed(self):
+        complete_data = self.write_record(self.blocks)
+        self.write_record(self.blocks + [self.blocks[0][:-3]])
+        self.assertEqual(self.repair(), (len(self.blocks[0]) - 3, complete_data, ''))
+
+    def test_corrupted_block_at_end_gets_removed(self):
+        complete_data = self.write_record(self.blocks[:2])
+        corrupted_block = self.blocks[2][:-1] + bytes((self.blocks[2][-1] ^ 0xFF,))
+        self.write_record(self.blocks[:2] + [corrupted_block])
+        self.assertEqual(self.repair(), (len(corrupted_block), complete_data, ''))
+
+    def test_corrupted_block_in_middle_gets_kept(self):
+        corrupted_block = self.blocks[1][:-1] + bytes((self.blocks[1][-1] ^ 0xFF,))
+        data = self.write_record([self.blocks[0], corrupted_block, self.blocks[2]])
+        removed_byte_count, repaired_data, output = self.repair()
+        self.assertEqual((removed_byte_count, repaired_data), (0, data))
+        self.assertIn('skipped corrupted data', output)
+
+    def test_corrupted_length_in_middle_gets_kept(self):
+        # A length running past the end of the file looks like an incomplete block until the blocks after it are found
+        corrupted_block = self.blocks[1][:1] + b'\xff\xff\x7f' + self.blocks[1][2:]
+        data = self.write_record([self.blocks[0], corrupted_block, self.blocks[2], self.blocks[0][:-3]])
+        removed_byte_count, repaired_data, _ = self.repair()
+        self.assertEqual((removed_byte_count, repaired_data), (len(self.blocks[0]) - 3, data[:-(len(self.blocks[0]) - 3)]))
+
+if __name__ == '__main__':
+    unittest.main()
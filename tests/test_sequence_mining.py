@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+class SequenceMiningTest(unittest.TestCase):
+    def setUp(self):
+        from recorder_test_support import import_recorder_module
+        self.action_records = import_recorder_module('action_records')
+        self.sequence_mining = import_recorder_module('sequence_mining')
+
+    def key(self, keystroke: str):
+        return self.action_records.BasicAction('key', [keystroke])
+
+    def command(self, name: str, actions, seconds_since_action = None):
+        return self.action_records.Command(name, actions, seconds_since_action)
+
+    def compute_copy_records(self):
+        '''Every copy command takes 3 seconds for 3 keys, and the average command takes 2 seconds, so replacing the keys saves 1 second each time'''
+        records = []
+        for index in range(4):
+            records.append(self.command('copy over', [self.key('ctrl-c'), self.key('alt-tab'), self.key('ctrl-v')], 3))
+            records.append(self.command('word ' + str(index), [self.action_records.BasicAction('insert', ['text ' + str(index)])], 1))
+        return records
+
+    def compute_miner_candidates(self, items, reset_positions = (), **keyword_arguments):
+        miner = self.sequence_mining.SequenceMiner(2, 2, **keyword_arguments)
+        for position, item in enumerate(items):
+            if position in reset_positions:
+                miner.reset_window()
+            miner.process(item, hash(item), 1)
+        return miner, miner.compute_candidates(1, 0, 10)
+
+    def test_repeated_action_sequence_without_its_parts(self):
+        analysis = self.sequence_mining.RecordSequenceAnalysis()
+        analysis.process_records(self.compute_copy_records())
+        sequences = analysis.compute_repeated_action_sequences()
+        self.assertEqual([(sequence.compute_talon_script(), sequence.get_count(), sequence.get_estimated_seconds_saved()) for sequence in sequences],
+            [(["key('ctrl-c')", "key('alt-tab')", "key('ctrl-v')"], 4, 4.0)])
+
+    def test_repetitions_do_not_overlap(self):
+        _, candidates = self.compute_miner_candidates(['a']*5)
+        self.assertEqual(candidates, [(('a', 'a'), 2, 4.0)])
+
+    def test_windows_do_not_span_recording_starts(self):
+        _, candidates = self.compute_miner_candidates(['x', 'y']*3, reset_positions = (1, 3, 5))
+        self.assertEqual(candidates, [(('y', 'x'), 2, 4.0)])
+        analysis = self.sequence_mining.RecordSequenceAnalysis()
+        for _ in range(3):
+            analysis.process_records([self.command('one', [self.key('a')], 5), self.action_records.RecordingStart(), self.command('two', [self.key('b')], 5)])
+        self.assertEqual([sequence.get_actions() for sequence in analysis.compute_repeated_action_sequences(minimum_occurrences = 2)],
+            [(self.key('b'), self.key('a'))])
+
+    def test_repeated_command_sequence(self):
+        records = []
+        for _ in range(3):
+            records.extend([self.command('save file', [self.key('ctrl-s')], 4), self.command('close tab', [self.key('ctrl-w')], 4)])
+        records.append(self.command('done', [], 0))
+        analysis = self.sequence_mining.RecordSequenceAnalysis()
+        analysis.process_records(records)
+        sequences = analysis.compute_repeated_command_sequences()
+        self.assertEqual([([command.get_name() for command in sequence.get_commands()], sequence.get_count()) for sequence in sequences], [(['save file', 'close tab'], 3)])
+        self.assertEqual(sequences[0].compute_talon_script(), ["key('ctrl-s')", "key('ctrl-w')"])
+        text = self.sequence_mining.compute_macro_candidate_talon_file_text(sequences)
+        self.assertIn("macro candidate 1:\n    key('ctrl-s')\n    key('ctrl-w')\n", text)
+
+    def test_tracked_sequences_stay_bounded(self):
+        miner, _ = self.compute_miner_candidates([str(index) for index in range(100)], maximum_tracked_sequences = 10)
+        self.assertLessEqual(len(miner.counts), 10)
+        self.assertEqual(miner.get_pruned_count(), 1)
+
+    def test_analysis_of_record_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'record.txt')
+            with open(path, 'w') as file:
+                for record in self.compute_copy_records():
+                    file.write(self.action_records.compute_time_difference_text(record.get_seconds_since_action()) + '\n')
+                    file.write('Command: ' + record.get_name() + '\n')
+                    file.writelines(action.to_json() + '\n' for action in record.get_actions())
+            sequences = self.sequence_mining.analyze_record_sequences(path).compute_repeated_action_sequences()
+            self.assertEqual([(sequence.get_length(), sequence.get_count()) for sequence in sequences], [(3, 4)])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,291 @@
+import datetime
+import json
+import os
+import threading
+import time
+
+DEFAULT_TRACKED_ITEM_COUNT = 100
+DEFAULT_RATE_WINDOWS_SECONDS = (60, 5*60, 15*60)
+MAXIMUM_TRACKED_TEXT_LENGTH = 100
+MAXIMUM_ACTIONS_PER_COMMAND_BUCKET = 10
+SECONDS_PER_MINUTE = 60
+KEY_ACTION_NAME = 'key'
+INSERT_ACTION_NAME = 'insert'
+USAGE_STATISTICS_DIRECTORY_NAME = 'Usage Statistics'
+
+class ItemFrequency:
+    '''How many times an item was counted by a SpaceSavingCounter. The true count is at most maximum_overcount lower than the count.'''
+    __slots__ = ('item', 'count', 'maximum_overcount')
+
+    def __init__(self, item, count: int, maximum_overcount: int):
+        self.item = item
+        self.count = count
+        self.maximum_overcount = maximum_overcount
+
+    def get_item(self):
+        return self.item
+
+    def get_count(self) -> int:
+        return self.count
+
+    def get_maximum_overcount(self) -> int:
+        return self.maximum_overcount
+
+    def compute_json_representation(self):
+        return {'item': self.item, 'count': self.count, 'maximum_overcount': self.maximum_overcount}
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        if self.maximum_overcount > 0:
+            return f'{self.item}: {self.count} (at most {self.maximum_overcount} too high)'
+        return f'{self.item}: {self.count}'
+
+class SpaceSavingCounter:
+    '''Finds the most frequent items of a stream in fixed memory with the Space-Saving algorithm.
+        Only capacity items are tracked. A new item replaces the item with the lowest count and takes over its count,
+        so any item that appeared more often than the total count divided by the capacity is guaranteed to be tracked.
+        Items with the same count share a bucket so that counting an item takes constant time.'''
+    def __init__(self, capacity: int = DEFAULT_TRACKED_ITEM_COUNT):
+        self.capacity = capacity
+        self.counts = {}
+        self.overcounts = {}
+        # Dictionaries are used as ordered sets of the items with each count
+        self.buckets = {}
+        self.minimum_count = 0
+        self.total_count = 0
+
+    def add(self, item):
+        if self.capacity <= 0:
+            return
+        self.total_count += 1
+        count = self.counts.get(item)
+        if count is not None:
+            self.move_item(item, count, count + 1)
+        elif len(self.counts) < self.capacity:
+            self.insert_item(item, 1, 0)
+            self.minimum_count = 1
+        else:
+            self.replace_minimum_item(item)
+
+    def move_item(self, item, count: int, new_count: int):
+        self.remove_from_bucket(item, count)
+        if count == self.minimum_count and count not in self.buckets:
+            self.minimum_count = new_count
+        self.counts[item] = new_count
+        self.buckets.setdefault(new_count, {})[item] = None
+
+    def insert_item(self, item, count: int, overcount: int):
+        self.counts[item] = count
+        self.overcounts[item] = overcount
+        self.buckets.setdefault(count, {})[item] = None
+
+    def replace_minimum_item(self, item):
+        minimum_count = self.minimum_count
+        replaced_item = next(iter(self.buckets[minimum_count]))
+        self.remove_from_bucket(replaced_item, minimum_count)
+        del self.counts[replaced_item]
+        del self.overcounts[replaced_item]
+        self.insert_item(item, minimum_count + 1, minimum_count)
+        if minimum_count not in self.buckets:
+            self.minimum_count = minimum_count + 1
+
+    def remove_from_bucket(self, item, count: int):
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+
+    def get_count(self, item) -> int:
+        '''Returns the count of the item, which is 0 if it is not tracked'''
+        return self.counts.get(item, 0)
+
+    def get_total_count(self) -> int:
+        return self.total_count
+
+    def get_tracked_item_count(self) -> int:
+        return len(self.counts)
+
+    def compute_most_common(self, count: int = None):
+        '''Returns the ItemFrequency objects of the most frequent items from most to least frequent'''
+        items = sorted(self.counts, key = self.counts.get, reverse = True)
+        if count is not None:
+            items = items[:count]
+        return [ItemFrequency(item, self.counts[item], self.overcounts[item]) for item in items]
+
+class SlidingWindowCounter:
+    '''Counts events in one second buckets of a ring buffer covering the last window_seconds, so recording an event takes constant amortized time'''
+    def __init__(self, window_seconds: int, compute_current_time = time.monotonic):
+        self.window_seconds = window_seconds
+        self.compute_current_time = compute_current_time
+        self.bucket_counts = [0]*window_seconds
+        self.start_second = int(compute_current_time())
+        self.current_second = self.start_second
+
+    def record(self, count: int = 1):
+        second = self.advance_to_current_second()
+        self.bucket_counts[second % self.window_seconds] += count
+
+    def advance_to_current_second(self) -> int:
+        second = int(self.compute_current_time())
+        if second > self.current_second:
+            for skipped_second in range(max(self.current_second + 1, second - self.window_seconds + 1), second + 1):
+                self.bucket_counts[skipped_second % self.window_seconds] = 0
+            self.current_second = second
+        return self.current_second
+
+    def compute_count(self, window_seconds: int = None) -> int:
+        '''Returns the number of events in the last window_seconds, which defaults to and cannot exceed the window of the counter'''
+        window_seconds = min(window_seconds or self.window_seconds, self.window_seconds)
+        current_second = self.advance_to_current_second()
+        return sum(self.bucket_counts[second % self.window_seconds] for second in range(current_second - window_seconds + 1, current_second + 1))
+
+    def compute_rate_per_minute(self, window_seconds: int = None) -> float:
+        '''Returns the events per minute over the last window_seconds, or over the time since the counter was created if that is shorter'''
+        window_seconds = min(window_seconds or self.window_seconds, self.window_seconds)
+        count = self.compute_count(window_seconds)
+        observed_seconds = min(window_seconds, self.current_second - self.start_second + 1)
+        return count*SECONDS_PER_MINUTE/observed_seconds
+
+    def reset(self):
+        self.bucket_counts = [0]*self.window_seconds
+        self.start_second = int(self.compute_current_time())
+        self.current_second = self.start_second
+
+class UsageStatistics:
+    '''Keeps live statistics about the commands, actions, and noises the basic action recorder receives in fixed memory.
+        Recording a command, action, or noise takes constant time. Actions count towards the most recent command until the next command or noise.'''
+    def __init__(self, tracked_item_count: int = DEFAULT_TRACKED_ITEM_COUNT, rate_windows_seconds = DEFAULT_RATE_WINDOWS_SECONDS,
+            compute_current_time = time.monotonic):
+        self.tracked_item_count = tracked_item_count
+        self.rate_windows_seconds = tuple(rate_windows_seconds)
+        self.compute_current_time = compute_current_time
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.command_count = 0
+            self.action_count = 0
+            self.command_counts = SpaceSavingCounter(self.tracked_item_count)
+            self.key_counts = SpaceSavingCounter(self.tracked_item_count)
+            self.insert_counts = SpaceSavingCounter(self.tracked_item_count)
+            self.action_name_counts = {}
+            self.noise_counts = {}
+            self.actions_per_command_counts = [0]*(MAXIMUM_ACTIONS_PER_COMMAND_BUCKET + 1)
+            self.finished_command_action_count = 0
+            self.current_command_action_count = None
+            self.command_rate = SlidingWindowCounter(max(self.rate_windows_seconds), self.compute_current_time)
+            self.start_time = time.time()
+
+    def record_command(self, command_chain: str):
+        with self.lock:
+            self.finish_current_command()
+            self.command_count += 1
+            self.command_counts.add(command_chain)
+            self.command_rate.record()
+            self.current_command_action_count = 0
+
+    def record_action(self, action):
+        name = action.get_name()
+        arguments = action.get_arguments()
+        with self.lock:
+            self.action_count += 1
+            self.action_name_counts[name] = self.action_name_counts.get(name, 0) + 1
+            if arguments:
+                if name == KEY_ACTION_NAME:
+                    self.key_counts.add(arguments[0])
+                elif name == INSERT_ACTION_NAME:
+                    self.insert_counts.add(compute_tracked_text(arguments[0]))
+            if self.current_command_action_count is not None:
+                self.current_command_action_count += 1
+
+    def record_noise(self, name: str, active: bool, count: int = 1):
+        '''Counts the noise when it starts, along with how many noises were coalesced into it'''
+        with self.lock:
+            self.finish_current_command()
+            if active:
+                self.noise_counts[name] = self.noise_counts.get(name, 0) + count
+
+    def finish_current_command(self):
+        if self.current_command_action_count is not None:
+            self.actions_per_command_counts[min(self.current_command_action_count, MAXIMUM_ACTIONS_PER_COMMAND_BUCKET)] += 1
+            self.finished_command_action_count += self.current_command_action_count
+            self.current_command_action_count = None
+
+    def get_command_count(self) -> int:
+        return self.command_count
+
+    def get_action_count(self) -> int:
+        return self.action_count
+
+    def compute_average_actions_per_command(self) -> float:
+        '''Returns the average number of actions performed by the commands that were followed by another command or noise'''
+        finished_command_count = sum(self.actions_per_command_counts)
+        if finished_command_count == 0:
+            return 0
+        return self.finished_command_action_count/finished_command_count
+
+    def compute_most_common_commands(self, count: int = None):
+        with self.lock:
+            return self.command_counts.compute_most_common(count)
+
+    def compute_most_common_keys(self, count: int = None):
+        with self.lock:
+            return self.key_counts.compute_most_common(count)
+
+    def compute_most_common_inserts(self, count: int = None):
+        with self.lock:
+            return self.insert_counts.compute_most_common(count)
+
+    def compute_noise_counts(self) -> dict:
+        with self.lock:
+            return dict(self.noise_counts)
+
+    def compute_commands_per_minute(self) -> dict:
+        '''Returns the commands per minute over each rate window by the window length in seconds'''
+        with self.lock:
+            return {window_seconds: self.command_rate.compute_rate_per_minute(window_seconds) for window_seconds in self.rate_windows_seconds}
+
+    def compute_snapshot(self, most_common_count: int = None) -> dict:
+        '''Returns the statistics as a dictionary that can be saved as JSON'''
+        snapshot = {
+            'start_time': self.start_time,
+            'snapshot_time': time.time(),
+            'commands_per_minute': {str(window_seconds): rate for window_seconds, rate in self.compute_commands_per_minute().items()},
+            'most_common_commands': compute_json_frequencies(self.compute_most_common_commands(most_common_count)),
+            'most_common_keys': compute_json_frequencies(self.compute_most_common_keys(most_common_count)),
+            'most_common_inserts': compute_json_frequencies(self.compute_most_common_inserts(most_common_count)),
+            'noise_counts': self.compute_noise_counts(),
+        }
+        with self.lock:
+            snapshot.update({
+                'command_count': self.command_count,
+                'action_count': self.action_count,
+                'average_actions_per_command': self.compute_average_actions_per_command(),
+                'actions_per_command_counts': self.actions_per_command_counts[:],
+                'action_name_counts': dict(self.action_name_counts),
+            })
+        return snapshot
+
+def compute_tracked_text(text: str) -> str:
+    '''Shortens long inserted text so that the memory used by tracked inserts stays bounded'''
+    if len(text) > MAXIMUM_TRACKED_TEXT_LENGTH:
+        return text[:MAXIMUM_TRACKED_TEXT_LENGTH] + '...'
+    return text
+
+def compute_json_frequencies(frequencies):
+    return [frequency.compute_json_representation() for frequency in frequencies]
+
+def compute_usage_statistics_snapshot_path(directory: str, snapshot_time: float) -> str:
+    file_name = 'usage statistics ' + datetime.datetime.fromtimestamp(snapshot_time).strftime('%Y-%m-%d %H-%M-%S') + '.json'
+    return os.path.join(directory, USAGE_STATISTICS_DIRECTORY_NAME, file_name)
+
+def write_usage_statistics_snapshot(directory: str, snapshot: dict) -> str:
+    '''Writes the snapshot to a JSON file in the usage statistics directory inside the directory and returns its path'''
+    path = compute_usage_statistics_snapshot_path(directory, snapshot['snapshot_time'])
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w', encoding = 'utf-8') as file:
+        json.dump(snapshot, file, indent = 4, default = str)
+    return path